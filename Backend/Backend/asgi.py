@@ -7,10 +7,70 @@ For more information on this file, see
 https://docs.djangoproject.com/en/5.1/howto/deployment/asgi/
 """
 
+import asyncio
+import logging
 import os
 
 from django.core.asgi import get_asgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'Backend.settings.dev')
 
-application = get_asgi_application()
+logger = logging.getLogger(__name__)
+
+# Requests to these paths are cancelled when the client goes away
+CANCEL_ON_DISCONNECT_PATHS = ('/api/instruments/search/async/',)
+
+
+class CancelOnDisconnect:
+    """
+    Cancels the request task when the client disconnects before the response
+    has been sent, so awaited calls (like the semantic service request of the
+    async search) are aborted instead of finishing for nobody. Django 4.2 only
+    reads the request body and never notices the disconnect by itself.
+
+    Only used for async views: a sync view keeps running in its thread anyway.
+    """
+
+    def __init__(self, app, paths=CANCEL_ON_DISCONNECT_PATHS):
+        self.app = app
+        self.paths = tuple(paths)
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] != 'http' or not scope['path'].startswith(self.paths):
+            return await self.app(scope, receive, send)
+
+        messages = asyncio.Queue()
+        state = {'response_complete': False, 'cancelled': False}
+
+        async def send_and_track(message):
+            await send(message)
+            if message['type'] == 'http.response.body' and not message.get('more_body', False):
+                state['response_complete'] = True
+
+        app_task = asyncio.ensure_future(self.app(scope, messages.get, send_and_track))
+
+        async def listen_for_disconnect():
+            while True:
+                message = await receive()
+                if message['type'] == 'http.disconnect':
+                    # Servers also report a disconnect once the response is complete;
+                    # Django may still be cleaning up then and must not be interrupted.
+                    if not state['response_complete']:
+                        state['cancelled'] = True
+                        app_task.cancel()
+                    return
+                await messages.put(message)
+
+        listener = asyncio.ensure_future(listen_for_disconnect())
+        try:
+            await app_task
+        except asyncio.CancelledError:
+            # Our own cancellation (server shutdown) has to propagate
+            if not state['cancelled']:
+                raise
+            logger.info(f"Client disconnected, cancelled request to {scope['path']}")
+        finally:
+            listener.cancel()
+
+
+application = CancelOnDisconnect(get_asgi_application())
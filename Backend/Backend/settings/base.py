@@ -21,6 +21,7 @@ INSTALLED_APPS = [
     'django.contrib.sessions',
     'django.contrib.messages',
     'django.contrib.staticfiles',
+    'django.contrib.postgres',
     # packages
     'simple_history',
     'rest_framework',
@@ -108,6 +109,92 @@ USE_TZ = True
 
 # Semantic search service URL
 SEMANTIC_SEARCH_SERVICE_URL = 'http://semantic-search-service:8001'
+# Deadline (seconds) for a query embedding request of the async search view,
+# and the part of it that may be spent connecting
+SEMANTIC_SERVICE_TIMEOUT = 20.0
+SEMANTIC_SERVICE_CONNECT_TIMEOUT = 2.0
+# Batch embedding requests answered 429 (service saturated) or 413 (batch too
+# large) are split and retried, at most this many times in a row, waiting for
+# Retry-After (capped at the max backoff, seconds) after a 429
+SEMANTIC_SERVICE_MAX_ATTEMPTS = 5
+SEMANTIC_SERVICE_MAX_BACKOFF = 30.0
+
+# HNSW index parameters for instrument embeddings (pgvector).
+# Changing M or EF_CONSTRUCTION requires a new migration to rebuild the index.
+PGVECTOR_HNSW_M = 16
+PGVECTOR_HNSW_EF_CONSTRUCTION = 64
+# Size of the candidate list used at query time. Higher values improve recall
+# at the cost of latency. Must be at least the number of results returned.
+PGVECTOR_HNSW_EF_SEARCH = 100
+PGVECTOR_HNSW_EF_SEARCH_MAX = 1000
+# Filtered searches scan the index iteratively until enough rows pass the
+# filters. Upper bound of index tuples visited per query (pgvector >= 0.8).
+PGVECTOR_HNSW_MAX_SCAN_TUPLES = 20000
+# Shortlist candidates by Hamming distance over binary-quantized embeddings and
+# re-rank the shortlist with exact cosine distance. Trades a little recall for a
+# much smaller index scan on large registries.
+SEARCH_BINARY_QUANTIZATION = env.bool('SEARCH_BINARY_QUANTIZATION', default=False)
+SEARCH_RERANK_CANDIDATES = 400
+
+# Backend used for semantic search distance computation.
+# 'pgvector' runs the nearest neighbour query in PostgreSQL, 'numpy' uses the
+# memory-mapped vector index in VECTOR_INDEX_DIR (build it with
+# `python manage.py build_vector_index`). Falls back to pgvector if the index is missing.
+SEARCH_BACKEND = env('SEARCH_BACKEND', default='pgvector')
+# A volume in docker-compose.prod.yml, where the web service builds the index before starting
+VECTOR_INDEX_DIR = BASE_DIR / 'vector_index'
+
+# Query embedding cache. Identifies the translation + embedding models of the
+# semantic service; cached query embeddings from other versions are ignored.
+SEMANTIC_MODEL_VERSION = env('SEMANTIC_MODEL_VERSION', default='opus-mt-fi-en-fine-tuned+bge-base-en-v1.5')
+QUERY_EMBEDDING_CACHE_SIZE = 1024
+QUERY_EMBEDDING_CACHE_TTL = timedelta(hours=1)
+# warm_query_cache --prune deletes cached embeddings of other versions unused for
+# this many days. Kept meanwhile for rolling deploys and rollbacks.
+QUERY_EMBEDDING_OLD_VERSION_RETENTION_DAYS = 7
+
+# Search query log, written in batches after responses have been sent. Used by
+# the warm_query_cache command to pre-embed the most frequent queries.
+SEARCH_QUERY_LOG_ENABLED = env.bool('SEARCH_QUERY_LOG_ENABLED', default=True)
+SEARCH_QUERY_LOG_FLUSH_INTERVAL = 30  # seconds
+SEARCH_QUERY_LOG_BATCH_SIZE = 500
+SEARCH_QUERY_LOG_MAX_PENDING = 10000
+SEARCH_QUERY_LOG_RETENTION_DAYS = 90
+# warm_query_cache defaults: number of queries and the log window in days
+QUERY_CACHE_WARM_TOP = 200
+QUERY_CACHE_WARM_DAYS = 30
+
+# Default search mode: 'hybrid' fuses full-text and vector rankings with
+# reciprocal rank fusion, 'semantic' uses vector distance only.
+SEARCH_MODE = 'hybrid'
+# Reciprocal rank fusion constant: score = sum(1 / (k + rank))
+SEARCH_RRF_K = 60
+# Default and maximum page size of the cursor-paginated semantic search
+SEARCH_PAGE_SIZE = 20
+SEARCH_MAX_PAGE_SIZE = 100
+# The first page counts the matches up to this number; beyond it the response
+# only says there are more (match_count_capped)
+SEARCH_MATCH_COUNT_LIMIT = 1000
+# Maximum number of queries in one batch search request
+SEARCH_BATCH_MAX_QUERIES = 20
+
+# "More like this" results: number of similar instruments returned, and the
+# per-process cache of their rankings. The cache TTL bounds how long newly
+# added instruments can be missing from the results.
+SIMILAR_INSTRUMENTS_LIMIT = 20
+SIMILAR_INSTRUMENTS_CACHE_SIZE = 1024
+SIMILAR_INSTRUMENTS_CACHE_TTL = timedelta(minutes=10)
+
+# Near-duplicate job (find_near_duplicates): neighbours stored per instrument
+# and the cosine distance below which two instruments count as near-duplicates
+NEAR_DUPLICATE_K = 10
+NEAR_DUPLICATE_MAX_DISTANCE = 0.1
+
+# Direct (trigram) search: minimum pg_trgm word similarity for a fuzzy match (0-1)
+# and the default and maximum page size of the paginated results.
+DIRECT_SEARCH_SIMILARITY_THRESHOLD = 0.5
+DIRECT_SEARCH_PAGE_SIZE = 15
+DIRECT_SEARCH_MAX_PAGE_SIZE = 100
 
 # Static files (CSS, JavaScript, Images)
 # https://docs.djangoproject.com/en/5.1/howto/static-files/
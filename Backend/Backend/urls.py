@@ -26,13 +26,18 @@ urlpatterns = [
     # instrument
     path('api/instruments/', api_views.InstrumentList.as_view()),
     path('api/instruments/search/', api_views.InstrumentSearch.as_view()),
+    path('api/instruments/search/async/', api_views.AsyncInstrumentSearch.as_view()),
+    path('api/instruments/search/batch/', api_views.InstrumentBatchSearch.as_view()),
+    path('api/instruments/search/direct/', api_views.InstrumentDirectSearch.as_view()),
     path('api/instruments/valueset/<field_name>/', api_views.InstrumentValueSet.as_view()),
     path('api/instruments/csv/export/', api_views.InstrumentCSVExport.as_view()),
     path('api/instruments/csv/preview/', api_views.InstrumentCSVPreview.as_view()),
     path('api/instruments/csv/import/', api_views.InstrumentCSVImport.as_view()),
     path('api/instruments/<pk>/', api_views.InstrumentDetail.as_view()),
     path('api/instruments/<pk>/history/', api_views.InstrumentHistory.as_view()),
+    path('api/instruments/<int:pk>/similar/', api_views.InstrumentSimilar.as_view()),
     path('api/embedding-status/', api_views.EmbeddingStatus.as_view()),
+    path('api/search-cache/', api_views.QueryCacheStats.as_view()),
     # user
     path('api/users/', api_views.UserList.as_view()),
     path('api/users/<pk>/', api_views.UserDetail.as_view()),
@@ -0,0 +1,354 @@
+"""
+Search Benchmark
+
+Measures latency and throughput of the semantic search query path of
+InstrumentSearch on synthetic data, so backends and index settings can be
+compared across releases.
+
+KEY DESIGN:
+- Runs only against an empty database (no instruments or embeddings). Dropping
+  the vector indexes and loading the corpus hold ACCESS EXCLUSIVE locks on the
+  tables for the whole run, which would stop search on a live database, and
+  real rows would be mixed into the measured data set.
+- Synthetic instruments and embeddings are inserted inside a transaction that is
+  always rolled back, so running the benchmark never changes the database
+- The vector indexes are dropped before loading; every configuration builds the
+  indexes it needs in its own savepoint, which also gives its build time and size
+- Query embeddings are drawn from the synthetic corpus, no semantic service is needed
+- 'random' embeddings are uniform on the unit sphere; 'clustered' ones are noise
+  around a center per ~100 instruments, so queries have neighbours within the
+  distance threshold like real instrument names do
+- Recall of every configuration is measured against the exact (no index) results
+- Each configuration gets a searcher configured for its backend instead of
+  changing the search settings, so the running process keeps its own settings
+"""
+
+from contextlib import ExitStack, contextmanager
+from datetime import datetime, timezone
+import math
+import tempfile
+import time
+
+import numpy as np
+from django.conf import settings
+from django.db import connection, transaction
+from pgvector.django import HnswIndex
+
+from instrument_registry import vector_index
+from instrument_registry.models import Instrument, InstrumentEmbedding
+from instrument_registry.views import InstrumentSearch
+
+EMBEDDING_DIMENSIONS = 768
+
+CONFIGURATIONS = ('exact', 'hnsw', 'ivfflat', 'binary', 'numpy', 'hnsw-vector')
+DISTRIBUTIONS = ('clustered', 'random')
+
+# Instruments per cluster and the standard deviation of the noise around the
+# cluster center. A noise of 0.02 puts members of a cluster ~0.2 apart.
+CLUSTER_SIZE = 100
+CLUSTER_NOISE = 0.02
+
+# Prefix of the cache keys of synthetic embeddings
+CACHE_KEY_PREFIX = 'benchmark|'
+
+
+class BenchmarkSearch(InstrumentSearch):
+    """
+    InstrumentSearch with the backend of one configuration instead of the
+    SEARCH_BACKEND, SEARCH_BINARY_QUANTIZATION and VECTOR_INDEX_DIR settings.
+    """
+
+    def __init__(self, binary_quantization=False, index_dir=None, **kwargs):
+        super().__init__(**kwargs)
+        self.binary_quantization = binary_quantization
+        self.index_dir = index_dir
+
+    def _use_vector_index(self):
+        return self.index_dir is not None
+
+    def _use_binary_quantization(self):
+        return self.binary_quantization
+
+    def _search_vector_index(self, embedding, limit):
+        matches = vector_index.search(embedding, limit, self.MAX_DISTANCE_THRESHOLD, index_dir=self.index_dir)
+        if matches is None:
+            return None
+        return self._expand_embedding_matches(matches, limit)
+
+
+class FullPrecisionSearch(BenchmarkSearch):
+    """Search with single precision query vectors for the vector(768) column variant."""
+
+    def _query_vector(self, embedding):
+        return embedding
+
+
+@contextmanager
+def _rolled_back():
+    """Runs the block in a transaction or savepoint that is always rolled back."""
+    with transaction.atomic():
+        yield
+        transaction.set_rollback(True)
+
+
+def _model_index(name):
+    return next(index for index in InstrumentEmbedding._meta.indexes if index.name == name)
+
+
+def _embedding_table():
+    return connection.ops.quote_name(InstrumentEmbedding._meta.db_table)
+
+
+def _index_size(name):
+    with connection.cursor() as cursor:
+        cursor.execute('SELECT pg_relation_size(%s::regclass)', [name])
+        return cursor.fetchone()[0]
+
+
+def _generate_embeddings(size, distribution, rng, chunk_size):
+    """Yields chunks of L2-normalized float32 embeddings."""
+    centers = None
+    if distribution == 'clustered':
+        centers = rng.standard_normal((max(1, size // CLUSTER_SIZE), EMBEDDING_DIMENSIONS), dtype=np.float32)
+        centers /= np.linalg.norm(centers, axis=1, keepdims=True)
+
+    for start in range(0, size, chunk_size):
+        count = min(chunk_size, size - start)
+        if centers is None:
+            vectors = rng.standard_normal((count, EMBEDDING_DIMENSIONS), dtype=np.float32)
+        else:
+            labels = rng.integers(len(centers), size=count)
+            noise = rng.normal(0.0, CLUSTER_NOISE, (count, EMBEDDING_DIMENSIONS)).astype(np.float32)
+            vectors = centers[labels] + noise
+        yield vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+
+
+def load_synthetic_data(size, distribution, query_count, rng, chunk_size=2000, on_info=None):
+    """
+    Inserts size synthetic embeddings with one instrument each.
+    Returns query_count embeddings drawn from the corpus as lists of floats.
+    """
+    query_positions = set(rng.choice(size, size=min(query_count, size), replace=False).tolist())
+    queries = []
+
+    start = 0
+    for vectors in _generate_embeddings(size, distribution, rng, chunk_size):
+        embeddings = InstrumentEmbedding.objects.bulk_create([
+            InstrumentEmbedding(cache_key=f'{CACHE_KEY_PREFIX}{start + i}', embedding=vector)
+            for i, vector in enumerate(vectors)
+        ])
+        Instrument.objects.bulk_create([
+            Instrument(tuotenimi=f'Benchmark {start + i}', canonical_embedding=embedding)
+            for i, embedding in enumerate(embeddings)
+        ])
+        queries.extend(
+            vectors[i].tolist() for i in range(len(vectors)) if start + i in query_positions
+        )
+        start += len(vectors)
+        if on_info:
+            on_info(f'Loaded {start}/{size} synthetic instruments')
+
+    with connection.cursor() as cursor:
+        cursor.execute(f'ANALYZE {_embedding_table()}')
+        cursor.execute(f'ANALYZE {connection.ops.quote_name(Instrument._meta.db_table)}')
+
+    rng.shuffle(queries)
+    return queries
+
+
+def _ivfflat_lists(size):
+    # pgvector guidance: rows / 1000 up to 1M rows, sqrt(rows) above
+    return max(1, size // 1000 if size <= 1_000_000 else int(math.sqrt(size)))
+
+
+def _setup_configuration(name, size, stack):
+    """
+    Builds the indexes of the configuration. Returns (searcher, index sizes);
+    temporary files of the configuration are removed when the exit stack closes.
+    """
+    searcher = BenchmarkSearch()
+    index_names = []
+
+    with connection.schema_editor() as editor:
+        if name == 'hnsw':
+            editor.add_index(InstrumentEmbedding, _model_index('instrument_embedding_hnsw'))
+            index_names = ['instrument_embedding_hnsw']
+
+        elif name == 'binary':
+            editor.add_index(InstrumentEmbedding, _model_index('instrument_embedding_bit_hnsw'))
+            index_names = ['instrument_embedding_bit_hnsw']
+            searcher = BenchmarkSearch(binary_quantization=True)
+
+        elif name == 'ivfflat':
+            lists = _ivfflat_lists(size)
+            editor.execute(
+                f'CREATE INDEX benchmark_embedding_ivfflat ON {_embedding_table()} '
+                f'USING ivfflat (embedding halfvec_cosine_ops) WITH (lists = {lists})'
+            )
+            # pgvector guidance: sqrt(lists) probes
+            editor.execute(f'SET LOCAL ivfflat.probes = {max(1, round(math.sqrt(lists)))}')
+            index_names = ['benchmark_embedding_ivfflat']
+
+        elif name == 'hnsw-vector':
+            # Full precision variant for comparison with the halfvec column. 3 kB
+            # vectors would be moved to TOAST by default, which makes the heap look
+            # cheap to scan; keep them inline like the 1.5 kB halfvecs.
+            editor.execute(
+                f'ALTER TABLE {_embedding_table()} '
+                f'ALTER COLUMN embedding TYPE vector({EMBEDDING_DIMENSIONS}), '
+                f'ALTER COLUMN embedding SET STORAGE PLAIN'
+            )
+            # The rewrite discards the planner statistics
+            editor.execute(f'ANALYZE {_embedding_table()}')
+            full_precision_index = HnswIndex(
+                name='benchmark_embedding_hnsw_vector',
+                fields=['embedding'],
+                m=getattr(settings, 'PGVECTOR_HNSW_M', 16),
+                ef_construction=getattr(settings, 'PGVECTOR_HNSW_EF_CONSTRUCTION', 64),
+                opclasses=['vector_cosine_ops'],
+            )
+            editor.add_index(InstrumentEmbedding, full_precision_index)
+            index_names = ['benchmark_embedding_hnsw_vector']
+            searcher = FullPrecisionSearch()
+
+    index_sizes = {index: _index_size(index) for index in index_names}
+
+    if name == 'numpy':
+        index_dir = stack.enter_context(tempfile.TemporaryDirectory(prefix='benchmark-vector-index-'))
+        vector_index.rebuild_vector_index(index_dir=index_dir)
+        vectors_path, ids_path = vector_index._paths(index_dir)
+        index_sizes = {
+            vectors_path.name: vectors_path.stat().st_size,
+            ids_path.name: ids_path.stat().st_size,
+        }
+        searcher = BenchmarkSearch(index_dir=index_dir)
+
+    return searcher, index_sizes
+
+
+def _recall(results, exact_results):
+    recalls = [
+        len(set(found) & set(expected)) / len(expected)
+        for found, expected in zip(results, exact_results)
+        if expected
+    ]
+    return float(np.mean(recalls)) if recalls else None
+
+
+def run_configuration(name, size, queries, warmup, params, exact_results=None):
+    """
+    Builds the indexes of one configuration and runs every query through the
+    search query path. Must be called inside a rolled back transaction.
+    Returns (run summary, result pks per query).
+    """
+    with ExitStack() as stack:
+        build_started = time.perf_counter()
+        searcher, index_sizes = _setup_configuration(name, size, stack)
+        build_seconds = time.perf_counter() - build_started
+
+        for query in queries[:warmup]:
+            searcher._search_vectors(query, params)
+
+        latencies = []
+        results = []
+        started = time.perf_counter()
+        for query in queries:
+            query_started = time.perf_counter()
+            instruments = searcher._search_vectors(query, params)
+            latencies.append(time.perf_counter() - query_started)
+            results.append([instrument.pk for instrument in instruments])
+        elapsed = time.perf_counter() - started
+
+    latencies_ms = np.asarray(latencies) * 1000.0
+    summary = {
+        'configuration': name,
+        'size': size,
+        'index_build_seconds': round(build_seconds, 3),
+        'index_size_bytes': index_sizes,
+        'queries': len(queries),
+        'latency_ms': {
+            'mean': round(float(latencies_ms.mean()), 3),
+            'p50': round(float(np.percentile(latencies_ms, 50)), 3),
+            'p95': round(float(np.percentile(latencies_ms, 95)), 3),
+            'p99': round(float(np.percentile(latencies_ms, 99)), 3),
+            'max': round(float(latencies_ms.max()), 3),
+        },
+        'throughput_qps': round(len(queries) / elapsed, 2),
+        'mean_results': round(float(np.mean([len(pks) for pks in results])), 2),
+        'recall_vs_exact': _recall(results, exact_results) if exact_results is not None else None,
+    }
+    return summary, results
+
+
+def _server_versions():
+    with connection.cursor() as cursor:
+        cursor.execute("SELECT extversion FROM pg_extension WHERE extname = 'vector'")
+        row = cursor.fetchone()
+    return {
+        'postgresql': connection.pg_version,
+        'pgvector': row[0] if row else None,
+    }
+
+
+def run_benchmark(sizes, distribution='clustered', configurations=CONFIGURATIONS, query_count=200,
+                  warmup=20, seed=0, ef_search=None, on_info=None):
+    """
+    Runs every configuration for every corpus size and returns the report as a dict.
+    The database is left unchanged. Raises ValueError if the database has instruments
+    or embeddings.
+    """
+    if Instrument.objects.exists() or InstrumentEmbedding.objects.exists():
+        raise ValueError(
+            'The benchmark needs an empty database: it locks the instrument tables for the '
+            'whole run. Run it against a separate database (e.g. DB_NAME=<benchmark database>).'
+        )
+
+    on_info = on_info or (lambda message: None)
+    rng = np.random.default_rng(seed)
+
+    # Exact search first, it is the reference for recall
+    configurations = sorted(set(configurations), key=CONFIGURATIONS.index)
+    params = {'ef_search': ef_search} if ef_search else {}
+
+    report = {
+        'created_at': datetime.now(timezone.utc).isoformat(),
+        'versions': _server_versions(),
+        'parameters': {
+            'distribution': distribution,
+            'queries': query_count,
+            'warmup': warmup,
+            'seed': seed,
+            'result_limit': InstrumentSearch.RESULT_LIMIT,
+            'max_distance': InstrumentSearch.MAX_DISTANCE_THRESHOLD,
+            'hnsw_m': getattr(settings, 'PGVECTOR_HNSW_M', 16),
+            'hnsw_ef_construction': getattr(settings, 'PGVECTOR_HNSW_EF_CONSTRUCTION', 64),
+            'hnsw_ef_search': InstrumentSearch()._get_ef_search(params),
+            'rerank_candidates': InstrumentSearch()._get_rerank_candidates(),
+        },
+        'runs': [],
+    }
+
+    with _rolled_back():
+        with connection.schema_editor() as editor:
+            for index in InstrumentEmbedding._meta.indexes:
+                editor.remove_index(InstrumentEmbedding, index)
+
+        for size in sizes:
+            with _rolled_back():
+                on_info(f'Loading {size} synthetic instruments ({distribution})')
+                queries = load_synthetic_data(size, distribution, query_count, rng, on_info=on_info)
+
+                exact_results = None
+                for name in configurations:
+                    on_info(f'Running {name} with {size} instruments')
+                    with _rolled_back():
+                        summary, results = run_configuration(name, size, queries, warmup, params, exact_results)
+                    if name == 'exact':
+                        exact_results = results
+                    report['runs'].append(summary)
+                    on_info(
+                        f"  p50 {summary['latency_ms']['p50']} ms, p95 {summary['latency_ms']['p95']} ms, "
+                        f"p99 {summary['latency_ms']['p99']} ms, {summary['throughput_qps']} queries/s"
+                    )
+
+    return report
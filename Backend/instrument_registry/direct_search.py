@@ -0,0 +1,259 @@
+"""
+Direct Search
+
+Server-side version of the "direct" search mode of the frontend. Understands the
+same query syntax as Frontend/src/searchUtils: AND / OR / NOT (or '!'), parentheses,
+quoted phrases and field-qualified terms such as room:"B 204" or serial_number:SN-1.
+
+KEY DESIGN:
+- The query is tokenized and converted to RPN with the shunting yard algorithm
+  (NOT > AND > OR), then folded into a single Q object
+- Adjacent terms without an operator are combined with AND
+- Every term matches on case-insensitive substring OR trigram word similarity,
+  so typos like "sentirfugi" still find "Sentrifugi"
+- Both predicates are served by GIN trigram indexes on UPPER(field)
+- Results are ranked by trigram word similarity, weighted per field like the
+  Fuse.js keys of the frontend
+"""
+
+import re
+
+from django.contrib.postgres.lookups import TrigramWordSimilar
+from django.contrib.postgres.search import TrigramWordSimilarity
+from django.db.models import Q, Value, FloatField
+from django.db.models.functions import Upper
+
+
+# Same aliases as fieldAliases in Frontend/src/stores/data.js
+FIELD_ALIASES = {
+    'id': ['id'],
+    'tay_number': ['tay_numero'],
+    'tay_numero': ['tay_numero'],
+    'serial_number': ['sarjanumero'],
+    'sarjanumero': ['sarjanumero'],
+    'product_name': ['tuotenimi', 'tuotenimi_en'],
+    'tuotenimi': ['tuotenimi', 'tuotenimi_en'],
+    'brand_and_model': ['merkki_ja_malli'],
+    'merkki_ja_malli': ['merkki_ja_malli'],
+    'unit': ['yksikko'],
+    'yksikko': ['yksikko'],
+    'campus': ['kampus'],
+    'kampus': ['kampus'],
+    'building': ['rakennus'],
+    'rakennus': ['rakennus'],
+    'room': ['huone'],
+    'huone': ['huone'],
+    'responsible_person': ['vastuuhenkilo'],
+    'vastuuhenkilo': ['vastuuhenkilo'],
+    'status': ['tilanne'],
+    'tilanne': ['tilanne'],
+    'supplier': ['toimittaja'],
+    'toimittaja': ['toimittaja'],
+    'extra_information': ['lisatieto'],
+    'extra_info': ['lisatieto'],
+    'details': ['lisatieto'],
+    'lisatieto': ['lisatieto'],
+    'old_location': ['vanha_sijainti'],
+    'vanha_sijainti': ['vanha_sijainti'],
+    'delivery_date': ['toimituspvm'],
+    'toimituspvm': ['toimituspvm'],
+}
+
+# Text fields with a trigram index and their ranking weight (Fuse.js keys of the frontend).
+# Unqualified terms are matched against all of these.
+FIELD_WEIGHTS = {
+    'tuotenimi': 5.0,
+    'tuotenimi_en': 5.0,
+    'tay_numero': 4.0,
+    'merkki_ja_malli': 3.0,
+    'sarjanumero': 3.0,
+    'vastuuhenkilo': 1.0,
+    'tilanne': 1.0,
+    'vanha_sijainti': 0.8,
+    'toimittaja': 0.8,
+    'yksikko': 0.8,
+    'kampus': 0.5,
+    'rakennus': 0.5,
+    'huone': 0.5,
+    'lisatieto': 0.2,
+}
+
+TRIGRAM_FIELDS = tuple(FIELD_WEIGHTS)
+
+OPERATOR_PRECEDENCE = {'NOT': 3, 'AND': 2, 'OR': 1}
+
+_OPERATOR_RE = re.compile(r'(AND|OR|NOT)\b', re.IGNORECASE)
+_FIELD_RE = re.compile(r'([A-Za-z_][A-Za-z0-9_]*)\s*:\s*')
+_STOP_CHARS = re.compile(r'[\s()]')
+
+
+class QuerySyntaxError(ValueError):
+    pass
+
+
+def _read_quoted(text, i):
+    """Reads a quoted phrase starting at the opening quote, returns (value, next index)."""
+    end = text.find('"', i + 1)
+    if end == -1:
+        return text[i + 1:], len(text)
+    return text[i + 1:end], end + 1
+
+
+def _read_word(text, i):
+    j = i
+    while j < len(text) and not _STOP_CHARS.match(text[j]):
+        j += 1
+    return text[i:j], j
+
+
+def tokenize(query):
+    """
+    Splits the query into ('term', value, field), ('op', name) and ('paren', '(' or ')') tokens.
+    Mirrors Frontend/src/searchUtils/tokenize.js.
+    """
+    tokens = []
+    text = str(query or '')
+    i = 0
+
+    while i < len(text):
+        ch = text[i]
+
+        if ch.isspace():
+            i += 1
+        elif ch == '"':
+            value, i = _read_quoted(text, i)
+            if value:
+                tokens.append(('term', value, None))
+        elif ch in '()':
+            tokens.append(('paren', ch))
+            i += 1
+        elif ch == '!':
+            tokens.append(('op', 'NOT'))
+            i += 1
+        elif match := _OPERATOR_RE.match(text, i):
+            tokens.append(('op', match.group(1).upper()))
+            i = match.end()
+        elif match := _FIELD_RE.match(text, i):
+            field = match.group(1).lower()
+            i = match.end()
+            if i < len(text) and text[i] == '"':
+                value, i = _read_quoted(text, i)
+            else:
+                value, i = _read_word(text, i)
+            if value:
+                tokens.append(('term', value, field))
+        else:
+            value, i = _read_word(text, i)
+            if value:
+                tokens.append(('term', value, None))
+
+    return tokens
+
+
+def _insert_implicit_and(tokens):
+    """Adds AND between operands that follow each other without an operator."""
+    result = []
+    for token in tokens:
+        starts_operand = token[0] == 'term' or token == ('paren', '(') or token == ('op', 'NOT')
+        if result and starts_operand:
+            previous = result[-1]
+            if previous[0] == 'term' or previous == ('paren', ')'):
+                result.append(('op', 'AND'))
+        result.append(token)
+    return result
+
+
+def to_rpn(tokens):
+    """Dijkstra's shunting yard, as in Frontend/src/searchUtils/createRPN.js."""
+    output = []
+    operators = []
+
+    for token in _insert_implicit_and(tokens):
+        if token[0] == 'term':
+            output.append(token)
+        elif token == ('paren', '('):
+            operators.append(token)
+        elif token == ('paren', ')'):
+            while operators and operators[-1] != ('paren', '('):
+                output.append(operators.pop())
+            if operators:
+                operators.pop()
+        else:
+            while (
+                operators and operators[-1][0] == 'op'
+                # NOT is right associative: "NOT NOT a" must not pop the first NOT
+                and token[1] != 'NOT'
+                and OPERATOR_PRECEDENCE[operators[-1][1]] >= OPERATOR_PRECEDENCE[token[1]]
+            ):
+                output.append(operators.pop())
+            operators.append(token)
+
+    while operators:
+        token = operators.pop()
+        if token[0] == 'op':
+            output.append(token)
+
+    return output
+
+
+def _fields_for(field):
+    if field is None:
+        return TRIGRAM_FIELDS
+    if field not in FIELD_ALIASES:
+        raise QuerySyntaxError(f"Unknown search field: {field}")
+    return FIELD_ALIASES[field]
+
+
+def _term_q(value, fields):
+    q = Q()
+    for field in fields:
+        if field in FIELD_WEIGHTS:
+            # Both lookups compare UPPER(field), which is what the trigram indexes cover
+            q |= Q(**{f'{field}__icontains': value}) | Q(TrigramWordSimilar(Upper(field), value))
+        else:
+            q |= Q(**{f'{field}__icontains': value})
+    return q
+
+
+def build_filter(query):
+    """
+    Returns (Q, terms) for the query, where terms are the (value, fields) pairs
+    that are not negated and are used for ranking. Raises QuerySyntaxError.
+    """
+    rpn = to_rpn(tokenize(query))
+    if not rpn:
+        raise QuerySyntaxError("Empty search query")
+
+    # Stack of (Q, positive terms)
+    stack = []
+    for token in rpn:
+        if token[0] == 'term':
+            fields = _fields_for(token[2])
+            stack.append((_term_q(token[1], fields), [(token[1], fields)]))
+        elif token[1] == 'NOT':
+            if not stack:
+                raise QuerySyntaxError("NOT without an operand")
+            q, _ = stack.pop()
+            stack.append((~q, []))
+        else:
+            if len(stack) < 2:
+                raise QuerySyntaxError(f"{token[1]} without two operands")
+            right_q, right_terms = stack.pop()
+            left_q, left_terms = stack.pop()
+            q = left_q & right_q if token[1] == 'AND' else left_q | right_q
+            stack.append((q, left_terms + right_terms))
+
+    if len(stack) != 1:
+        raise QuerySyntaxError("Invalid search query")
+    return stack[0]
+
+
+def rank_expression(terms):
+    """Weighted sum of trigram word similarities of the positive terms."""
+    rank = Value(0.0, output_field=FloatField())
+    for value, fields in terms:
+        for field in fields:
+            weight = FIELD_WEIGHTS.get(field)
+            if weight:
+                rank = rank + TrigramWordSimilarity(value, Upper(field)) * weight
+    return rank
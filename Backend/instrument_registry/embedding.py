@@ -9,6 +9,7 @@ KEY DESIGN:
 - Never overwrites existing valid translations
 - Uses majority voting when multiple translations exist for the same Finnish name
 - Caches translations and embeddings to minimize API calls
+- Stores one embedding per name + brand/model in InstrumentEmbedding, shared by all matching instruments
 - Processes instruments in batches for efficiency
 - Marks failures as "Translation Failed" or None to prevent infinite retries
 """
@@ -21,7 +22,9 @@ from django.db.models import Q
 from django.conf import settings
 from simple_history.utils import bulk_update_with_history
 
-from instrument_registry.models import Instrument
+from instrument_registry.models import Instrument, InstrumentEmbedding, embedding_cache_key
+from instrument_registry.embedding_format import accept_header, decode_embeddings
+from instrument_registry.util import should_translate_to_english
 from instrument_registry.services.enrichment import (
     enrich_instruments_batch, 
     ENRICHMENT_FAILED,
@@ -29,8 +32,11 @@ from instrument_registry.services.enrichment import (
     INVALID_ENRICHMENT_VALUES
 )
 
+import logging
+import numpy as np
 import requests
 import threading
+import time
 import concurrent.futures
 from requests.adapters import HTTPAdapter
 from requests.packages.urllib3.util.retry import Retry
@@ -68,17 +74,10 @@ INVALID_TRANSLATION_VALUES = {"", TRANSLATION_FAILED}
 
 SERVICE_URL = getattr(settings, 'SEMANTIC_SERVICE_URL', 'http://semantic-search-service:8001')
 
+logger = logging.getLogger(__name__)
+
 def _get_cache_key(instrument):
-    """
-    Creates a composite key from Name + Model Info.
-    This ensures that 'Analysaattori (Model A)' is treated differently 
-    from 'Analysaattori (Model B)'.
-    """
-    name = (instrument.tuotenimi or "").strip().lower()
-    
-    brand_info = (instrument.merkki_ja_malli or "").strip().lower()
-    
-    return f"{name}|{brand_info}"
+    return embedding_cache_key(instrument.tuotenimi, instrument.merkki_ja_malli)
 
 def precompute_instrument_embeddings(
     *,
@@ -97,13 +96,13 @@ def precompute_instrument_embeddings(
         instruments_queryset = Instrument.objects.filter(
             Q(tuotenimi_en__in=INVALID_TRANSLATION_VALUES) |
             Q(enriched_description__in=INVALID_ENRICHMENT_VALUES) |
-            Q(embedding_en__isnull=True)
+            Q(canonical_embedding__isnull=True)
         )
         on_info('Processing instruments that need updates.')
 
     # Eagerly load all instruments into memory.
     # With the current dataset size (< 5000 items), the memory overhead is negligible.
-    instruments = list(instruments_queryset)
+    instruments = list(instruments_queryset.select_related('canonical_embedding').order_by('pk'))
     total_count = len(instruments)
     
     if total_count == 0:
@@ -144,10 +143,12 @@ def precompute_instrument_embeddings(
                 # MAIN THREAD: Write to Database
                 if instruments_to_update:
                     with transaction.atomic():
+                        # One row write per new cache key, not per instrument
+                        InstrumentEmbedding.objects.link(instruments_to_update)
                         bulk_update_with_history(
                             instruments_to_update,
                             Instrument,
-                            ['tuotenimi_en', 'enriched_description', 'embedding_en']
+                            ['tuotenimi_en', 'enriched_description', 'canonical_embedding']
                         )
                     on_info(f'Batch {idx + 1}/{len(batches)} saved.')
 
@@ -181,13 +182,8 @@ def _build_caches():
         key = _get_cache_key(instrument)
         key_translation_counts[key][instrument.tuotenimi_en] += 1
 
-    existing_embeddings = Instrument.objects.exclude(
-        embedding_en__isnull=True
-    ).only('tuotenimi', 'merkki_ja_malli', 'embedding_en')
-
-    for instrument in existing_embeddings:
-        cache_key = _get_cache_key(instrument)
-        embedding_cache[cache_key] = instrument.embedding_en
+    for cache_key, embedding in InstrumentEmbedding.objects.values_list('cache_key', 'embedding'):
+        embedding_cache[cache_key] = embedding
 
     existing_enrichments = Instrument.objects.exclude(
         enriched_description__in=INVALID_ENRICHMENT_VALUES
@@ -372,13 +368,7 @@ def _embed_missing(instruments_needing_embedding, session, source_caches, target
 
     if texts_to_embed:
         try:
-            response = session.post(
-                f"{SERVICE_URL}/embed_en_batch",
-                json={"texts": texts_to_embed},
-                timeout=60
-            )
-            response.raise_for_status()
-            embeddings_result = response.json().get('embeddings', [])
+            embeddings_result = _request_embeddings(session, texts_to_embed)
 
             for cache_key, embedding in zip(names_to_embed, embeddings_result, strict=True):
                 target_cache[cache_key] = embedding
@@ -393,6 +383,75 @@ def _embed_missing(instruments_needing_embedding, session, source_caches, target
             for cache_key in names_to_embed:
                 target_cache[cache_key] = None
 
+def _retry_delay(response, attempt):
+    """Seconds to wait after a 429 or 503: the Retry-After header, or exponential backoff."""
+    try:
+        delay = float(response.headers.get('Retry-After'))
+    except (TypeError, ValueError):
+        delay = 0.5 * 2 ** attempt
+    return min(delay, getattr(settings, 'SEMANTIC_SERVICE_MAX_BACKOFF', 30.0))
+
+def _request_embeddings(session, texts, attempt=0):
+    """
+    Embeds the texts with /embed_en_batch. Returns an array with one row per text.
+
+    When the service is saturated (429) the request is retried after Retry-After,
+    split in two halves so the service gets smaller jobs; a batch that is too large
+    (413) is split right away. While the model is still loading (503) the same
+    request is retried after Retry-After. Gives up after SEMANTIC_SERVICE_MAX_ATTEMPTS.
+    """
+    # float16 is lossless here: InstrumentEmbedding stores halfvec
+    response = session.post(
+        f"{SERVICE_URL}/embed_en_batch",
+        json={"texts": texts},
+        headers={'Accept': accept_header('float16')},
+        timeout=60
+    )
+
+    if response.status_code in (413, 429, 503) and attempt + 1 < getattr(settings, 'SEMANTIC_SERVICE_MAX_ATTEMPTS', 5):
+        if response.status_code in (429, 503):
+            time.sleep(_retry_delay(response, attempt))
+        if response.status_code == 503 or len(texts) == 1:
+            return _request_embeddings(session, texts, attempt + 1)
+        middle = len(texts) // 2
+        return np.concatenate([
+            _request_embeddings(session, texts[:middle], attempt + 1),
+            _request_embeddings(session, texts[middle:], attempt + 1),
+        ])
+
+    response.raise_for_status()
+    embeddings = decode_embeddings(response, 'embeddings')
+    return [] if embeddings is None else embeddings
+
+def fetch_query_embeddings(texts):
+    """
+    Embeds search queries with the batch endpoint of the semantic service, one
+    embedding (None on failure) per text. Finnish queries are translated first,
+    like in the single query search. Not cached, see query_cache.get_query_embeddings.
+    """
+    try:
+        response = requests.post(
+            f"{SERVICE_URL}/embed_query_batch",
+            json={'queries': [
+                {'text': text, 'translate': should_translate_to_english(text)}
+                for text in texts
+            ]},
+            timeout=getattr(settings, 'SEMANTIC_SERVICE_TIMEOUT', 20.0)
+        )
+        response.raise_for_status()
+        results = response.json()['results']
+        if len(results) != len(texts):
+            raise ValueError("wrong number of results")
+        return [result.get('embedding') for result in results]
+
+    except requests.Timeout:
+        logger.warning(f"Semantic search timeout for a batch of {len(texts)} queries")
+    except requests.RequestException as e:
+        logger.error(f"Semantic search connection error: {e}")
+    except (ValueError, KeyError, TypeError):
+        logger.error("Semantic search returned an invalid batch response")
+    return [None] * len(texts)
+
 def _build_instruments_to_update(instrument_states, embedding_cache):
     """
     Builds list of instruments to update with final translations, enrichments and embeddings.
@@ -0,0 +1,59 @@
+"""
+Embedding Response Decoding
+
+Client side of the compact embedding formats of the semantic service
+(semantic_search_service/embedding_format.py). Asking for them with the Accept
+header skips encoding and parsing ~15 KB of JSON floats per embedding.
+
+KEY DESIGN:
+- Raw binary bodies (application/x-embeddings) are decoded zero-copy with
+  np.frombuffer; the shape comes from the X-Embedding-Shape header
+- base64-in-JSON values and plain JSON float lists are decoded too, so the
+  client works with any service version
+- Works with both requests and httpx responses
+- float16 transfers are lossless for vectors stored as halfvec; query vectors
+  use float32
+"""
+
+import base64
+
+import numpy as np
+
+EMBEDDINGS_MEDIA_TYPE = 'application/x-embeddings'
+DTYPES = {'float32': '<f4', 'float16': '<f2'}
+
+
+def accept_header(dtype='float32'):
+    """Accept header asking for raw embeddings, falling back to JSON."""
+    return f'{EMBEDDINGS_MEDIA_TYPE}; dtype={dtype}, application/json;q=0.5'
+
+
+def _parse_content_type(value):
+    media_type, *params = str(value or '').split(';')
+    parsed = {}
+    for param in params:
+        name, _, param_value = param.partition('=')
+        parsed[name.strip().lower()] = param_value.strip().strip('"').lower()
+    return media_type.strip().lower(), parsed
+
+
+def decode_embeddings(response, key):
+    """
+    Returns the embedding (1-d) or embeddings (2-d) of a semantic service
+    response as a NumPy array, or None if the response has no embedding.
+    key is the JSON key of the embeddings in the JSON formats.
+    """
+    media_type, params = _parse_content_type(response.headers.get('Content-Type'))
+    if media_type == EMBEDDINGS_MEDIA_TYPE:
+        shape = tuple(int(size) for size in response.headers['X-Embedding-Shape'].split(','))
+        if shape == (0,):
+            return None
+        return np.frombuffer(response.content, dtype=DTYPES[params.get('dtype', 'float32')]).reshape(shape)
+
+    value = response.json().get(key)
+    if value is None:
+        return None
+    if isinstance(value, dict):
+        data = base64.b64decode(value['data'])
+        return np.frombuffer(data, dtype=DTYPES[value['dtype']]).reshape(value['shape'])
+    return np.asarray(value, dtype=np.float32)
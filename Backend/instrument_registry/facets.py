@@ -0,0 +1,69 @@
+"""
+Facet Counts
+
+Counts of the distinct values of the filter fields within a set of instruments,
+used to build the filter dropdowns of the frontend next to a search result or
+instrument list.
+
+KEY DESIGN:
+- All fields are counted in a single statement with GROUPING SETS, one set per
+  field, instead of one query (or one Python pass over the table) per field
+- The instrument set is any Instrument queryset, used as a derived table, so
+  search results, filtered lists and the whole table go through the same code
+- GROUPING() tells which set a row belongs to, so empty and NULL values are
+  counted like any other value
+"""
+
+from django.core.exceptions import EmptyResultSet
+from django.db import connection
+
+from instrument_registry.models import Instrument
+
+FACET_FIELDS = ('yksikko', 'kampus', 'rakennus', 'huone', 'vastuuhenkilo', 'tilanne')
+
+# Fields every search view filters by exactly (?huone=B202), applied in SQL together with the ranking
+FILTER_FIELDS = ('yksikko', 'kampus', 'huone', 'vastuuhenkilo', 'tilanne')
+
+
+def wants_facets(params):
+    """True if the request asks for facet counts (?facets=true)."""
+    return params.get('facets', '').lower() in ('1', 'true')
+
+
+def filters_from_params(params):
+    """{field: value} of the filter fields given in the request."""
+    return {field: params[field] for field in FILTER_FIELDS if params.get(field)}
+
+
+def facet_counts(queryset, fields=FACET_FIELDS):
+    """
+    Returns {field: [{'value': value, 'count': count}]} for the instruments of
+    the queryset, most common values first.
+    """
+    facets = {field: [] for field in fields}
+    columns = [connection.ops.quote_name(Instrument._meta.get_field(field).column) for field in fields]
+    try:
+        subquery, params = queryset.values(*fields).query.sql_with_params()
+    except EmptyResultSet:
+        # e.g. pk__in=[] for an empty search result
+        return facets
+
+    sql = (
+        f"SELECT GROUPING({', '.join(columns)}), {', '.join(columns)}, COUNT(*) "
+        f"FROM ({subquery}) AS facet_source "
+        f"GROUP BY GROUPING SETS ({', '.join(f'({column})' for column in columns)})"
+    )
+    with connection.cursor() as cursor:
+        cursor.execute(sql, params)
+        rows = cursor.fetchall()
+
+    # GROUPING() has a 1 bit for every column that is not grouped in the row's set,
+    # the first column being the most significant bit.
+    all_bits = (1 << len(fields)) - 1
+    for grouping, *values, count in rows:
+        index = len(fields) - (all_bits ^ grouping).bit_length()
+        facets[fields[index]].append({'value': values[index], 'count': count})
+
+    for counts in facets.values():
+        counts.sort(key=lambda item: (-item['count'], item['value'] or ''))
+    return facets
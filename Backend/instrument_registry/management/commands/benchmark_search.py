@@ -0,0 +1,79 @@
+import json
+
+from django.core.management.base import BaseCommand, CommandError
+from instrument_registry.benchmark import run_benchmark, CONFIGURATIONS, DISTRIBUTIONS
+
+class Command(BaseCommand):
+    help = (
+        'Benchmarks semantic search latency and throughput on synthetic instruments '
+        'for each backend and index configuration. Refuses to run unless the database has no '
+        'instruments or embeddings: the run locks those tables, so use a separate benchmark '
+        'database (e.g. DB_NAME=<benchmark database>), never the production one. '
+        'The database is left unchanged.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--sizes',
+            type=int,
+            nargs='+',
+            default=[10000],
+            help='Numbers of synthetic instruments, e.g. 10000 100000 1000000.'
+        )
+        parser.add_argument(
+            '--distribution',
+            choices=DISTRIBUTIONS,
+            default='clustered',
+            help='Distribution of the synthetic embeddings.'
+        )
+        parser.add_argument(
+            '--configurations',
+            nargs='+',
+            choices=CONFIGURATIONS,
+            default=list(CONFIGURATIONS),
+            help='Search configurations to measure. Recall is reported against "exact".'
+        )
+        parser.add_argument(
+            '--queries',
+            type=int,
+            default=200,
+            help='Number of measured queries per configuration, drawn from the corpus.'
+        )
+        parser.add_argument(
+            '--warmup',
+            type=int,
+            default=20,
+            help='Number of unmeasured queries run before measuring.'
+        )
+        parser.add_argument(
+            '--ef-search',
+            type=int,
+            default=None,
+            help='HNSW ef_search, defaults to PGVECTOR_HNSW_EF_SEARCH.'
+        )
+        parser.add_argument('--seed', type=int, default=0, help='Random seed of the synthetic data.')
+        parser.add_argument(
+            '--output',
+            default='search-benchmark.json',
+            help='Path of the JSON report.'
+        )
+
+    def handle(self, *args, **options):
+        try:
+            report = run_benchmark(
+                sizes=options['sizes'],
+                distribution=options['distribution'],
+                configurations=options['configurations'],
+                query_count=options['queries'],
+                warmup=options['warmup'],
+                seed=options['seed'],
+                ef_search=options['ef_search'],
+                on_info=lambda message: self.stdout.write(message),
+            )
+        except ValueError as exc:
+            raise CommandError(str(exc))
+
+        with open(options['output'], 'w') as f:
+            json.dump(report, f, indent=2)
+
+        self.stdout.write(self.style.SUCCESS(f"Benchmark report written to {options['output']}"))
@@ -0,0 +1,17 @@
+from django.core.management.base import BaseCommand
+from instrument_registry.vector_index import rebuild_vector_index
+
+class Command(BaseCommand):
+    help = 'Builds the memory-mapped vector index used by the numpy search backend'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--chunk-size',
+            type=int,
+            default=2000,
+            help='Number of embeddings fetched from the database at a time.'
+        )
+
+    def handle(self, *args, **options):
+        count = rebuild_vector_index(chunk_size=options['chunk_size'])
+        self.stdout.write(self.style.SUCCESS(f'Vector index built with {count} embeddings.'))
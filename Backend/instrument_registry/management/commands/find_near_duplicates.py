@@ -0,0 +1,51 @@
+from django.core.management.base import BaseCommand
+from instrument_registry.near_duplicates import find_near_duplicates
+
+class Command(BaseCommand):
+    help = (
+        'Stores the nearest neighbours of every instrument below a distance threshold '
+        'in SimilarInstrument. Only rows affected by changes since the last run are '
+        'recomputed unless --full is given.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--k',
+            type=int,
+            default=None,
+            help='Number of neighbours stored per instrument, defaults to NEAR_DUPLICATE_K.'
+        )
+        parser.add_argument(
+            '--max-distance',
+            type=float,
+            default=None,
+            help='Cosine distance threshold, defaults to NEAR_DUPLICATE_MAX_DISTANCE.'
+        )
+        parser.add_argument(
+            '--tile-size',
+            type=int,
+            default=2048,
+            help='Rows and columns per distance matrix tile; memory use is tile size squared.'
+        )
+        # Also refills the lists that lost a deleted instrument
+        parser.add_argument(
+            '--full',
+            action='store_true',
+            help='Recompute all instruments instead of only the changed ones.'
+        )
+
+    def handle(self, *args, **options):
+        summary = find_near_duplicates(
+            k=options['k'],
+            max_distance=options['max_distance'],
+            tile_size=options['tile_size'],
+            full=options['full'],
+            on_info=lambda message: self.stdout.write(message),
+        )
+        self.stdout.write(self.style.SUCCESS(
+            f'\n=== Summary ===\n'
+            f'Full run: {summary["full"]}\n'
+            f'Recomputed embeddings: {summary["recomputed"]}\n'
+            f'Merged embeddings: {summary["merged"]}\n'
+            f'Pairs written: {summary["pairs_written"]}'
+        ))
@@ -2,7 +2,8 @@ from django.core.management.base import BaseCommand
 from instrument_registry.util import csv_to_model, clean_whitespace
 from instrument_registry.models import Instrument
 from instrument_registry.serializers import InstrumentCSVSerializer
-from pgvector.django import VectorField
+from django.db import models
+from django.contrib.postgres.search import SearchVectorField
 from datetime import date
 import csv
 import re
@@ -103,8 +104,11 @@ def _to_Instrument(row: dict) -> Instrument:
 	for f in Instrument._meta.get_fields():
 		if f.name == "id": # skip id since it's automatically assigned
 			continue
-		# Skip vector fields; they are filled after embeddings are computed
-		if isinstance(f, VectorField):
+		# Skip the shared embedding; it is linked after embeddings are computed
+		if isinstance(f, models.ForeignKey):
+			continue
+		# Skip the full-text document; it is maintained by a database trigger
+		if isinstance(f, SearchVectorField):
 			continue
 		# Skip reverse relationships (e.g., 'attachments' from InstrumentAttachment)
 		if f.auto_created and f.one_to_many:
@@ -0,0 +1,79 @@
+import time
+
+import requests
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from instrument_registry.query_cache import prune_other_versions
+from instrument_registry.query_log import prune_query_log, warm_query_cache
+
+class Command(BaseCommand):
+    help = (
+        'Pre-embeds the most frequent logged search queries that have no cached '
+        'embedding for the current model version. Run after deploys and model '
+        'changes, and periodically (e.g. from cron) to follow new popular queries.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--top',
+            type=int,
+            default=None,
+            help='Number of most frequent queries to warm, defaults to QUERY_CACHE_WARM_TOP.'
+        )
+        parser.add_argument(
+            '--days',
+            type=int,
+            default=None,
+            help='Only count queries of the last days, defaults to QUERY_CACHE_WARM_DAYS.'
+        )
+        # At deploy time the semantic service may still be loading its models
+        parser.add_argument(
+            '--wait',
+            type=int,
+            default=0,
+            help='Seconds to wait for the semantic service to become healthy.'
+        )
+        parser.add_argument(
+            '--prune',
+            action='store_true',
+            help=(
+                'Also delete log entries older than SEARCH_QUERY_LOG_RETENTION_DAYS and cached '
+                'embeddings of other model versions unused for QUERY_EMBEDDING_OLD_VERSION_RETENTION_DAYS.'
+            )
+        )
+
+    def handle(self, *args, **options):
+        if options['wait']:
+            self._wait_for_service(options['wait'])
+
+        summary = warm_query_cache(
+            top=options['top'],
+            days=options['days'],
+            on_info=lambda message: self.stdout.write(message),
+        )
+        if options['prune']:
+            deleted = prune_query_log(getattr(settings, 'SEARCH_QUERY_LOG_RETENTION_DAYS', 90))
+            self.stdout.write(f'Deleted {deleted} old query log entries')
+            deleted = prune_other_versions(getattr(settings, 'QUERY_EMBEDDING_OLD_VERSION_RETENTION_DAYS', 7))
+            self.stdout.write(f'Deleted {deleted} cached embeddings of other model versions')
+
+        self.stdout.write(self.style.SUCCESS(
+            f'\n=== Summary ===\n'
+            f'Popular queries: {summary["popular"]}\n'
+            f'Already cached: {summary["already_cached"]}\n'
+            f'Warmed: {summary["warmed"]}\n'
+            f'Failed: {summary["failed"]}'
+        ))
+
+    def _wait_for_service(self, timeout):
+        url = f"{getattr(settings, 'SEMANTIC_SERVICE_URL', 'http://semantic-search-service:8001')}/healthz"
+        deadline = time.monotonic() + timeout
+        while True:
+            try:
+                if requests.get(url, timeout=5).ok:
+                    return
+            except requests.RequestException:
+                pass
+            if time.monotonic() >= deadline:
+                raise CommandError(f'Semantic service not healthy after {timeout} seconds')
+            time.sleep(2)
@@ -0,0 +1,18 @@
+# Generated by Django 4.2.8 on 2026-10-16 22:30
+
+from django.db import migrations
+import pgvector.django.indexes
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('instrument_registry', '0013_instrument_enriched_description'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='instrument',
+            index=pgvector.django.indexes.HnswIndex(ef_construction=64, fields=['embedding_en'], m=16, name='instrument_embedding_en_hnsw', opclasses=['vector_cosine_ops']),
+        ),
+    ]
@@ -0,0 +1,30 @@
+# Generated by Django 4.2.8 on 2026-10-16 22:35
+
+from django.db import migrations, models
+import pgvector.django.vector
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('instrument_registry', '0014_instrument_embedding_en_hnsw'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='QueryEmbedding',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('query_text', models.CharField(max_length=500)),
+                ('model_version', models.CharField(max_length=200)),
+                ('embedding', pgvector.django.vector.VectorField(dimensions=768)),
+                ('hit_count', models.PositiveIntegerField(default=0)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('last_used_at', models.DateTimeField(auto_now=True)),
+            ],
+        ),
+        migrations.AddConstraint(
+            model_name='queryembedding',
+            constraint=models.UniqueConstraint(fields=('query_text', 'model_version'), name='unique_query_embedding'),
+        ),
+    ]
@@ -0,0 +1,55 @@
+# Generated by Django 4.2.8 on 2026-10-16 22:36
+
+import django.contrib.postgres.indexes
+import django.contrib.postgres.search
+from django.db import migrations
+
+# Finnish and English stemming for names and descriptions, 'simple' (no stemming)
+# for brand/model and serial numbers so codes like "LC-480" match exactly.
+CREATE_TRIGGER_SQL = """
+CREATE FUNCTION instrument_search_vector_update() RETURNS trigger AS $$
+BEGIN
+    NEW.search_vector :=
+        setweight(to_tsvector('finnish', coalesce(NEW.tuotenimi, '')), 'A') ||
+        setweight(to_tsvector('english', coalesce(NEW.tuotenimi_en, '')), 'A') ||
+        setweight(to_tsvector('simple', coalesce(NEW.merkki_ja_malli, '')), 'B') ||
+        setweight(to_tsvector('simple', coalesce(NEW.sarjanumero, '')), 'B') ||
+        setweight(to_tsvector('finnish', coalesce(NEW.lisatieto, '')), 'C') ||
+        setweight(to_tsvector('english', coalesce(NEW.enriched_description, '')), 'D');
+    RETURN NEW;
+END
+$$ LANGUAGE plpgsql;
+
+CREATE TRIGGER instrument_search_vector_trigger
+BEFORE INSERT OR UPDATE OF tuotenimi, tuotenimi_en, merkki_ja_malli, sarjanumero, lisatieto, enriched_description
+ON instrument_registry_instrument
+FOR EACH ROW EXECUTE FUNCTION instrument_search_vector_update();
+
+-- Backfill existing rows through the trigger
+UPDATE instrument_registry_instrument SET tuotenimi = tuotenimi;
+"""
+
+DROP_TRIGGER_SQL = """
+DROP TRIGGER IF EXISTS instrument_search_vector_trigger ON instrument_registry_instrument;
+DROP FUNCTION IF EXISTS instrument_search_vector_update();
+"""
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('instrument_registry', '0015_queryembedding'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='instrument',
+            name='search_vector',
+            field=django.contrib.postgres.search.SearchVectorField(editable=False, null=True),
+        ),
+        migrations.AddIndex(
+            model_name='instrument',
+            index=django.contrib.postgres.indexes.GinIndex(fields=['search_vector'], name='instrument_search_vector_gin'),
+        ),
+        migrations.RunSQL(CREATE_TRIGGER_SQL, DROP_TRIGGER_SQL),
+    ]
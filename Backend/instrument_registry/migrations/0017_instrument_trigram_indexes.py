@@ -0,0 +1,73 @@
+# Generated by Django 4.2.8 on 2026-10-16 22:42
+
+import django.contrib.postgres.indexes
+from django.contrib.postgres.operations import TrigramExtension
+from django.db import migrations
+import django.db.models.functions.text
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('instrument_registry', '0016_instrument_search_vector'),
+    ]
+
+    operations = [
+        TrigramExtension(),
+        migrations.AddIndex(
+            model_name='instrument',
+            index=django.contrib.postgres.indexes.GinIndex(django.contrib.postgres.indexes.OpClass(django.db.models.functions.text.Upper('tay_numero'), name='gin_trgm_ops'), name='inst_tay_numero_trgm'),
+        ),
+        migrations.AddIndex(
+            model_name='instrument',
+            index=django.contrib.postgres.indexes.GinIndex(django.contrib.postgres.indexes.OpClass(django.db.models.functions.text.Upper('tuotenimi'), name='gin_trgm_ops'), name='inst_tuotenimi_trgm'),
+        ),
+        migrations.AddIndex(
+            model_name='instrument',
+            index=django.contrib.postgres.indexes.GinIndex(django.contrib.postgres.indexes.OpClass(django.db.models.functions.text.Upper('tuotenimi_en'), name='gin_trgm_ops'), name='inst_tuotenimi_en_trgm'),
+        ),
+        migrations.AddIndex(
+            model_name='instrument',
+            index=django.contrib.postgres.indexes.GinIndex(django.contrib.postgres.indexes.OpClass(django.db.models.functions.text.Upper('merkki_ja_malli'), name='gin_trgm_ops'), name='inst_merkki_ja_malli_trgm'),
+        ),
+        migrations.AddIndex(
+            model_name='instrument',
+            index=django.contrib.postgres.indexes.GinIndex(django.contrib.postgres.indexes.OpClass(django.db.models.functions.text.Upper('sarjanumero'), name='gin_trgm_ops'), name='inst_sarjanumero_trgm'),
+        ),
+        migrations.AddIndex(
+            model_name='instrument',
+            index=django.contrib.postgres.indexes.GinIndex(django.contrib.postgres.indexes.OpClass(django.db.models.functions.text.Upper('yksikko'), name='gin_trgm_ops'), name='inst_yksikko_trgm'),
+        ),
+        migrations.AddIndex(
+            model_name='instrument',
+            index=django.contrib.postgres.indexes.GinIndex(django.contrib.postgres.indexes.OpClass(django.db.models.functions.text.Upper('kampus'), name='gin_trgm_ops'), name='inst_kampus_trgm'),
+        ),
+        migrations.AddIndex(
+            model_name='instrument',
+            index=django.contrib.postgres.indexes.GinIndex(django.contrib.postgres.indexes.OpClass(django.db.models.functions.text.Upper('rakennus'), name='gin_trgm_ops'), name='inst_rakennus_trgm'),
+        ),
+        migrations.AddIndex(
+            model_name='instrument',
+            index=django.contrib.postgres.indexes.GinIndex(django.contrib.postgres.indexes.OpClass(django.db.models.functions.text.Upper('huone'), name='gin_trgm_ops'), name='inst_huone_trgm'),
+        ),
+        migrations.AddIndex(
+            model_name='instrument',
+            index=django.contrib.postgres.indexes.GinIndex(django.contrib.postgres.indexes.OpClass(django.db.models.functions.text.Upper('vastuuhenkilo'), name='gin_trgm_ops'), name='inst_vastuuhenkilo_trgm'),
+        ),
+        migrations.AddIndex(
+            model_name='instrument',
+            index=django.contrib.postgres.indexes.GinIndex(django.contrib.postgres.indexes.OpClass(django.db.models.functions.text.Upper('toimittaja'), name='gin_trgm_ops'), name='inst_toimittaja_trgm'),
+        ),
+        migrations.AddIndex(
+            model_name='instrument',
+            index=django.contrib.postgres.indexes.GinIndex(django.contrib.postgres.indexes.OpClass(django.db.models.functions.text.Upper('lisatieto'), name='gin_trgm_ops'), name='inst_lisatieto_trgm'),
+        ),
+        migrations.AddIndex(
+            model_name='instrument',
+            index=django.contrib.postgres.indexes.GinIndex(django.contrib.postgres.indexes.OpClass(django.db.models.functions.text.Upper('vanha_sijainti'), name='gin_trgm_ops'), name='inst_vanha_sijainti_trgm'),
+        ),
+        migrations.AddIndex(
+            model_name='instrument',
+            index=django.contrib.postgres.indexes.GinIndex(django.contrib.postgres.indexes.OpClass(django.db.models.functions.text.Upper('tilanne'), name='gin_trgm_ops'), name='inst_tilanne_trgm'),
+        ),
+    ]
@@ -0,0 +1,84 @@
+# Generated by Django 4.2.8 on 2026-10-16 22:45
+
+from django.db import migrations, models
+import django.db.models.deletion
+import pgvector.django.indexes
+import pgvector.django.vector
+
+
+def _cache_key(instrument):
+    # Same as models.embedding_cache_key at the time of this migration
+    name = (instrument.tuotenimi or "").strip().lower()
+    brand_info = (instrument.merkki_ja_malli or "").strip().lower()
+    return f"{name}|{brand_info}"
+
+
+def move_embeddings_to_shared_rows(apps, schema_editor):
+    """
+    Creates one InstrumentEmbedding per cache key from the per-instrument vectors
+    and links every instrument with that key to it, including instruments that
+    did not have an embedding yet.
+    """
+    Instrument = apps.get_model('instrument_registry', 'Instrument')
+    InstrumentEmbedding = apps.get_model('instrument_registry', 'InstrumentEmbedding')
+
+    embeddings = {}
+    for instrument in Instrument.objects.exclude(embedding_en__isnull=True).order_by('pk').iterator():
+        embeddings.setdefault(_cache_key(instrument), instrument.embedding_en)
+
+    InstrumentEmbedding.objects.bulk_create(
+        [InstrumentEmbedding(cache_key=key, embedding=embedding) for key, embedding in embeddings.items()],
+        batch_size=500,
+    )
+    rows = {row.cache_key: row.pk for row in InstrumentEmbedding.objects.only('pk', 'cache_key')}
+
+    instruments = list(Instrument.objects.only('pk', 'tuotenimi', 'merkki_ja_malli'))
+    for instrument in instruments:
+        instrument.canonical_embedding_id = rows.get(_cache_key(instrument))
+    Instrument.objects.bulk_update(instruments, ['canonical_embedding'], batch_size=500)
+
+
+def copy_shared_embeddings_back(apps, schema_editor):
+    Instrument = apps.get_model('instrument_registry', 'Instrument')
+
+    instruments = list(Instrument.objects.exclude(canonical_embedding__isnull=True).select_related('canonical_embedding'))
+    for instrument in instruments:
+        instrument.embedding_en = instrument.canonical_embedding.embedding
+    Instrument.objects.bulk_update(instruments, ['embedding_en'], batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('instrument_registry', '0017_instrument_trigram_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='InstrumentEmbedding',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('cache_key', models.CharField(max_length=255, unique=True)),
+                ('embedding', pgvector.django.vector.VectorField(dimensions=768)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+        ),
+        migrations.AddField(
+            model_name='instrument',
+            name='canonical_embedding',
+            field=models.ForeignKey(blank=True, editable=False, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='instruments', to='instrument_registry.instrumentembedding'),
+        ),
+        migrations.RunPython(move_embeddings_to_shared_rows, copy_shared_embeddings_back),
+        migrations.RemoveIndex(
+            model_name='instrument',
+            name='instrument_embedding_en_hnsw',
+        ),
+        migrations.RemoveField(
+            model_name='instrument',
+            name='embedding_en',
+        ),
+        migrations.AddIndex(
+            model_name='instrumentembedding',
+            index=pgvector.django.indexes.HnswIndex(ef_construction=64, fields=['embedding'], m=16, name='instrument_embedding_hnsw', opclasses=['vector_cosine_ops']),
+        ),
+    ]
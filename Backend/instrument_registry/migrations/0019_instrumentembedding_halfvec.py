@@ -0,0 +1,36 @@
+# Generated by Django 4.2.8 on 2026-10-16 22:50
+
+import django.contrib.postgres.indexes
+from django.db import migrations
+import instrument_registry.models
+import pgvector.django.halfvec
+import pgvector.django.indexes
+
+# The column is converted in place (USING embedding::halfvec(768)) and both indexes
+# are built from the stored vectors, so no embeddings are recomputed.
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('instrument_registry', '0018_instrumentembedding'),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='instrumentembedding',
+            name='instrument_embedding_hnsw',
+        ),
+        migrations.AlterField(
+            model_name='instrumentembedding',
+            name='embedding',
+            field=pgvector.django.halfvec.HalfVectorField(dimensions=768),
+        ),
+        migrations.AddIndex(
+            model_name='instrumentembedding',
+            index=pgvector.django.indexes.HnswIndex(ef_construction=64, fields=['embedding'], m=16, name='instrument_embedding_hnsw', opclasses=['halfvec_cosine_ops']),
+        ),
+        migrations.AddIndex(
+            model_name='instrumentembedding',
+            index=pgvector.django.indexes.HnswIndex(django.contrib.postgres.indexes.OpClass(instrument_registry.models.BinaryQuantize('embedding'), name='bit_hamming_ops'), ef_construction=64, m=16, name='instrument_embedding_bit_hnsw'),
+        ),
+    ]
@@ -0,0 +1,31 @@
+# Generated by Django 4.2.8 on 2026-10-16 23:05
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('instrument_registry', '0019_instrumentembedding_halfvec'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SimilarInstrument',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('distance', models.FloatField()),
+                ('computed_at', models.DateTimeField()),
+                ('instrument', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='similar_instruments', to='instrument_registry.instrument')),
+                ('similar', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='instrument_registry.instrument')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['instrument', 'distance'], name='similar_instrument_distance'), models.Index(fields=['computed_at'], name='similar_instrument_computed')],
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='similarinstrument',
+            constraint=models.UniqueConstraint(fields=('instrument', 'similar'), name='unique_similar_instrument'),
+        ),
+    ]
@@ -0,0 +1,33 @@
+# Generated by Django 4.2.8 on 2026-10-16 23:09
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('instrument_registry', '0020_similarinstrument'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='instrument',
+            index=models.Index(fields=['yksikko'], name='inst_yksikko_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='instrument',
+            index=models.Index(fields=['kampus'], name='inst_kampus_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='instrument',
+            index=models.Index(fields=['huone'], name='inst_huone_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='instrument',
+            index=models.Index(fields=['vastuuhenkilo'], name='inst_vastuuhenkilo_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='instrument',
+            index=models.Index(fields=['tilanne'], name='inst_tilanne_idx'),
+        ),
+    ]
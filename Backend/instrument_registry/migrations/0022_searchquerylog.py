@@ -0,0 +1,27 @@
+# Generated by Django 4.2.8 on 2026-10-16 23:40
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('instrument_registry', '0021_instrument_filter_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SearchQueryLog',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('query_text', models.CharField(max_length=500)),
+                ('latency_ms', models.FloatField()),
+                ('result_count', models.PositiveIntegerField()),
+                ('embedding_cached', models.BooleanField()),
+                ('created_at', models.DateTimeField()),
+            ],
+            options={
+                'indexes': [models.Index(fields=['created_at'], name='search_query_log_created_at')],
+            },
+        ),
+    ]
@@ -0,0 +1,42 @@
+# Generated by Django 4.2.8 on 2026-10-17 00:14
+
+from django.db import migrations, models
+from django.db.models import Max
+
+
+def record_previous_run(apps, schema_editor):
+    """Keeps the next run incremental: the pairs stored so far came from a run started at their computed_at."""
+    SimilarInstrument = apps.get_model('instrument_registry', 'SimilarInstrument')
+    NearDuplicateRun = apps.get_model('instrument_registry', 'NearDuplicateRun')
+    last = SimilarInstrument.objects.aggregate(last=Max('computed_at'))['last']
+    if last is not None:
+        NearDuplicateRun.objects.create(
+            started_at=last, finished_at=last, full=False, recomputed=0, merged=0,
+            pairs_written=SimilarInstrument.objects.filter(computed_at=last).count(),
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('instrument_registry', '0022_searchquerylog'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='NearDuplicateRun',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('started_at', models.DateTimeField()),
+                ('finished_at', models.DateTimeField()),
+                ('full', models.BooleanField()),
+                ('recomputed', models.PositiveIntegerField()),
+                ('merged', models.PositiveIntegerField()),
+                ('pairs_written', models.PositiveIntegerField()),
+            ],
+            options={
+                'indexes': [models.Index(fields=['started_at'], name='near_duplicate_run_started')],
+            },
+        ),
+        migrations.RunPython(record_previous_run, migrations.RunPython.noop),
+    ]
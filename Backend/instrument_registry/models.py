@@ -1,5 +1,9 @@
-from django.db import models
-from pgvector.django import VectorField
+from django.db import models, transaction
+from django.contrib.postgres.indexes import GinIndex, OpClass
+from django.db.models import Func
+from django.db.models.functions import Upper
+from django.contrib.postgres.search import SearchVectorField
+from pgvector.django import VectorField, HalfVectorField, BitField, HnswIndex
 from simple_history.models import HistoricalRecords
 from django.contrib.auth.models import AbstractBaseUser, BaseUserManager, PermissionsMixin
 from datetime import datetime, timedelta
@@ -7,6 +11,15 @@ from django.conf import settings
 import string
 import secrets
 
+# Text fields searched by the direct search, see direct_search.py
+TRIGRAM_INDEXED_FIELDS = [
+    'tay_numero', 'tuotenimi', 'tuotenimi_en', 'merkki_ja_malli', 'sarjanumero', 'yksikko', 'kampus',
+    'rakennus', 'huone', 'vastuuhenkilo', 'toimittaja', 'lisatieto', 'vanha_sijainti', 'tilanne',
+]
+
+# Fields used as exact-match search filters
+FILTER_INDEXED_FIELDS = ['yksikko', 'kampus', 'huone', 'vastuuhenkilo', 'tilanne']
+
 # Abstract model for tracking the username for instrument history
 class UsernameHistoricalModel(models.Model):
     history_username = models.CharField(max_length=150, null=True, blank=True)
@@ -40,12 +53,260 @@ class Instrument(models.Model):
     seuraava_huolto = models.DateField(null=True, blank=True)
     tilanne = models.CharField(max_length=100)
     enriched_description = models.TextField(max_length=400, default="", blank=True)
-    embedding_en = VectorField(blank=True, null=True, dimensions=768)
+    # Embedding shared by all instruments with the same name and brand/model, see embedding_en
+    canonical_embedding = models.ForeignKey(
+        'InstrumentEmbedding',
+        null=True,
+        blank=True,
+        editable=False,
+        on_delete=models.SET_NULL,
+        related_name='instruments',
+    )
+    # Weighted full-text document, maintained by a database trigger (see migration 0016)
+    search_vector = SearchVectorField(null=True, editable=False)
     history = HistoricalRecords(
         bases=[UsernameHistoricalModel],
-        excluded_fields=['embedding_en', 'enriched_description'],
+        excluded_fields=['canonical_embedding', 'enriched_description', 'search_vector'],
     )
 
+    class Meta:
+        indexes = [
+            GinIndex(name='instrument_search_vector_gin', fields=['search_vector']),
+            # Trigram indexes for substring (icontains) and fuzzy direct search.
+            # icontains compiles to UPPER(field) LIKE ..., so the index is on the same expression.
+            *[
+                GinIndex(OpClass(Upper(field), name='gin_trgm_ops'), name=f'inst_{field}_trgm')
+                for field in TRIGRAM_INDEXED_FIELDS
+            ],
+            # B-tree indexes for the exact-match filters of semantic and direct search
+            *[
+                models.Index(fields=[field], name=f'inst_{field}_idx')
+                for field in FILTER_INDEXED_FIELDS
+            ],
+        ]
+
+    @property
+    def embedding_key(self):
+        return embedding_cache_key(self.tuotenimi, self.merkki_ja_malli)
+
+    @property
+    def embedding_en(self):
+        """The English embedding, shared with every instrument that has the same embedding_key."""
+        pending = self.__dict__.get('_pending_embedding', _UNSET)
+        if pending is not _UNSET:
+            return pending
+        if self.canonical_embedding_id is None:
+            return None
+        return self.canonical_embedding.embedding.to_numpy().astype('float32')
+
+    @embedding_en.setter
+    def embedding_en(self, value):
+        # Written to the shared InstrumentEmbedding row on save(); None unlinks this instrument
+        self.__dict__['_pending_embedding'] = value
+
+    def save(self, *args, **kwargs):
+        previous_embedding_id = self.canonical_embedding_id
+        if '_pending_embedding' not in self.__dict__:
+            self._follow_embedding_key()
+        InstrumentEmbedding.objects.link([self])
+
+        super().save(*args, **kwargs)
+
+        if previous_embedding_id != self.canonical_embedding_id:
+            InstrumentEmbedding.objects.delete_unused([previous_embedding_id])
+
+    def _follow_embedding_key(self):
+        """
+        Keeps the instrument linked to the row of its current key, also after the
+        name or brand/model has been edited. Uses the existing row of the key if
+        there is one, otherwise moves the current vector to the new key.
+        """
+        current = self.canonical_embedding
+        if current is not None and current.cache_key == self.embedding_key:
+            return
+        target = InstrumentEmbedding.objects.filter(cache_key=self.embedding_key).first()
+        if target is not None:
+            self.canonical_embedding = target
+        elif current is not None:
+            self.embedding_en = current.embedding
+
+
+def embedding_cache_key(tuotenimi, merkki_ja_malli):
+    """
+    Creates a composite key from Name + Model Info.
+    This ensures that 'Analysaattori (Model A)' is treated differently
+    from 'Analysaattori (Model B)'.
+    """
+    name = (tuotenimi or "").strip().lower()
+    brand_info = (merkki_ja_malli or "").strip().lower()
+    return f"{name}|{brand_info}"
+
+
+# Marks that Instrument.embedding_en has not been assigned since the last save
+_UNSET = object()
+
+
+class InstrumentEmbeddingManager(models.Manager):
+    def store(self, embeddings_by_key):
+        """
+        Creates or overwrites one row per cache key in a single query.
+        Returns {cache_key: InstrumentEmbedding}.
+        """
+        if not embeddings_by_key:
+            return {}
+        self.bulk_create(
+            [self.model(cache_key=key, embedding=embedding) for key, embedding in embeddings_by_key.items()],
+            update_conflicts=True,
+            unique_fields=['cache_key'],
+            update_fields=['embedding', 'updated_at'],
+        )
+        return self.in_bulk(list(embeddings_by_key), field_name='cache_key')
+
+    def link(self, instruments):
+        """
+        Stores the embeddings assigned through Instrument.embedding_en, one row per
+        cache key, and points each of those instruments at the row of its key.
+        The instruments themselves are not saved. Returns the rows written.
+        """
+        assigned = [
+            (instrument, instrument.__dict__.pop('_pending_embedding'))
+            for instrument in instruments
+            if '_pending_embedding' in instrument.__dict__
+        ]
+        rows = self.store({
+            instrument.embedding_key: embedding
+            for instrument, embedding in assigned
+            if embedding is not None
+        })
+        for instrument, embedding in assigned:
+            instrument.canonical_embedding = rows[instrument.embedding_key] if embedding is not None else None
+        if rows:
+            linked_pks = [instrument.pk for instrument, _ in assigned if instrument.pk]
+            transaction.on_commit(lambda: _embeddings_changed(list(rows.values()), linked_pks))
+        return list(rows.values())
+
+    def delete_unused(self, pks):
+        """Deletes the given rows if no instrument points at them anymore."""
+        pks = [pk for pk in pks if pk is not None]
+        if pks:
+            self.filter(pk__in=pks, instruments__isnull=True).delete()
+
+def _embeddings_changed(rows, instrument_pks):
+    """
+    Writes created or overwritten rows into the vector index and drops the similar
+    rankings of every instrument using them (rows are shared, see embedding_cache_key).
+    """
+    # Imported here: both modules import this one
+    from .vector_index import update_vector_index
+    from .similar_instruments import invalidate_similar
+
+    update_vector_index(rows)
+    sharing = Instrument.objects.filter(canonical_embedding__in=rows).values_list('pk', flat=True)
+    invalidate_similar({*instrument_pks, *sharing})
+
+# pgvector binary_quantize(): one bit per dimension, set when the value is positive.
+# The cast to bit(768) is part of the template so queries match the index expression.
+class BinaryQuantize(Func):
+    function = 'binary_quantize'
+    template = '(%(function)s(%(expressions)s))::bit(768)'
+    output_field = BitField(length=768)
+
+# One English embedding per unique name + brand/model (see embedding_cache_key).
+# Instruments sharing the key share the vector, so re-embedding a name is a single
+# row write and semantic search only scans unique vectors.
+class InstrumentEmbedding(models.Model):
+    cache_key = models.CharField(max_length=255, unique=True)
+    # Half precision: half the table and index size of vector(768) with no
+    # measurable effect on cosine ranking
+    embedding = HalfVectorField(dimensions=768)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    objects = InstrumentEmbeddingManager()
+
+    class Meta:
+        indexes = [
+            # Approximate nearest neighbour index for semantic search (cosine distance)
+            HnswIndex(
+                name='instrument_embedding_hnsw',
+                fields=['embedding'],
+                m=getattr(settings, 'PGVECTOR_HNSW_M', 16),
+                ef_construction=getattr(settings, 'PGVECTOR_HNSW_EF_CONSTRUCTION', 64),
+                opclasses=['halfvec_cosine_ops'],
+            ),
+            # Hamming distance over 96-byte binary codes for the SEARCH_BINARY_QUANTIZATION shortlist
+            HnswIndex(
+                OpClass(BinaryQuantize('embedding'), name='bit_hamming_ops'),
+                name='instrument_embedding_bit_hnsw',
+                m=getattr(settings, 'PGVECTOR_HNSW_M', 16),
+                ef_construction=getattr(settings, 'PGVECTOR_HNSW_EF_CONSTRUCTION', 64),
+            ),
+        ]
+
+# Persistent cache of search query embeddings, keyed by normalized query text.
+# Entries are tied to the model version that produced them.
+class QueryEmbedding(models.Model):
+    query_text = models.CharField(max_length=500)
+    model_version = models.CharField(max_length=200)
+    embedding = VectorField(dimensions=768)
+    hit_count = models.PositiveIntegerField(default=0)
+    created_at = models.DateTimeField(auto_now_add=True)
+    last_used_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['query_text', 'model_version'], name='unique_query_embedding'),
+        ]
+
+# Search queries, written in batches by query_log. The most frequent ones are
+# pre-embedded by the warm_query_cache command.
+class SearchQueryLog(models.Model):
+    # Normalized like QueryEmbedding.query_text
+    query_text = models.CharField(max_length=500)
+    latency_ms = models.FloatField()
+    result_count = models.PositiveIntegerField()
+    # Whether the query embedding was found in the query cache
+    embedding_cached = models.BooleanField()
+    created_at = models.DateTimeField()
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['created_at'], name='search_query_log_created_at'),
+        ]
+
+# Near-duplicate pairs found by the find_near_duplicates job: for every instrument,
+# its k nearest other instruments below the distance threshold. Instruments sharing
+# an embedding are stored with distance 0.
+class SimilarInstrument(models.Model):
+    instrument = models.ForeignKey(Instrument, on_delete=models.CASCADE, related_name='similar_instruments')
+    similar = models.ForeignKey(Instrument, on_delete=models.CASCADE, related_name='+')
+    distance = models.FloatField()
+    # Start time of the job run that stored the pair
+    computed_at = models.DateTimeField()
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['instrument', 'similar'], name='unique_similar_instrument'),
+        ]
+        indexes = [
+            models.Index(fields=['instrument', 'distance'], name='similar_instrument_distance'),
+            models.Index(fields=['computed_at'], name='similar_instrument_computed'),
+        ]
+
+# Successful runs of the find_near_duplicates job. Incremental runs recompute the
+# instruments changed since the start of the latest run.
+class NearDuplicateRun(models.Model):
+    started_at = models.DateTimeField()
+    finished_at = models.DateTimeField()
+    full = models.BooleanField()
+    recomputed = models.PositiveIntegerField()
+    merged = models.PositiveIntegerField()
+    pairs_written = models.PositiveIntegerField()
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['started_at'], name='near_duplicate_run_started'),
+        ]
+
 # Manager model used for creating users
 class RegistryUserManager(BaseUserManager):
     def create_user(self, email, full_name, password=None, **other_fields):
@@ -0,0 +1,259 @@
+"""
+Near-duplicate Detection
+
+Finds the k nearest other instruments of every instrument and stores the pairs
+below a distance threshold in SimilarInstrument, with blocked NumPy matrix
+products instead of one pgvector query per instrument.
+
+KEY DESIGN:
+- Distances are computed between the shared InstrumentEmbedding vectors and then
+  expanded to instruments; instruments sharing a vector are at distance 0
+- The N x N distance matrix is never materialized: rows and columns are processed
+  in tiles of tile_size x tile_size, keeping a running top-k per row
+- Incremental runs only fully recompute the rows that can have changed since the
+  last run: instruments with new history records or re-embedded vectors ("dirty"),
+  and instruments that have a dirty instrument among their stored neighbours.
+  All other rows are only compared with the dirty instruments, which are merged
+  into their stored lists.
+- Every successful run is recorded in NearDuplicateRun, also when nothing had
+  changed; the next incremental run starts from the start time of the latest one
+- Deleted instruments drop out of the lists of others without a replacement
+  until the next full run
+"""
+
+import logging
+
+import numpy as np
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+
+from instrument_registry.models import Instrument, InstrumentEmbedding, NearDuplicateRun, SimilarInstrument
+
+logger = logging.getLogger(__name__)
+
+EMBEDDING_DIMENSIONS = 768
+
+
+def _load_members():
+    """Returns {embedding pk: [instrument pks]} for all embedded instruments."""
+    members = {}
+    rows = (
+        Instrument.objects
+        .filter(canonical_embedding__isnull=False)
+        .order_by('pk')
+        .values_list('canonical_embedding_id', 'pk')
+        .iterator(chunk_size=10000)
+    )
+    for embedding_pk, instrument_pk in rows:
+        members.setdefault(embedding_pk, []).append(instrument_pk)
+    return members
+
+
+def _load_vectors(embedding_pks, chunk_size=2000):
+    """Returns the L2-normalized float32 matrix of the given embeddings, in the given order."""
+    position = {pk: row for row, pk in enumerate(embedding_pks)}
+    vectors = np.zeros((len(embedding_pks), EMBEDDING_DIMENSIONS), dtype=np.float32)
+
+    rows = InstrumentEmbedding.objects.values_list('pk', 'embedding').iterator(chunk_size=chunk_size)
+    for pk, embedding in rows:
+        row = position.get(pk)
+        if row is not None:
+            vectors[row] = embedding.to_numpy()
+
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return vectors / norms
+
+
+def nearest_neighbours(vectors, rows, columns, k, max_distance, tile_size=2048):
+    """
+    Returns, for every index in rows, the k nearest indexes in columns (both index
+    into vectors) as [(column, distance)], nearest first. The row itself and
+    distances of max_distance or more are left out. Memory use is bounded by
+    tile_size x tile_size distances.
+    """
+    rows = np.asarray(rows, dtype=np.int64)
+    columns = np.asarray(columns, dtype=np.int64)
+    results = []
+
+    for row_start in range(0, len(rows), tile_size):
+        row_block = rows[row_start:row_start + tile_size]
+        row_vectors = vectors[row_block]
+        best_distances = np.empty((len(row_block), 0), dtype=np.float32)
+        best_columns = np.empty((len(row_block), 0), dtype=np.int64)
+
+        for column_start in range(0, len(columns), tile_size):
+            column_block = columns[column_start:column_start + tile_size]
+            distances = 1.0 - row_vectors @ vectors[column_block].T
+            distances[row_block[:, None] == column_block[None, :]] = np.inf
+
+            candidate_distances = np.concatenate([best_distances, distances], axis=1)
+            candidate_columns = np.concatenate(
+                [best_columns, np.broadcast_to(column_block, distances.shape)], axis=1
+            )
+            if candidate_distances.shape[1] > k:
+                keep = np.argpartition(candidate_distances, k - 1, axis=1)[:, :k]
+                candidate_distances = np.take_along_axis(candidate_distances, keep, axis=1)
+                candidate_columns = np.take_along_axis(candidate_columns, keep, axis=1)
+            best_distances, best_columns = candidate_distances, candidate_columns
+
+        order = np.argsort(best_distances, axis=1, kind='stable')
+        best_distances = np.take_along_axis(best_distances, order, axis=1)
+        best_columns = np.take_along_axis(best_columns, order, axis=1)
+        for distances, neighbours in zip(best_distances.tolist(), best_columns.tolist()):
+            results.append([
+                (column, distance)
+                for column, distance in zip(neighbours, distances)
+                if distance < max_distance
+            ])
+
+    return results
+
+
+def _member_lists(members, candidates, k):
+    """
+    Splits the candidates of one embedding ({instrument pk: distance}, including
+    its own members) into the k nearest other instruments of every member.
+    """
+    ranked = sorted(candidates.items(), key=lambda item: (item[1], item[0]))
+    return {
+        member: [(pk, distance) for pk, distance in ranked if pk != member][:k]
+        for member in members
+    }
+
+
+def _load_stored_pairs():
+    """Returns {instrument pk: [(similar pk, distance)]} of the previous runs."""
+    stored = {}
+    rows = SimilarInstrument.objects.values_list('instrument_id', 'similar_id', 'distance').iterator(chunk_size=10000)
+    for instrument_pk, similar_pk, distance in rows:
+        stored.setdefault(instrument_pk, []).append((similar_pk, distance))
+    return stored
+
+
+def _find_dirty_instruments(last_run):
+    """Instruments created, changed or deleted since the last run, or whose vector was re-embedded."""
+    changed = set(
+        Instrument.history
+        .filter(history_date__gt=last_run)
+        .values_list('id', flat=True)
+        .distinct()
+    )
+    re_embedded = set(
+        Instrument.objects
+        .filter(canonical_embedding__updated_at__gt=last_run)
+        .values_list('pk', flat=True)
+    )
+    return changed | re_embedded
+
+
+def _last_run_start():
+    """Start time of the latest successful run, None if there has been none."""
+    return NearDuplicateRun.objects.order_by('-started_at').values_list('started_at', flat=True).first()
+
+
+def _record_run(started_at, summary):
+    NearDuplicateRun.objects.create(started_at=started_at, finished_at=timezone.now(), **summary)
+
+
+def find_near_duplicates(k=None, max_distance=None, tile_size=2048, full=False, on_info=None):
+    """
+    Updates SimilarInstrument. Recomputes everything on the first run or with
+    full=True, otherwise only the rows affected by changes since the last run.
+    Returns a summary dict.
+    """
+    k = k or getattr(settings, 'NEAR_DUPLICATE_K', 10)
+    max_distance = max_distance or getattr(settings, 'NEAR_DUPLICATE_MAX_DISTANCE', 0.1)
+    on_info = on_info or (lambda message: None)
+
+    started_at = timezone.now()
+    last_run = None if full else _last_run_start()
+
+    dirty_instruments = None
+    if last_run is not None:
+        dirty_instruments = _find_dirty_instruments(last_run)
+        if not dirty_instruments:
+            on_info("No instruments changed since the last run")
+            summary = {'full': False, 'recomputed': 0, 'merged': 0, 'pairs_written': 0}
+            _record_run(started_at, summary)
+            return summary
+
+    members = _load_members()
+    embedding_pks = list(members)
+    position = {pk: row for row, pk in enumerate(embedding_pks)}
+    embedding_of = {instrument: embedding for embedding, pks in members.items() for instrument in pks}
+    on_info(f"Loading {len(embedding_pks)} embeddings of {len(embedding_of)} instruments")
+    vectors = _load_vectors(embedding_pks)
+
+    stored = {} if last_run is None else _load_stored_pairs()
+
+    if last_run is None:
+        dirty_embeddings = set(embedding_pks)
+    else:
+        dirty_embeddings = {embedding_of[pk] for pk in dirty_instruments if pk in embedding_of}
+        for instrument, pairs in stored.items():
+            if instrument in embedding_of and any(similar in dirty_instruments for similar, _ in pairs):
+                dirty_embeddings.add(embedding_of[instrument])
+
+    new_lists = {}
+
+    # Rows that can have changed in any way: nearest embeddings among all embeddings
+    dirty_rows = sorted(position[pk] for pk in dirty_embeddings)
+    on_info(f"Recomputing neighbours of {len(dirty_rows)} embeddings")
+    neighbours = nearest_neighbours(vectors, dirty_rows, range(len(embedding_pks)), k, max_distance, tile_size)
+    for row, row_neighbours in zip(dirty_rows, neighbours):
+        embedding = embedding_pks[row]
+        candidates = dict.fromkeys(members[embedding], 0.0)
+        for column, distance in row_neighbours:
+            candidates.update(dict.fromkeys(members[embedding_pks[column]], distance))
+        new_lists.update(_member_lists(members[embedding], candidates, k))
+
+    # Other rows can only gain dirty instruments: merge those into the stored lists
+    merged = 0
+    if dirty_instruments:
+        dirty_columns = sorted({position[embedding_of[pk]] for pk in dirty_instruments if pk in embedding_of})
+        clean_rows = [row for row, pk in enumerate(embedding_pks) if pk not in dirty_embeddings]
+        on_info(f"Merging changes into the neighbours of {len(clean_rows)} embeddings")
+        neighbours = nearest_neighbours(vectors, clean_rows, dirty_columns, k, max_distance, tile_size)
+        for row, row_neighbours in zip(clean_rows, neighbours):
+            if not row_neighbours:
+                continue
+            embedding = embedding_pks[row]
+            candidates = dict.fromkeys(members[embedding], 0.0)
+            for member in members[embedding]:
+                candidates.update(stored.get(member, []))
+            for column, distance in row_neighbours:
+                candidates.update(dict.fromkeys(members[embedding_pks[column]], distance))
+
+            lists = _member_lists(members[embedding], candidates, k)
+            if any(lists[member] != stored.get(member, []) for member in members[embedding]):
+                new_lists.update(lists)
+                merged += 1
+
+    # Instruments that lost their embedding keep no pairs
+    orphaned = [pk for pk in stored if pk not in embedding_of]
+
+    pairs = [
+        SimilarInstrument(instrument_id=instrument, similar_id=similar, distance=distance, computed_at=started_at)
+        for instrument, neighbour_list in new_lists.items()
+        for similar, distance in neighbour_list
+    ]
+    summary = {
+        'full': last_run is None,
+        'recomputed': len(dirty_rows),
+        'merged': merged,
+        'pairs_written': len(pairs),
+    }
+    with transaction.atomic():
+        if last_run is None:
+            SimilarInstrument.objects.all().delete()
+        else:
+            rewritten = list(new_lists) + orphaned
+            for start in range(0, len(rewritten), 10000):
+                SimilarInstrument.objects.filter(instrument_id__in=rewritten[start:start + 10000]).delete()
+        SimilarInstrument.objects.bulk_create(pairs, batch_size=5000)
+        _record_run(started_at, summary)
+
+    logger.info(f"Near-duplicate detection finished: {summary}")
+    return summary
@@ -0,0 +1,214 @@
+"""
+Query Embedding Cache
+
+Two-tier cache in front of the semantic service for search query embeddings:
+1. In-process LRU with TTL (per gunicorn worker, no I/O)
+2. Persistent QueryEmbedding table shared by all workers and restarts
+
+Queries are normalized (lowercased, whitespace collapsed) before lookup.
+Every entry is tied to SEMANTIC_MODEL_VERSION, so changing the model version
+invalidates both tiers. Rows of other versions are kept, so workers of the old
+and new version can run side by side during a deploy and a rollback finds its
+cache warm; prune_other_versions (warm_query_cache --prune) deletes them later.
+"""
+
+from collections import OrderedDict
+from datetime import timedelta
+import logging
+import threading
+import time
+
+from django.conf import settings
+from django.db.models import F, Sum
+from django.utils import timezone
+
+from instrument_registry.embedding import fetch_query_embeddings
+from instrument_registry.models import QueryEmbedding
+
+logger = logging.getLogger(__name__)
+
+
+# Matches QueryEmbedding.query_text max_length
+QUERY_MAX_LENGTH = 500
+
+
+def normalize_query(text):
+    return " ".join((text or "").lower().split())[:QUERY_MAX_LENGTH]
+
+
+def model_version():
+    return getattr(settings, 'SEMANTIC_MODEL_VERSION', '')
+
+
+class LRUCache:
+    """Thread-safe LRU cache whose entries expire after ttl seconds."""
+
+    def __init__(self, max_size, ttl):
+        self.max_size = max_size
+        self.ttl = ttl
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            expires_at, value = entry
+            if expires_at < time.monotonic():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return value
+
+    def set(self, key, value):
+        with self._lock:
+            self._entries[key] = (time.monotonic() + self.ttl, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def delete(self, key):
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self):
+        return len(self._entries)
+
+
+_memory_cache = LRUCache(
+    max_size=getattr(settings, 'QUERY_EMBEDDING_CACHE_SIZE', 1024),
+    ttl=getattr(settings, 'QUERY_EMBEDDING_CACHE_TTL', timedelta(hours=1)).total_seconds(),
+)
+
+_stats = {'memory_hits': 0, 'database_hits': 0, 'misses': 0}
+_stats_lock = threading.Lock()
+
+
+def _record(stat):
+    with _stats_lock:
+        _stats[stat] += 1
+
+
+def get_cached_embedding(text):
+    """
+    Returns the cached embedding for the query as a list of floats,
+    or None if neither tier has it for the current model version.
+    """
+    query = normalize_query(text)
+    if not query:
+        return None
+
+    version = model_version()
+    memory_key = (version, query)
+
+    embedding = _memory_cache.get(memory_key)
+    if embedding is not None:
+        _record('memory_hits')
+        return embedding
+
+    try:
+        entry = (
+            QueryEmbedding.objects
+            .filter(query_text=query, model_version=version)
+            .only('pk', 'embedding')
+            .first()
+        )
+        if entry is not None:
+            QueryEmbedding.objects.filter(pk=entry.pk).update(
+                hit_count=F('hit_count') + 1,
+                last_used_at=timezone.now(),
+            )
+    except Exception as exc:
+        logger.error(f"Query embedding cache lookup failed: {exc}")
+        entry = None
+
+    if entry is None:
+        _record('misses')
+        return None
+
+    embedding = [float(value) for value in entry.embedding]
+    _memory_cache.set(memory_key, embedding)
+    _record('database_hits')
+    return embedding
+
+
+def cache_embedding(text, embedding):
+    """Stores a freshly computed query embedding in both tiers."""
+    query = normalize_query(text)
+    if not query or not embedding:
+        return
+
+    version = model_version()
+    embedding = [float(value) for value in embedding]
+    _memory_cache.set((version, query), embedding)
+
+    try:
+        QueryEmbedding.objects.update_or_create(
+            query_text=query,
+            model_version=version,
+            defaults={'embedding': embedding},
+        )
+    except Exception as exc:
+        # The persistent tier is an optimization; never fail a search because of it
+        logger.error(f"Storing query embedding failed: {exc}")
+
+
+def get_query_embeddings(queries):
+    """
+    Returns the embedding of every query (None on failure), fetching the
+    uncached ones from the semantic service in one batch call.
+    """
+    embeddings = {}
+    missing = []
+    for query in dict.fromkeys(queries):
+        embedding = get_cached_embedding(query)
+        if embedding is None:
+            missing.append(query)
+        else:
+            embeddings[query] = embedding
+
+    if missing:
+        for query, embedding in zip(missing, fetch_query_embeddings(missing)):
+            if embedding:
+                cache_embedding(query, embedding)
+                embeddings[query] = embedding
+
+    return [embeddings.get(query) for query in queries]
+
+
+def prune_other_versions(days):
+    """Deletes the entries of other model versions not used in the last days. Returns the number deleted."""
+    deleted, _ = (
+        QueryEmbedding.objects
+        .exclude(model_version=model_version())
+        .filter(last_used_at__lt=timezone.now() - timedelta(days=days))
+        .delete()
+    )
+    return deleted
+
+
+def clear_memory_cache():
+    _memory_cache.clear()
+
+
+def get_cache_stats():
+    """Returns hit/miss counters of this process and totals of the persistent tier."""
+    with _stats_lock:
+        stats = dict(_stats)
+
+    lookups = stats['memory_hits'] + stats['database_hits'] + stats['misses']
+    persistent = QueryEmbedding.objects.filter(model_version=model_version())
+
+    stats.update({
+        'hit_rate': (stats['memory_hits'] + stats['database_hits']) / lookups if lookups else 0.0,
+        'memory_entries': len(_memory_cache),
+        'database_entries': persistent.count(),
+        'database_total_hits': persistent.aggregate(total=Sum('hit_count'))['total'] or 0,
+        'model_version': model_version(),
+    })
+    return stats
@@ -0,0 +1,172 @@
+"""
+Search Query Log
+
+Records every semantic search (normalized query, latency, result count and
+whether the query embedding was cached) in SearchQueryLog, and uses the log to
+pre-embed the most frequent queries after a deploy or model change.
+
+KEY DESIGN:
+- log_search() only appends to an in-process buffer; nothing is written while
+  the request is being answered
+- The buffer is written with one bulk INSERT from the request_finished signal,
+  i.e. after the response has been sent, at most every
+  SEARCH_QUERY_LOG_FLUSH_INTERVAL seconds or when SEARCH_QUERY_LOG_BATCH_SIZE
+  entries are pending
+- The buffer is bounded; entries are dropped (and counted) rather than letting
+  memory grow if the database is unavailable
+- Entries still buffered when a worker exits are lost, which is acceptable for
+  statistics
+- Warming fills the persistent tier of the query cache, which every worker and
+  restart reads on a memory miss, so the expensive translation and embedding
+  step is skipped for the warmed queries
+"""
+
+from datetime import timedelta
+import logging
+import threading
+import time
+
+from django.conf import settings
+from django.core.signals import request_finished
+from django.db.models import Count
+from django.dispatch import receiver
+from django.utils import timezone
+
+from instrument_registry.models import QueryEmbedding, SearchQueryLog
+from instrument_registry.query_cache import get_query_embeddings, normalize_query, model_version
+
+logger = logging.getLogger(__name__)
+
+_pending = []
+_pending_lock = threading.Lock()
+_last_flush = time.monotonic()
+_dropped = 0
+
+
+def is_enabled():
+    return getattr(settings, 'SEARCH_QUERY_LOG_ENABLED', True)
+
+
+def log_search(text, latency_ms, result_count, embedding_cached):
+    """Buffers one search for the log. Never touches the database."""
+    global _dropped
+
+    if not is_enabled():
+        return
+    query = normalize_query(text)
+    if not query:
+        return
+
+    entry = SearchQueryLog(
+        query_text=query,
+        latency_ms=latency_ms,
+        result_count=result_count,
+        embedding_cached=embedding_cached,
+        created_at=timezone.now(),
+    )
+    with _pending_lock:
+        if len(_pending) >= getattr(settings, 'SEARCH_QUERY_LOG_MAX_PENDING', 10000):
+            _dropped += 1
+            return
+        _pending.append(entry)
+
+
+def flush():
+    """Writes the buffered entries. Returns the number of entries written."""
+    global _last_flush, _dropped
+
+    with _pending_lock:
+        entries = _pending[:]
+        _pending.clear()
+        dropped, _dropped = _dropped, 0
+        _last_flush = time.monotonic()
+
+    if dropped:
+        logger.warning(f"Search query log dropped {dropped} entries")
+    if not entries:
+        return 0
+
+    try:
+        SearchQueryLog.objects.bulk_create(entries, batch_size=1000)
+    except Exception as exc:
+        # The log is statistics only; never fail a request because of it
+        logger.error(f"Writing the search query log failed: {exc}")
+        return 0
+    return len(entries)
+
+
+def _flush_due():
+    with _pending_lock:
+        if not _pending:
+            return False
+        return (
+            len(_pending) >= getattr(settings, 'SEARCH_QUERY_LOG_BATCH_SIZE', 500) or
+            time.monotonic() - _last_flush >= getattr(settings, 'SEARCH_QUERY_LOG_FLUSH_INTERVAL', 30)
+        )
+
+
+@receiver(request_finished)
+def flush_after_request(sender, **kwargs):
+    # request_finished is sent once the response has been delivered
+    if _flush_due():
+        flush()
+
+
+def clear_pending():
+    with _pending_lock:
+        _pending.clear()
+
+
+def popular_queries(limit, days):
+    """The most frequent logged queries of the last days, most frequent first."""
+    since = timezone.now() - timedelta(days=days)
+    return list(
+        SearchQueryLog.objects
+        .filter(created_at__gte=since)
+        .values('query_text')
+        .annotate(searches=Count('pk'))
+        .order_by('-searches', 'query_text')
+        .values_list('query_text', flat=True)[:limit]
+    )
+
+
+def prune_query_log(days):
+    """Deletes log entries older than the given number of days."""
+    deleted, _ = SearchQueryLog.objects.filter(created_at__lt=timezone.now() - timedelta(days=days)).delete()
+    return deleted
+
+
+def warm_query_cache(top=None, days=None, chunk_size=50, on_info=None):
+    """
+    Embeds the most frequent queries that have no cached embedding for the
+    current model version, in batches through the semantic service.
+    Returns a summary dict.
+    """
+    top = top or getattr(settings, 'QUERY_CACHE_WARM_TOP', 200)
+    days = days or getattr(settings, 'QUERY_CACHE_WARM_DAYS', 30)
+    on_info = on_info or (lambda message: None)
+
+    queries = popular_queries(top, days)
+    cached = set(
+        QueryEmbedding.objects
+        .filter(model_version=model_version(), query_text__in=queries)
+        .values_list('query_text', flat=True)
+    )
+    missing = [query for query in queries if query not in cached]
+    on_info(f"{len(queries)} popular queries, {len(missing)} without a cached embedding")
+
+    warmed = 0
+    for start in range(0, len(missing), chunk_size):
+        chunk = missing[start:start + chunk_size]
+        embeddings = get_query_embeddings(chunk)
+        warmed += sum(1 for embedding in embeddings if embedding)
+        on_info(f"Embedded {start + len(chunk)}/{len(missing)} queries")
+
+    summary = {
+        'popular': len(queries),
+        'already_cached': len(cached),
+        'warmed': warmed,
+        'failed': len(missing) - warmed,
+    }
+    logger.info(f"Query cache warming finished: {summary}")
+    return summary
@@ -30,7 +30,7 @@ class InstrumentSerializer(WhitespaceCleaningSerializerMixin, serializers.ModelS
 
     class Meta:
         model = Instrument
-        exclude = ['embedding_en', 'enriched_description']
+        exclude = ['canonical_embedding', 'enriched_description', 'search_vector']
 
     def create(self, validated_data):
         return InstrumentService().create_instrument(validated_data)
@@ -48,7 +48,7 @@ class InstrumentSerializer(WhitespaceCleaningSerializerMixin, serializers.ModelS
 class InstrumentCSVSerializer(WhitespaceCleaningSerializerMixin, serializers.ModelSerializer):
     class Meta:
         model = Instrument
-        exclude = ['id', 'embedding_en', 'enriched_description']
+        exclude = ['id', 'canonical_embedding', 'enriched_description', 'search_vector']
 
 # User serializer
 class RegistryUserSerializer(WhitespaceCleaningSerializerMixin, serializers.ModelSerializer):
@@ -27,15 +27,16 @@ class InstrumentService:
         if existing:
             # Reuse existing translation, embeddings and enrichment
             instrument_data['tuotenimi_en'] = existing.tuotenimi_en
-            instrument_data['embedding_en'] = existing.embedding_en
+            instrument_data['canonical_embedding'] = existing.canonical_embedding
             instrument_data['enriched_description'] = existing.enriched_description
-            return Instrument.objects.create(**instrument_data)
+            instrument = Instrument.objects.create(**instrument_data)
         else:
             # New unique name, translate and generate embeddings
             instrument = Instrument(**instrument_data)
             self._translate_enrich_and_update_embeddings(instrument)
             instrument.save()
-            return instrument
+
+        return instrument
 
     def update_instrument(self, instance, instrument_data, update_duplicates=False):
         # Get the original values before any changes are made
@@ -59,13 +60,15 @@ class InstrumentService:
             if existing:
                 instance.tuotenimi_en = existing.tuotenimi_en
                 instance.enriched_description = existing.enriched_description
-                instance.embedding_en = existing.embedding_en
+                instance.canonical_embedding = existing.canonical_embedding
             else:
                 # New name - translate it
                 self._translate_enrich_and_update_embeddings(instance)
         elif tuotenimi_en_changed:
             self._update_embedding_en(instance)
 
+        # Writing the embedding row also updates the vector index and the similar
+        # rankings of every instrument sharing it (InstrumentEmbedding.objects.link)
         instance.save()
 
         if update_duplicates and tuotenimi_en_changed and not tuotenimi_changed:
@@ -105,17 +108,18 @@ class InstrumentService:
             merkki_ja_malli__iexact=instance.merkki_ja_malli
         ).exclude(pk=instance.pk))
 
-        # Update each duplicate
+        # Update each duplicate. They share the embedding row of the instance,
+        # which was already updated when the instance was saved.
         for instrument in duplicate_instruments:
             instrument.tuotenimi_en = instance.tuotenimi_en
             instrument.enriched_description = instance.enriched_description
-            instrument.embedding_en = instance.embedding_en
+            instrument.canonical_embedding = instance.canonical_embedding
         
         with transaction.atomic():
             bulk_update_with_history(
                 duplicate_instruments,
                 Instrument,
-                ['tuotenimi_en', 'enriched_description', 'embedding_en']
+                ['tuotenimi_en', 'enriched_description', 'canonical_embedding']
             )
 
     def _find_existing_translation(self, tuotenimi, merkki_ja_malli):
@@ -128,7 +132,7 @@ class InstrumentService:
             merkki_ja_malli__iexact=mm
         ).exclude(
             tuotenimi_en__in=["", "Translation Failed"]
-        ).values_list('tuotenimi_en', 'enriched_description', 'embedding_en')
+        ).values_list('tuotenimi_en', 'enriched_description', 'canonical_embedding')
         
         if not existing:
             return None
@@ -1,5 +1,7 @@
-from django.db.models.signals import pre_delete
+from django.db.models.signals import pre_delete, post_delete
 from django.dispatch import receiver
+from .models import InstrumentEmbedding
+from .vector_index import remove_from_vector_index
 
 
 def add_history_username(sender, **kwargs):
@@ -20,3 +22,19 @@ def delete_attachment_file(sender, instance, **kwargs):
         except Exception as e:
             # Log the error but don't prevent deletion
             print(f"Error deleting file {instance.filename}: {e}")
+
+
+@receiver(post_delete, sender='instrument_registry.Instrument')
+def delete_unused_instrument_embedding(sender, instance, **kwargs):
+    """
+    Delete the shared embedding of a deleted instrument if it was the last one using it.
+    """
+    InstrumentEmbedding.objects.delete_unused([instance.canonical_embedding_id])
+
+
+@receiver(post_delete, sender='instrument_registry.InstrumentEmbedding')
+def remove_embedding_from_vector_index(sender, instance, **kwargs):
+    """
+    Clear a deleted shared embedding from the in-process vector index.
+    """
+    remove_from_vector_index([instance.pk])
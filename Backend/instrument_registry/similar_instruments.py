@@ -0,0 +1,49 @@
+"""
+Similar Instruments Cache
+
+Caches the "more like this" rankings of InstrumentSimilar. The ranking is
+computed from the instrument's own stored embedding, so no language detection,
+translation or semantic service call is involved.
+
+KEY DESIGN:
+- In-process LRU with TTL, keyed by instrument pk
+- Only (instrument pk, distance) pairs are cached; instrument rows are fetched
+  fresh, so edits to the neighbours show up immediately
+- Every entry records the (embedding pk, updated_at) it was computed from, so a
+  changed embedding misses even in workers that did not see the change
+- Writing an embedding row (InstrumentEmbedding.objects.link) drops the entries
+  of every instrument sharing it
+- New or deleted neighbours only appear after the TTL expires
+"""
+
+from datetime import timedelta
+
+from django.conf import settings
+
+from instrument_registry.query_cache import LRUCache
+
+_cache = LRUCache(
+    max_size=getattr(settings, 'SIMILAR_INSTRUMENTS_CACHE_SIZE', 1024),
+    ttl=getattr(settings, 'SIMILAR_INSTRUMENTS_CACHE_TTL', timedelta(minutes=10)).total_seconds(),
+)
+
+
+def get_cached_similar(instrument_pk, embedding_version):
+    """Returns the cached [(pk, distance)] ranking, or None if missing or computed from another embedding."""
+    entry = _cache.get(instrument_pk)
+    if entry is None or entry[0] != embedding_version:
+        return None
+    return entry[1]
+
+
+def cache_similar(instrument_pk, embedding_version, matches):
+    _cache.set(instrument_pk, (embedding_version, list(matches)))
+
+
+def invalidate_similar(instrument_pks):
+    for pk in instrument_pks:
+        _cache.delete(pk)
+
+
+def clear_similar_cache():
+    _cache.clear()
@@ -2,11 +2,33 @@ from django.test import TestCase, override_settings
 from rest_framework.test import APIClient
 from rest_framework import status
 from unittest.mock import patch, MagicMock
-from instrument_registry.models import Instrument, RegistryUser
-from instrument_registry.embedding import precompute_instrument_embeddings
-from instrument_registry.util import should_translate_to_english
+from instrument_registry.models import Instrument, InstrumentEmbedding, RegistryUser, QueryEmbedding, SimilarInstrument, SearchQueryLog, NearDuplicateRun
+from instrument_registry.near_duplicates import find_near_duplicates
+from instrument_registry.facets import FACET_FIELDS, facet_counts
+from instrument_registry.embedding import precompute_instrument_embeddings, _request_embeddings
+from instrument_registry.embedding_format import accept_header, decode_embeddings
+from instrument_registry.util import should_translate_to_english, reciprocal_rank_fusion
+from instrument_registry import vector_index, query_cache, query_log, direct_search, similar_instruments
+from instrument_registry.services.instruments import InstrumentService
+from instrument_registry.views import InstrumentSearch
 from pgvector.django import CosineDistance
+from django.contrib.postgres.search import SearchQuery
+from django.db import connection, transaction
+from django.test.utils import CaptureQueriesContext
+from Backend.asgi import CancelOnDisconnect
+from instrument_registry.benchmark import CONFIGURATIONS, BenchmarkSearch
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.utils import timezone
+from datetime import timedelta
+import asyncio
+import base64
+import httpx
+import io
+import json
+import numpy as np
 import requests
+import tempfile
 
 class LanguageDetectionTest(TestCase):
     """Test language detection utility function"""
@@ -198,10 +220,72 @@ class PrecomputeEmbeddingsTest(TestCase):
         self.assertTrue(mock_enrichment_service.enrich_batch.called)
 
 
+    @override_settings(SEMANTIC_SERVICE_MAX_ATTEMPTS=3)
+    @patch('instrument_registry.embedding.time.sleep')
+    def test_embedding_backs_off_and_splits_when_saturated(self, mock_sleep):
+        """Test that 429 and 413 answers are retried in smaller chunks after Retry-After"""
+        answers = iter([
+            MagicMock(status_code=429, headers={'Retry-After': '2'}),
+            MagicMock(status_code=413, headers={}),
+        ])
+
+        def post(url, json, **kwargs):
+            response = next(answers, None)
+            if response is None:
+                response = MagicMock(status_code=200)
+                response.json.return_value = {'embeddings': [[float(text)] * 2 for text in json['texts']]}
+            return response
+
+        session = MagicMock()
+        session.post.side_effect = post
+
+        embeddings = _request_embeddings(session, ["1", "2", "3", "4"])
+
+        np.testing.assert_array_equal(embeddings, [[1, 1], [2, 2], [3, 3], [4, 4]])
+        mock_sleep.assert_called_once_with(2.0)
+        self.assertEqual(
+            [call.kwargs['json']['texts'] for call in session.post.call_args_list],
+            [["1", "2", "3", "4"], ["1", "2"], ["1"], ["2"], ["3", "4"]]
+        )
+
+    @override_settings(SEMANTIC_SERVICE_MAX_ATTEMPTS=3)
+    @patch('instrument_registry.embedding.time.sleep')
+    def test_embedding_waits_while_model_loads(self, mock_sleep):
+        """Test that 503 answers of a loading service are retried unsplit after Retry-After"""
+        loading = MagicMock(status_code=503, headers={'Retry-After': '1'})
+        ready = MagicMock(status_code=200)
+        ready.json.return_value = {'embeddings': [[1.0, 1.0], [2.0, 2.0]]}
+        session = MagicMock()
+        session.post.side_effect = [loading, ready]
+
+        embeddings = _request_embeddings(session, ["1", "2"])
+
+        np.testing.assert_array_equal(embeddings, [[1, 1], [2, 2]])
+        mock_sleep.assert_called_once_with(1.0)
+        self.assertEqual(
+            [call.kwargs['json']['texts'] for call in session.post.call_args_list],
+            [["1", "2"], ["1", "2"]]
+        )
+
+    @override_settings(SEMANTIC_SERVICE_MAX_ATTEMPTS=2)
+    @patch('instrument_registry.embedding.time.sleep')
+    def test_embedding_gives_up_when_saturated(self, mock_sleep):
+        """Test that a service that stays saturated fails the batch after the last attempt"""
+        saturated = MagicMock(status_code=429, headers={})
+        saturated.raise_for_status.side_effect = requests.exceptions.HTTPError("429")
+        session = MagicMock()
+        session.post.return_value = saturated
+
+        with self.assertRaises(requests.exceptions.HTTPError):
+            _request_embeddings(session, ["1", "2"])
+        self.assertEqual(session.post.call_count, 2)
+
+
 class SearchIntegrationTest(TestCase):
     """Test the semantic search API endpoints"""
 
     def setUp(self):
+        query_cache.clear_memory_cache()
         self.client = APIClient()
         self.user = RegistryUser.objects.create_user(email='test@test.com', full_name='Tester', password='pass')
         self.client.force_authenticate(user=self.user) # Use force_authenticate for DRF
@@ -245,6 +329,7 @@ class SearchIntegrationTest(TestCase):
         mock_post.assert_called_with(
             "http://semantic-search-service:8001/embed_query",
             json={"text": "Microscope"},
+            headers={'Accept': accept_header()},
             timeout=20.0
         )
 
@@ -275,6 +360,7 @@ class SearchIntegrationTest(TestCase):
         mock_post.assert_called_with(
             "http://semantic-search-service:8001/process_query",
             json={"text": "Mikroskooppi"},
+            headers={'Accept': accept_header()},
             timeout=20.0
         )
 
@@ -294,3 +380,1112 @@ class SearchIntegrationTest(TestCase):
         url = '/api/instruments/search/'
         response = self.client.get(url)
         self.assertEqual(response.status_code, 400)
+
+    @patch('instrument_registry.views.requests.post')
+    @patch('instrument_registry.views.should_translate_to_english')
+    def test_search_sets_ef_search(self, mock_should_translate, mock_post):
+        """Test that ef_search is set for the search transaction and clamped to the result limit"""
+        mock_should_translate.return_value = False
+        mock_response = MagicMock()
+        mock_response.json.return_value = {'embedding': [1.0] + [0.0] * 767}
+        mock_post.return_value = mock_response
+
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.get('/api/instruments/search/?q=Microscope&ef_search=200')
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(any(q['sql'] == 'SET LOCAL hnsw.ef_search = 200' for q in ctx.captured_queries))
+
+        # Values below the result limit are raised to the limit
+        with CaptureQueriesContext(connection) as ctx:
+            self.client.get('/api/instruments/search/?q=Microscope&ef_search=5')
+        self.assertTrue(any(q['sql'] == 'SET LOCAL hnsw.ef_search = 60' for q in ctx.captured_queries))
+
+    def test_hnsw_index_exists(self):
+        """Test that the HNSW index on the shared embeddings is created by the migrations"""
+        with connection.cursor() as cursor:
+            cursor.execute(
+                "SELECT indexdef FROM pg_indexes WHERE indexname = 'instrument_embedding_hnsw'"
+            )
+            row = cursor.fetchone()
+        self.assertIsNotNone(row)
+        self.assertIn('hnsw', row[0])
+        self.assertIn('halfvec_cosine_ops', row[0])
+
+    @override_settings(SEARCH_BINARY_QUANTIZATION=True)
+    @patch('instrument_registry.views.requests.post')
+    @patch('instrument_registry.views.should_translate_to_english')
+    def test_binary_quantized_search(self, mock_should_translate, mock_post):
+        """Test that the Hamming shortlist is re-ranked by exact cosine distance"""
+        # Same sign pattern as inst1, so both have Hamming distance 0 to the query
+        close = Instrument.objects.create(tuotenimi="Lähes mikroskooppi", embedding_en=[1.0, 0.5] + [0.0] * 766)
+        mock_should_translate.return_value = False
+        mock_response = MagicMock()
+        mock_response.json.return_value = {'embedding': [1.0, 0.4] + [0.0] * 766}
+        mock_post.return_value = mock_response
+
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.get('/api/instruments/search/?q=Microscope&mode=semantic')
+        self.assertEqual([item['id'] for item in response.data], [close.id, self.inst1.id])
+        self.assertTrue(any('binary_quantize' in q['sql'] and '<~>' in q['sql'] for q in ctx.captured_queries))
+        self.assertTrue(any(q['sql'] == 'SET LOCAL hnsw.ef_search = 400' for q in ctx.captured_queries))
+
+    def test_binary_quantized_index_exists(self):
+        """Test that the Hamming index matches the expression used by the shortlist query"""
+        with connection.cursor() as cursor:
+            cursor.execute(
+                "SELECT indexdef FROM pg_indexes WHERE indexname = 'instrument_embedding_bit_hnsw'"
+            )
+            row = cursor.fetchone()
+        self.assertIsNotNone(row)
+        self.assertIn('(binary_quantize(embedding))::bit(768)', row[0])
+        self.assertIn('bit_hamming_ops', row[0])
+
+
+class SearchAPITestCase(TestCase):
+    """Base of the search API tests: an empty query cache, an authenticated client and a mocked semantic service"""
+
+    def setUp(self):
+        query_cache.clear_memory_cache()
+        self.client = APIClient()
+        self.user = RegistryUser.objects.create_user(email='test@test.com', full_name='Tester', password='pass')
+        self.client.force_authenticate(user=self.user)
+
+    def _mock_service(self, mock_should_translate, mock_post, embedding=None):
+        """Makes the semantic service return embedding, [1, 0, ...] by default, for an untranslated query"""
+        mock_should_translate.return_value = False
+        mock_response = MagicMock()
+        mock_response.json.return_value = {'embedding': embedding or [1.0] + [0.0] * 767}
+        mock_post.return_value = mock_response
+
+
+class SharedEmbeddingTest(SearchAPITestCase):
+    """Test that instruments with the same name and brand/model share one embedding row"""
+
+    def setUp(self):
+        super().setUp()
+        self.first = Instrument.objects.create(
+            tuotenimi="Mikroskooppi", merkki_ja_malli="Zeiss", embedding_en=[1.0] + [0.0] * 767
+        )
+        self.second = Instrument.objects.create(tuotenimi=" mikroskooppi", merkki_ja_malli="ZEISS ")
+        self.other = Instrument.objects.create(
+            tuotenimi="Mikroskooppi", merkki_ja_malli="Nikon", embedding_en=[0.0, 1.0] + [0.0] * 766
+        )
+
+    def test_same_key_shares_row(self):
+        """Test that re-embedding a name is one row write seen by every instrument with that key"""
+        self.second.embedding_en = [0.0, 0.0, 1.0] + [0.0] * 765
+        self.second.save()
+
+        self.assertEqual(InstrumentEmbedding.objects.count(), 2)
+        self.first.refresh_from_db()
+        self.assertEqual(self.first.canonical_embedding_id, self.second.canonical_embedding_id)
+        self.assertEqual(list(self.first.embedding_en), [0.0, 0.0, 1.0] + [0.0] * 765)
+        self.assertEqual(self.first.canonical_embedding.cache_key, "mikroskooppi|zeiss")
+
+    def test_key_change_moves_instrument(self):
+        """Test that editing the brand/model links the instrument to the row of the new key"""
+        self.first.merkki_ja_malli = "Nikon"
+        self.first.save()
+        self.assertEqual(self.first.canonical_embedding_id, self.other.canonical_embedding_id)
+
+        # A new key without a row takes the current vector with it
+        self.first.tuotenimi = "Sentrifugi"
+        self.first.save()
+        self.assertEqual(self.first.canonical_embedding.cache_key, "sentrifugi|nikon")
+        self.assertEqual(list(self.first.embedding_en), [0.0, 1.0] + [0.0] * 766)
+        self.assertEqual(self.second.canonical_embedding.cache_key, "mikroskooppi|zeiss")
+
+    def test_unused_row_deleted_with_last_instrument(self):
+        """Test that the shared row is kept while an instrument still uses it"""
+        self.first.delete()
+        self.assertTrue(InstrumentEmbedding.objects.filter(cache_key="mikroskooppi|zeiss").exists())
+        Instrument.objects.filter(pk=self.second.pk).delete()
+        self.assertFalse(InstrumentEmbedding.objects.filter(cache_key="mikroskooppi|zeiss").exists())
+
+    @patch('instrument_registry.views.requests.post')
+    @patch('instrument_registry.views.should_translate_to_english')
+    def test_search_expands_to_instruments(self, mock_should_translate, mock_post):
+        """Test that one matching vector returns every instrument sharing it"""
+        self._mock_service(mock_should_translate, mock_post)
+
+        response = self.client.get('/api/instruments/search/?q=Microscope&mode=semantic')
+        self.assertEqual([item['id'] for item in response.data], [self.first.id, self.second.id])
+
+
+class VectorIndexTest(SearchAPITestCase):
+    """Test the memory-mapped numpy search backend"""
+
+    def setUp(self):
+        super().setUp()
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.settings_override = override_settings(SEARCH_BACKEND='numpy', VECTOR_INDEX_DIR=self.tmp_dir.name)
+        self.settings_override.enable()
+
+        self.inst1 = Instrument.objects.create(tuotenimi="Mikroskooppi", embedding_en=[1.0] + [0.0] * 767)
+        self.inst2 = Instrument.objects.create(tuotenimi="Kaukoputki", embedding_en=[0.0, 1.0] + [0.0] * 766)
+        self.inst3 = Instrument.objects.create(tuotenimi="Vaaka", embedding_en=None)
+        vector_index.rebuild_vector_index()
+
+    def tearDown(self):
+        self.settings_override.disable()
+        self.tmp_dir.cleanup()
+
+    def test_search_returns_nearest(self):
+        """Test that the index returns matches under the threshold ordered by distance"""
+        matches = vector_index.search([1.0, 0.1] + [0.0] * 766, limit=10, max_distance=0.5)
+        self.assertEqual([pk for pk, _ in matches], [self.inst1.canonical_embedding_id])
+        self.assertAlmostEqual(matches[0][1], 1 - 1 / (1.01 ** 0.5), places=5)
+
+        matches = vector_index.search([1.0, 1.0] + [0.0] * 766, limit=1, max_distance=1.0)
+        self.assertEqual(len(matches), 1)
+
+    def test_update_and_remove(self):
+        """Test that updates are written in place, new instruments appended and deletions cleared"""
+        self.inst3.embedding_en = [0.0, 0.0, 1.0] + [0.0] * 765
+        self.inst3.save()
+        self.inst2.embedding_en = [0.0, 0.0, 0.0, 1.0] + [0.0] * 764
+        self.inst2.save()
+        new_instrument = Instrument.objects.create(tuotenimi="Sentrifugi", embedding_en=[0.0] * 767 + [1.0])
+        vector_index.update_vector_index([
+            self.inst3.canonical_embedding, self.inst2.canonical_embedding, new_instrument.canonical_embedding
+        ])
+
+        matches = vector_index.search([0.0, 0.0, 1.0] + [0.0] * 765, limit=5, max_distance=0.5)
+        self.assertEqual([pk for pk, _ in matches], [self.inst3.canonical_embedding_id])
+        matches = vector_index.search([0.0, 0.0, 0.0, 1.0] + [0.0] * 764, limit=5, max_distance=0.5)
+        self.assertEqual([pk for pk, _ in matches], [self.inst2.canonical_embedding_id])
+        matches = vector_index.search([0.0] * 767 + [1.0], limit=5, max_distance=0.5)
+        self.assertEqual([pk for pk, _ in matches], [new_instrument.canonical_embedding_id])
+
+        self.inst1.delete()
+        matches = vector_index.search([1.0] + [0.0] * 767, limit=5, max_distance=0.5)
+        self.assertEqual(matches, [])
+
+    def test_brand_model_edit_updates_index(self):
+        """Test that an edit moving the vector to a new key row writes that row into the index"""
+        with self.captureOnCommitCallbacks(execute=True):
+            self.inst2.merkki_ja_malli = "Celestron"
+            self.inst2.save()
+
+        self.assertEqual(self.inst2.canonical_embedding.cache_key, "kaukoputki|celestron")
+        matches = vector_index.search([0.0, 1.0] + [0.0] * 766, limit=5, max_distance=0.5)
+        self.assertEqual([pk for pk, _ in matches], [self.inst2.canonical_embedding_id])
+
+    @patch('instrument_registry.views.requests.post')
+    @patch('instrument_registry.views.should_translate_to_english')
+    def test_search_view_uses_index(self, mock_should_translate, mock_post):
+        """Test that the search view computes distances with the index when enabled"""
+        self._mock_service(mock_should_translate, mock_post, [0.0, 1.0] + [0.0] * 766)
+
+        with patch('instrument_registry.views.InstrumentSearch._search_pgvector') as mock_pgvector:
+            response = self.client.get('/api/instruments/search/?q=Telescope')
+            mock_pgvector.assert_not_called()
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([item['id'] for item in response.data], [self.inst2.pk])
+
+
+class QueryCacheTest(SearchAPITestCase):
+    """Test the two-tier query embedding cache"""
+
+    def setUp(self):
+        super().setUp()
+        Instrument.objects.create(tuotenimi="Mikroskooppi", embedding_en=[1.0] + [0.0] * 767)
+
+    @patch('instrument_registry.views.requests.post')
+    @patch('instrument_registry.views.should_translate_to_english')
+    def test_repeated_query_skips_service(self, mock_should_translate, mock_post):
+        """Test that repeated queries are served from memory and then from the database tier"""
+        self._mock_service(mock_should_translate, mock_post)
+
+        self.client.get('/api/instruments/search/?q=Microscope')
+        response = self.client.get('/api/instruments/search/?q=%20microscope%20')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.data), 1)
+        self.assertEqual(mock_post.call_count, 1)
+
+        # Simulate another worker: memory tier is empty but the database has the entry
+        query_cache.clear_memory_cache()
+        self.client.get('/api/instruments/search/?q=MICROSCOPE')
+        self.assertEqual(mock_post.call_count, 1)
+        self.assertEqual(QueryEmbedding.objects.get(query_text='microscope').hit_count, 1)
+
+    @patch('instrument_registry.views.requests.post')
+    @patch('instrument_registry.views.should_translate_to_english')
+    def test_model_version_change_invalidates(self, mock_should_translate, mock_post):
+        """Test that entries from another model version are not used"""
+        self._mock_service(mock_should_translate, mock_post)
+
+        with override_settings(SEMANTIC_MODEL_VERSION='old-model'):
+            self.client.get('/api/instruments/search/?q=Microscope')
+        with override_settings(SEMANTIC_MODEL_VERSION='new-model'):
+            self.client.get('/api/instruments/search/?q=Microscope')
+
+        self.assertEqual(mock_post.call_count, 2)
+        self.assertTrue(QueryEmbedding.objects.filter(model_version='new-model').exists())
+        # Kept for workers still running the old version until pruned
+        self.assertTrue(QueryEmbedding.objects.filter(model_version='old-model').exists())
+
+    def test_prune_other_versions(self):
+        """Test that only unused entries of other model versions are pruned"""
+        with override_settings(SEMANTIC_MODEL_VERSION='old-model'):
+            query_cache.cache_embedding("microscope", [1.0] + [0.0] * 767)
+            query_cache.cache_embedding("centrifuge", [0.0, 1.0] + [0.0] * 766)
+        query_cache.cache_embedding("microscope", [1.0] + [0.0] * 767)
+        QueryEmbedding.objects.filter(query_text="centrifuge").update(last_used_at=timezone.now() - timedelta(days=30))
+        QueryEmbedding.objects.filter(model_version=query_cache.model_version()).update(
+            last_used_at=timezone.now() - timedelta(days=30)
+        )
+
+        self.assertEqual(query_cache.prune_other_versions(days=7), 1)
+        self.assertEqual(
+            sorted(QueryEmbedding.objects.values_list('model_version', 'query_text')),
+            sorted([('old-model', 'microscope'), (query_cache.model_version(), 'microscope')]),
+        )
+
+    def test_stats_requires_admin(self):
+        """Test that cache statistics are only available to admins"""
+        response = self.client.get('/api/search-cache/')
+        self.assertEqual(response.status_code, 403)
+
+        self.user.is_staff = True
+        self.user.save()
+        response = self.client.get('/api/search-cache/')
+        self.assertEqual(response.status_code, 200)
+        for key in ('memory_hits', 'database_hits', 'misses', 'hit_rate', 'database_entries'):
+            self.assertIn(key, response.data)
+
+
+class HybridSearchTest(SearchAPITestCase):
+    """Test full-text search and reciprocal rank fusion with vector search"""
+
+    def setUp(self):
+        super().setUp()
+        self.centrifuge = Instrument.objects.create(
+            tuotenimi="Sentrifugi",
+            tuotenimi_en="Centrifuge",
+            merkki_ja_malli="Eppendorf 5424-R",
+            sarjanumero="SN-99812",
+            embedding_en=[0.0, 1.0] + [0.0] * 766
+        )
+        self.microscope = Instrument.objects.create(
+            tuotenimi="Mikroskooppi",
+            tuotenimi_en="Microscope",
+            embedding_en=[1.0] + [0.0] * 767
+        )
+
+    def test_reciprocal_rank_fusion(self):
+        """Test that items ranked high in several lists come first"""
+        fused = reciprocal_rank_fusion([['a', 'b', 'c'], ['b', 'c', 'd']], key=lambda item: item, k=60)
+        self.assertEqual(fused, ['b', 'c', 'a', 'd'])
+
+    def test_search_vector_maintained_by_trigger(self):
+        """Test that the full-text document follows changes to the indexed fields"""
+        matches = Instrument.objects.filter(search_vector=SearchQuery('sn-99812', config='simple'))
+        self.assertEqual(list(matches), [self.centrifuge])
+
+        self.centrifuge.sarjanumero = "SN-12345"
+        self.centrifuge.save()
+        matches = Instrument.objects.filter(search_vector=SearchQuery('sn-99812', config='simple'))
+        self.assertFalse(matches.exists())
+
+    @patch('instrument_registry.views.requests.post')
+    def test_serial_number_found_without_embedding(self, mock_post):
+        """Test that exact serial numbers are found even when the semantic service is down"""
+        mock_post.side_effect = requests.exceptions.RequestException("Down")
+
+        response = self.client.get('/api/instruments/search/?q=SN-99812')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([item['id'] for item in response.data], [self.centrifuge.id])
+
+    @patch('instrument_registry.views.requests.post')
+    @patch('instrument_registry.views.should_translate_to_english')
+    def test_hybrid_and_semantic_modes(self, mock_should_translate, mock_post):
+        """Test that hybrid mode adds full-text matches beyond the distance threshold"""
+        self._mock_service(mock_should_translate, mock_post)
+
+        response = self.client.get('/api/instruments/search/?q=Eppendorf')
+        self.assertEqual([item['id'] for item in response.data], [self.centrifuge.id, self.microscope.id])
+
+        response = self.client.get('/api/instruments/search/?q=Eppendorf&mode=semantic')
+        self.assertEqual([item['id'] for item in response.data], [self.microscope.id])
+
+        response = self.client.get('/api/instruments/search/?q=Eppendorf&mode=other')
+        self.assertEqual(response.status_code, 400)
+
+
+class SearchPaginationTest(SearchAPITestCase):
+    """Test keyset-paginated semantic search"""
+
+    def setUp(self):
+        super().setUp()
+        # Increasing distance from the query [1, 0, ...]; the two microscopes share an embedding
+        for i, name in enumerate(["Mikroskooppi", "Mikroskooppi", "Sentrifugi", "Pipetti", "Vaaka", "Uuni"]):
+            Instrument.objects.create(tuotenimi=name, embedding_en=[1.0, 0.1 * i] + [0.0] * 766)
+        # Beyond the distance threshold
+        Instrument.objects.create(tuotenimi="Kaukoputki", embedding_en=[0.0, 1.0] + [0.0] * 766)
+
+        self.expected = list(
+            Instrument.objects
+            .annotate(distance=CosineDistance('canonical_embedding__embedding', [1.0] + [0.0] * 767))
+            .filter(distance__lt=0.5)
+            .order_by('distance', 'pk')
+            .values_list('pk', flat=True)
+        )
+
+    def _collect_pages(self, page_size):
+        ids = []
+        url = f'/api/instruments/search/?q=Microscope&page_size={page_size}'
+        response = self.client.get(url)
+        while True:
+            self.assertEqual(response.status_code, 200)
+            self.assertLessEqual(len(response.data['results']), page_size)
+            self.assertEqual(response.data['match_count'], len(self.expected))
+            self.assertFalse(response.data['match_count_capped'])
+            ids += [item['id'] for item in response.data['results']]
+            if response.data['next_cursor'] is None:
+                return ids
+            response = self.client.get(url + f"&cursor={response.data['next_cursor']}")
+
+    @patch('instrument_registry.views.requests.post')
+    @patch('instrument_registry.views.should_translate_to_english')
+    def test_pages_follow_distance_order(self, mock_should_translate, mock_post):
+        """Test that walking the cursors returns every match once, in order, with one embedding request"""
+        self._mock_service(mock_should_translate, mock_post)
+
+        self.assertEqual(self._collect_pages(page_size=1), self.expected)
+        self.assertEqual(self._collect_pages(page_size=2), self.expected)
+        self.assertEqual(mock_post.call_count, 1)
+
+        with override_settings(SEARCH_BINARY_QUANTIZATION=True):
+            self.assertEqual(self._collect_pages(page_size=3), self.expected)
+
+    @patch('instrument_registry.views.requests.post')
+    @patch('instrument_registry.views.should_translate_to_english')
+    def test_pages_reach_past_ef_search(self, mock_should_translate, mock_post):
+        """Test that deep pages and the match count are not cut at the ef_search candidates of the HNSW index"""
+        self._mock_service(mock_should_translate, mock_post)
+        for i in range(1, 151):
+            Instrument.objects.create(tuotenimi=f"Laite {i}", embedding_en=[1.0, 0.0, 0.01 * i] + [0.0] * 765)
+        self.expected = list(
+            Instrument.objects
+            .annotate(distance=CosineDistance('canonical_embedding__embedding', [1.0] + [0.0] * 767))
+            .filter(distance__lt=0.5)
+            .order_by('distance', 'pk')
+            .values_list('pk', flat=True)
+        )
+        self.assertGreater(len(self.expected), InstrumentSearch.RESULT_LIMIT)
+
+        # Make the planner order by the HNSW index even on this small table
+        with connection.cursor() as cursor:
+            for setting in ('enable_seqscan', 'enable_bitmapscan', 'enable_sort'):
+                cursor.execute(f'SET LOCAL {setting} = off')
+
+        self.assertEqual(self._collect_pages(page_size=20), self.expected)
+
+    @patch('instrument_registry.views.requests.post')
+    @patch('instrument_registry.views.should_translate_to_english')
+    def test_match_count_is_capped(self, mock_should_translate, mock_post):
+        """Test that the first page counts matches only up to SEARCH_MATCH_COUNT_LIMIT"""
+        self._mock_service(mock_should_translate, mock_post)
+
+        with override_settings(SEARCH_MATCH_COUNT_LIMIT=3):
+            response = self.client.get('/api/instruments/search/?q=Microscope&page_size=2')
+            self.assertEqual(response.data['match_count'], 3)
+            self.assertTrue(response.data['match_count_capped'])
+
+            response = self.client.get(f"/api/instruments/search/?q=Microscope&page_size=2&cursor={response.data['next_cursor']}")
+            self.assertEqual(response.data['match_count'], 3)
+            self.assertTrue(response.data['match_count_capped'])
+
+    @patch('instrument_registry.views.requests.post')
+    @patch('instrument_registry.views.should_translate_to_english')
+    def test_pagination_only_with_parameters(self, mock_should_translate, mock_post):
+        """Test that the plain list response is kept unless a page size or cursor is given"""
+        self._mock_service(mock_should_translate, mock_post)
+
+        response = self.client.get('/api/instruments/search/?q=Microscope&mode=semantic')
+        self.assertEqual([item['id'] for item in response.data], self.expected)
+
+        response = self.client.get('/api/instruments/search/?q=Microscope&page_size=100')
+        self.assertEqual([item['id'] for item in response.data['results']], self.expected)
+        self.assertIsNone(response.data['next_cursor'])
+
+    def test_invalid_cursor(self):
+        """Test that malformed cursors and page sizes are rejected"""
+        for params in ('cursor=not-a-cursor', 'cursor=e30=', 'page_size=0', 'page_size=abc'):
+            response = self.client.get(f'/api/instruments/search/?q=Microscope&{params}')
+            self.assertEqual(response.status_code, 400, params)
+
+
+class FilteredSearchTest(SearchAPITestCase):
+    """Test that location and status filters are applied together with the vector ranking"""
+
+    def setUp(self):
+        super().setUp()
+        # More instruments of another unit than fit in one result list, all closer to the query
+        for i in range(70):
+            Instrument.objects.create(
+                tuotenimi=f"Laite {i}", yksikko="Kemia", tilanne="Käytössä",
+                embedding_en=[1.0, 0.01 * i] + [0.0] * 766
+            )
+        self.expected = [
+            Instrument.objects.create(
+                tuotenimi=f"Mikroskooppi {i}", yksikko="Biologia", tilanne="Käytössä",
+                embedding_en=[1.0, 0.8 + 0.05 * i] + [0.0] * 766
+            ).pk
+            for i in range(3)
+        ]
+        Instrument.objects.create(
+            tuotenimi="Mikroskooppi 3", yksikko="Biologia", tilanne="Poistettu",
+            embedding_en=[1.0, 0.8] + [0.0] * 766
+        )
+
+    @patch('instrument_registry.views.requests.post')
+    @patch('instrument_registry.views.should_translate_to_english')
+    def test_filtered_matches_beyond_unfiltered_limit(self, mock_should_translate, mock_post):
+        """Test that filtered matches are returned even if the unfiltered list would be full without them"""
+        self._mock_service(mock_should_translate, mock_post)
+        url = '/api/instruments/search/?q=Microscope&mode=semantic&yksikko=Biologia&tilanne=K%C3%A4yt%C3%B6ss%C3%A4'
+
+        response = self.client.get(url)
+        self.assertEqual([item['id'] for item in response.data], self.expected)
+
+        with override_settings(SEARCH_BINARY_QUANTIZATION=True):
+            response = self.client.get(url)
+            self.assertEqual([item['id'] for item in response.data], self.expected)
+
+        response = self.client.get('/api/instruments/search/?q=Microscope&mode=semantic')
+        self.assertFalse(set(self.expected) & {item['id'] for item in response.data})
+
+    @patch('instrument_registry.views.requests.post')
+    @patch('instrument_registry.views.should_translate_to_english')
+    def test_filtered_pages_and_full_text(self, mock_should_translate, mock_post):
+        """Test that cursors and full-text matches respect the filters"""
+        self._mock_service(mock_should_translate, mock_post)
+        url = '/api/instruments/search/?q=Mikroskooppi&yksikko=Biologia&tilanne=K%C3%A4yt%C3%B6ss%C3%A4'
+
+        response = self.client.get(url + '&page_size=2')
+        self.assertEqual(response.data['match_count'], 3)
+        ids = [item['id'] for item in response.data['results']]
+        response = self.client.get(url + f"&page_size=2&cursor={response.data['next_cursor']}")
+        ids += [item['id'] for item in response.data['results']]
+        self.assertEqual(ids, self.expected)
+        self.assertIsNone(response.data['next_cursor'])
+
+        response = self.client.get(url)
+        self.assertEqual(sorted(item['id'] for item in response.data), self.expected)
+
+
+class FacetCountsTest(SearchAPITestCase):
+    """Test facet counts of the filter fields next to instrument lists and search results"""
+
+    def setUp(self):
+        super().setUp()
+        Instrument.objects.create(tuotenimi="Mikroskooppi", yksikko="Biologia", tilanne="Käytössä",
+                                  embedding_en=[1.0] + [0.0] * 767)
+        Instrument.objects.create(tuotenimi="Mikroskooppi", yksikko="Biologia", tilanne="Poistettu",
+                                  embedding_en=[1.0] + [0.0] * 767)
+        Instrument.objects.create(tuotenimi="Sentrifugi", yksikko="Kemia", tilanne="Käytössä",
+                                  embedding_en=[1.0, 0.2] + [0.0] * 766)
+        Instrument.objects.create(tuotenimi="Kaukoputki", yksikko="Fysiikka", tilanne="Käytössä",
+                                  embedding_en=[0.0, 1.0] + [0.0] * 766)
+
+    def test_facet_counts(self):
+        """Test that every field is counted in one query, most common values first"""
+        with self.assertNumQueries(1):
+            counts = facet_counts(Instrument.objects.filter(yksikko__in=["Biologia", "Kemia"]))
+
+        self.assertEqual(set(counts), set(FACET_FIELDS))
+        self.assertEqual(counts['yksikko'], [{'value': "Biologia", 'count': 2}, {'value': "Kemia", 'count': 1}])
+        self.assertEqual(counts['tilanne'], [{'value': "Käytössä", 'count': 2}, {'value': "Poistettu", 'count': 1}])
+        self.assertEqual(counts['kampus'], [{'value': "", 'count': 3}])
+        self.assertEqual(facet_counts(Instrument.objects.none())['yksikko'], [])
+
+    def test_list_facets(self):
+        """Test that the instrument list keeps its plain response unless facets are asked for"""
+        response = self.client.get('/api/instruments/')
+        self.assertEqual(len(response.data), 4)
+
+        response = self.client.get('/api/instruments/?facets=true')
+        self.assertEqual(len(response.data['results']), 4)
+        self.assertEqual(response.data['facets']['yksikko'][0], {'value': "Biologia", 'count': 2})
+        self.assertEqual(len(response.data['facets']['yksikko']), 3)
+
+    @patch('instrument_registry.views.requests.post')
+    @patch('instrument_registry.views.should_translate_to_english')
+    def test_search_facets(self, mock_should_translate, mock_post):
+        """Test that search facets count the results and, when paginated, all matches"""
+        self._mock_service(mock_should_translate, mock_post)
+
+        response = self.client.get('/api/instruments/search/?q=Microscope&mode=semantic&tilanne=K%C3%A4yt%C3%B6ss%C3%A4&facets=1')
+        self.assertEqual(len(response.data['results']), 2)
+        self.assertEqual(
+            response.data['facets']['yksikko'],
+            [{'value': "Biologia", 'count': 1}, {'value': "Kemia", 'count': 1}]
+        )
+
+        response = self.client.get('/api/instruments/search/?q=Microscope&page_size=1&facets=true')
+        self.assertEqual(len(response.data['results']), 1)
+        self.assertEqual(
+            response.data['facets']['yksikko'],
+            [{'value': "Biologia", 'count': 2}, {'value': "Kemia", 'count': 1}]
+        )
+        response = self.client.get(f"/api/instruments/search/?q=Microscope&page_size=1&facets=true&cursor={response.data['next_cursor']}")
+        self.assertNotIn('facets', response.data)
+
+
+class BatchSearchTest(SearchAPITestCase):
+    """Test searching several queries with one service call and one SQL statement"""
+
+    def setUp(self):
+        super().setUp()
+        self.microscopes = [
+            Instrument.objects.create(tuotenimi="Mikroskooppi", embedding_en=[1.0, 0.0] + [0.0] * 766),
+            Instrument.objects.create(tuotenimi="Mikroskooppi", embedding_en=[1.0, 0.0] + [0.0] * 766),
+        ]
+        self.stereo = Instrument.objects.create(tuotenimi="Stereomikroskooppi", embedding_en=[1.0, 0.3] + [0.0] * 766)
+        self.centrifuge = Instrument.objects.create(tuotenimi="Sentrifugi", embedding_en=[0.0, 1.0] + [0.0] * 766)
+
+    @patch('instrument_registry.embedding.requests.post')
+    def test_batch_search(self, mock_post):
+        """Test that every query gets its own ranking and only uncached queries are embedded"""
+        query_cache.cache_embedding("centrifuge", [0.0, 1.0] + [0.0] * 766)
+        mock_response = MagicMock()
+        mock_response.json.return_value = {'results': [
+            {'translated_text': 'microscope', 'embedding': [1.0] + [0.0] * 767},
+            {'translated_text': None, 'embedding': None},
+        ]}
+        mock_post.return_value = mock_response
+
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.post('/api/instruments/search/batch/', {
+                'queries': ["mikroskooppi", "centrifuge", "xyzzy", "mikroskooppi"]
+            }, format='json')
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(mock_post.call_count, 1)
+        self.assertTrue(mock_post.call_args.args[0].endswith('/embed_query_batch'))
+        self.assertEqual(
+            [query['text'] for query in mock_post.call_args.kwargs['json']['queries']],
+            ["mikroskooppi", "xyzzy"]
+        )
+        self.assertEqual(len([q for q in queries.captured_queries if 'LATERAL' in q['sql']]), 1)
+
+        expected_microscope = [self.microscopes[0].pk, self.microscopes[1].pk, self.stereo.pk]
+        self.assertEqual([item['query'] for item in response.data], ["mikroskooppi", "centrifuge", "xyzzy", "mikroskooppi"])
+        self.assertEqual([item['id'] for item in response.data[0]['results']], expected_microscope)
+        self.assertEqual([item['id'] for item in response.data[1]['results']], [self.centrifuge.pk])
+        self.assertEqual(response.data[2]['results'], [])
+        self.assertIn('error', response.data[2])
+        self.assertEqual([item['id'] for item in response.data[3]['results']], expected_microscope)
+
+    @patch('instrument_registry.embedding.requests.post')
+    def test_batch_search_service_down(self, mock_post):
+        """Test that a failing semantic service fails the queries, not the request"""
+        mock_post.side_effect = requests.exceptions.RequestException("Down")
+
+        response = self.client.post('/api/instruments/search/batch/', {'queries': ["mikroskooppi"]}, format='json')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data[0]['results'], [])
+        self.assertIn('error', response.data[0])
+
+    def test_invalid_batch(self):
+        """Test that malformed and oversized batches are rejected"""
+        for body in ({}, {'queries': []}, {'queries': "mikroskooppi"}, {'queries': ["ok", " "]}, {'queries': [1]}):
+            response = self.client.post('/api/instruments/search/batch/', body, format='json')
+            self.assertEqual(response.status_code, 400, body)
+
+        with override_settings(SEARCH_BATCH_MAX_QUERIES=2):
+            response = self.client.post('/api/instruments/search/batch/', {'queries': ["a", "b", "c"]}, format='json')
+            self.assertEqual(response.status_code, 400)
+
+
+class EmbeddingFormatTest(TestCase):
+    """Test decoding the binary and base64 embedding formats of the semantic service"""
+
+    def _response(self, content, headers):
+        response = requests.Response()
+        response.status_code = 200
+        response._content = content
+        response.headers.update(headers)
+        return response
+
+    def _raw_response(self, array, dtype):
+        return self._response(np.asarray(array, dtype=dtype).tobytes(), {
+            'Content-Type': f'application/x-embeddings; dtype={np.dtype(dtype).name}',
+            'X-Embedding-Shape': ','.join(str(size) for size in np.shape(array)),
+        })
+
+    def test_decode_formats(self):
+        """Test that raw, base64 and plain JSON responses decode to the same array"""
+        embeddings = [[0.5, -0.25], [1.0, 0.0]]
+        raw = self._raw_response(embeddings, 'float16')
+        encoded = base64.b64encode(np.asarray(embeddings, dtype='<f4').tobytes()).decode()
+        base64_json = self._response(
+            json.dumps({'embeddings': {'dtype': 'float32', 'shape': [2, 2], 'data': encoded}}).encode(),
+            {'Content-Type': 'application/json'}
+        )
+        plain_json = self._response(json.dumps({'embeddings': embeddings}).encode(), {'Content-Type': 'application/json'})
+
+        for response in (raw, base64_json, plain_json):
+            np.testing.assert_array_equal(decode_embeddings(response, 'embeddings'), embeddings)
+
+        empty = self._response(b'', {'Content-Type': 'application/x-embeddings; dtype=float32', 'X-Embedding-Shape': '0'})
+        self.assertIsNone(decode_embeddings(empty, 'embedding'))
+
+    @patch('instrument_registry.views.requests.post')
+    def test_search_with_raw_embedding(self, mock_post):
+        """Test that the search view asks for and uses a raw float32 query embedding"""
+        query_cache.clear_memory_cache()
+        microscope = Instrument.objects.create(tuotenimi="Mikroskooppi", embedding_en=[1.0] + [0.0] * 767)
+        Instrument.objects.create(tuotenimi="Sentrifugi", embedding_en=[0.0, 1.0] + [0.0] * 766)
+        mock_post.return_value = self._raw_response([1.0] + [0.0] * 767, '<f4')
+
+        response = APIClient().get('/api/instruments/search/?q=microscope')
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([item['id'] for item in response.data], [microscope.pk])
+        self.assertTrue(mock_post.call_args.kwargs['headers']['Accept'].startswith('application/x-embeddings'))
+        self.assertEqual(query_cache.get_cached_embedding('microscope')[0], 1.0)
+
+
+class QueryLogTest(SearchAPITestCase):
+    """Test the buffered search query log and warming the query cache from it"""
+
+    def setUp(self):
+        super().setUp()
+        query_log.clear_pending()
+        Instrument.objects.create(tuotenimi="Mikroskooppi", embedding_en=[1.0] + [0.0] * 767)
+
+    @override_settings(SEARCH_QUERY_LOG_FLUSH_INTERVAL=3600, SEARCH_QUERY_LOG_BATCH_SIZE=2)
+    @patch('instrument_registry.views.requests.post')
+    @patch('instrument_registry.views.should_translate_to_english')
+    def test_searches_logged_in_batches(self, mock_should_translate, mock_post):
+        """Test that searches are buffered and written together after a response"""
+        self._mock_service(mock_should_translate, mock_post)
+
+        self.client.get('/api/instruments/search/?q=Mikroskooppi&mode=semantic')
+        self.assertFalse(SearchQueryLog.objects.exists())
+
+        self.client.get('/api/instruments/search/?q=%20mikroskooppi%20&mode=semantic')
+        entries = list(SearchQueryLog.objects.order_by('pk'))
+        self.assertEqual([entry.query_text for entry in entries], ["mikroskooppi", "mikroskooppi"])
+        self.assertEqual([entry.embedding_cached for entry in entries], [False, True])
+        self.assertEqual([entry.result_count for entry in entries], [1, 1])
+        self.assertTrue(all(entry.latency_ms > 0 for entry in entries))
+
+    @override_settings(SEARCH_QUERY_LOG_MAX_PENDING=1)
+    def test_buffer_is_bounded(self):
+        """Test that entries beyond the buffer size are dropped instead of queued"""
+        query_log.log_search("a", 1.0, 0, False)
+        query_log.log_search("b", 1.0, 0, False)
+        self.assertEqual(query_log.flush(), 1)
+        self.assertEqual(list(SearchQueryLog.objects.values_list('query_text', flat=True)), ["a"])
+
+    @patch('instrument_registry.embedding.requests.post')
+    def test_warm_query_cache(self, mock_post):
+        """Test that only the popular uncached queries are embedded, in one batch"""
+        now = timezone.now()
+        logged = [("mikroskooppi", 3, now), ("sentrifugi", 2, now), ("vaaka", 1, now),
+                  ("uuni", 5, now - timedelta(days=100))]
+        SearchQueryLog.objects.bulk_create([
+            SearchQueryLog(query_text=text, latency_ms=10.0, result_count=1, embedding_cached=False, created_at=created_at)
+            for text, count, created_at in logged
+            for _ in range(count)
+        ])
+        query_cache.cache_embedding("sentrifugi", [0.0, 1.0] + [0.0] * 766)
+
+        def embed_batch(url, json, timeout):
+            response = MagicMock()
+            response.json.return_value = {'results': [
+                {'translated_text': None, 'embedding': [1.0] + [0.0] * 767} for _ in json['queries']
+            ]}
+            return response
+        mock_post.side_effect = embed_batch
+
+        out = io.StringIO()
+        call_command('warm_query_cache', top=2, prune=True, stdout=out)
+
+        self.assertEqual(mock_post.call_count, 1)
+        self.assertEqual([query['text'] for query in mock_post.call_args.kwargs['json']['queries']], ["mikroskooppi"])
+        self.assertTrue(QueryEmbedding.objects.filter(query_text="mikroskooppi").exists())
+        self.assertIn("Warmed: 1", out.getvalue())
+        self.assertFalse(SearchQueryLog.objects.filter(query_text="uuni").exists())
+
+        call_command('warm_query_cache', top=2, stdout=io.StringIO())
+        self.assertEqual(mock_post.call_count, 1)
+
+
+class AsyncSearchTest(TestCase):
+    """Test the async search view and cancellation on client disconnect"""
+
+    def setUp(self):
+        query_cache.clear_memory_cache()
+        self.microscope = Instrument.objects.create(
+            tuotenimi="Mikroskooppi", tuotenimi_en="Microscope", embedding_en=[1.0] + [0.0] * 767
+        )
+        Instrument.objects.create(tuotenimi="Kaukoputki", embedding_en=[0.0, 1.0] + [0.0] * 766)
+
+    def _mock_client(self, handler):
+        return patch(
+            'instrument_registry.views.get_async_http_client',
+            return_value=httpx.AsyncClient(transport=httpx.MockTransport(handler)),
+        )
+
+    @patch('instrument_registry.views.should_translate_to_english', return_value=False)
+    async def test_async_search(self, mock_should_translate):
+        """Test that the async view returns the same results as the sync view"""
+        requests_made = []
+
+        async def handler(request):
+            requests_made.append(request.url.path)
+            return httpx.Response(200, json={'embedding': [1.0] + [0.0] * 767})
+
+        with self._mock_client(handler):
+            response = await self.async_client.get('/api/instruments/search/async/?q=Microscope&mode=semantic')
+            self.assertEqual(response.status_code, 200)
+            self.assertEqual([item['id'] for item in response.json()], [self.microscope.id])
+
+            # Served from the query embedding cache
+            response = await self.async_client.get('/api/instruments/search/async/?q=Microscope&page_size=1')
+            self.assertEqual([item['id'] for item in response.json()['results']], [self.microscope.id])
+
+        self.assertEqual(requests_made, ['/embed_query'])
+
+    @override_settings(SEMANTIC_SERVICE_TIMEOUT=0.05)
+    @patch('instrument_registry.views.should_translate_to_english', return_value=False)
+    async def test_service_deadline(self, mock_should_translate):
+        """Test that a slow semantic service is abandoned after the deadline"""
+        async def handler(request):
+            await asyncio.sleep(5)
+
+        with self._mock_client(handler):
+            response = await self.async_client.get('/api/instruments/search/async/?q=Microscope&mode=semantic')
+        self.assertEqual(response.status_code, 500)
+
+    def test_disconnect_cancels_request(self):
+        """Test that a client disconnect cancels the request, but only before the response is complete"""
+        scope = {'type': 'http', 'path': '/api/instruments/search/async/'}
+
+        async def run(app):
+            messages = [{'type': 'http.request', 'body': b'', 'more_body': False}, {'type': 'http.disconnect'}]
+
+            async def receive():
+                await asyncio.sleep(0.01)
+                return messages.pop(0) if messages else await asyncio.sleep(5)
+
+            async def send(message):
+                pass
+
+            await asyncio.wait_for(CancelOnDisconnect(app)(scope, receive, send), timeout=2)
+
+        events = []
+
+        async def slow_app(scope, receive, send):
+            await receive()
+            try:
+                await asyncio.sleep(5)
+            except asyncio.CancelledError:
+                events.append('cancelled')
+                raise
+
+        async def finished_app(scope, receive, send):
+            await receive()
+            await send({'type': 'http.response.start', 'status': 200, 'headers': []})
+            await send({'type': 'http.response.body', 'body': b'[]'})
+            await asyncio.sleep(0.05)
+            events.append('cleaned up')
+
+        asyncio.run(run(slow_app))
+        asyncio.run(run(finished_app))
+        self.assertEqual(events, ['cancelled', 'cleaned up'])
+
+
+class SearchBenchmarkTest(TestCase):
+    """Test the search benchmark command"""
+
+    def _vector_indexes(self):
+        with connection.cursor() as cursor:
+            cursor.execute(
+                "SELECT indexname FROM pg_indexes WHERE tablename = 'instrument_registry_instrumentembedding'"
+            )
+            return {row[0] for row in cursor.fetchall()}
+
+    def test_benchmark_leaves_database_unchanged(self):
+        """Test that every configuration is measured and the synthetic data is rolled back"""
+        indexes = self._vector_indexes()
+
+        with tempfile.NamedTemporaryFile(suffix='.json') as output:
+            call_command(
+                'benchmark_search', sizes=[300], queries=10, warmup=2, output=output.name, stdout=io.StringIO()
+            )
+            report = json.load(open(output.name))
+
+        self.assertEqual([run['configuration'] for run in report['runs']], list(CONFIGURATIONS))
+        for run in report['runs']:
+            self.assertEqual(run['queries'], 10)
+            self.assertLessEqual(run['latency_ms']['p50'], run['latency_ms']['p99'])
+            self.assertGreater(run['mean_results'], 0)
+            if run['configuration'] != 'exact':
+                self.assertGreater(run['recall_vs_exact'], 0.5)
+
+        self.assertEqual(Instrument.objects.count(), 0)
+        self.assertEqual(InstrumentEmbedding.objects.count(), 0)
+        self.assertEqual(self._vector_indexes(), indexes)
+
+    def test_benchmark_searcher_uses_its_own_vector_index(self):
+        """Test that the numpy configuration searches its index directory without changing the settings"""
+        instrument = Instrument.objects.create(tuotenimi="Mikroskooppi", embedding_en=[1.0] + [0.0] * 767)
+
+        with tempfile.TemporaryDirectory() as index_dir:
+            vector_index.rebuild_vector_index(index_dir=index_dir)
+            with patch('instrument_registry.vector_index.search', wraps=vector_index.search) as search:
+                results = BenchmarkSearch(index_dir=index_dir)._search_vectors([1.0] + [0.0] * 767, {})
+
+        self.assertEqual([result.pk for result in results], [instrument.pk])
+        self.assertEqual(search.call_args.kwargs['index_dir'], index_dir)
+        self.assertFalse(vector_index.is_enabled())
+
+    def test_benchmark_refuses_database_with_instruments(self):
+        """Test that the benchmark does not lock and mix with the tables of a database in use"""
+        Instrument.objects.create(tuotenimi="Mikroskooppi", embedding_en=[1.0] + [0.0] * 767)
+
+        with self.assertRaises(CommandError):
+            call_command('benchmark_search', sizes=[300], queries=10, warmup=2, stdout=io.StringIO())
+        self.assertIn('instrument_embedding_hnsw', self._vector_indexes())
+
+
+class SimilarInstrumentsTest(TestCase):
+    """Test the "more like this" endpoint"""
+
+    def setUp(self):
+        similar_instruments.clear_similar_cache()
+        self.client = APIClient()
+        self.microscope = Instrument.objects.create(
+            tuotenimi="Mikroskooppi", tuotenimi_en="Microscope", embedding_en=[1.0, 0.1] + [0.0] * 766
+        )
+        self.microscope_copy = Instrument.objects.create(tuotenimi="Mikroskooppi", tuotenimi_en="Microscope")
+        self.stereo_microscope = Instrument.objects.create(
+            tuotenimi="Stereomikroskooppi", tuotenimi_en="Stereo microscope", embedding_en=[1.0, 0.3] + [0.0] * 766
+        )
+        self.telescope = Instrument.objects.create(
+            tuotenimi="Kaukoputki", tuotenimi_en="Telescope", embedding_en=[0.0, 1.0] + [0.0] * 766
+        )
+
+    def _similar_ids(self, instrument):
+        response = self.client.get(f'/api/instruments/{instrument.pk}/similar/')
+        self.assertEqual(response.status_code, 200)
+        return [item['id'] for item in response.data]
+
+    @patch('instrument_registry.views.requests.post')
+    def test_similar_uses_stored_embedding(self, mock_post):
+        """Test that neighbours are found without the semantic service and the ranking is cached"""
+        self.assertEqual(self._similar_ids(self.microscope), [self.microscope_copy.pk, self.stereo_microscope.pk])
+
+        with patch('instrument_registry.views.InstrumentSimilar._search_vectors') as mock_search:
+            self.assertEqual(
+                self._similar_ids(self.microscope), [self.microscope_copy.pk, self.stereo_microscope.pk]
+            )
+        mock_search.assert_not_called()
+        mock_post.assert_not_called()
+
+        response = self.client.get('/api/instruments/999999/similar/')
+        self.assertEqual(response.status_code, 404)
+
+        response = self.client.get('/api/instruments/abc/similar/')
+        self.assertEqual(response.status_code, 404)
+
+    @patch('instrument_registry.services.instruments.EnrichmentService')
+    def test_changed_embedding_invalidates(self, mock_enrichment):
+        """Test that cached rankings are not used after the instrument's embedding changes"""
+        self.assertEqual(self._similar_ids(self.telescope), [])
+
+        with patch.object(InstrumentService, '_post_to_service', return_value={'embedding': [1.0, 0.15] + [0.0] * 766}):
+            InstrumentService().update_instrument(self.telescope, {'tuotenimi_en': 'Optical telescope'})
+
+        self.assertEqual(self._similar_ids(self.telescope), [self.microscope.pk, self.microscope_copy.pk, self.stereo_microscope.pk])
+
+    @patch('instrument_registry.services.instruments.EnrichmentService')
+    def test_shared_embedding_change_invalidates_every_user(self, mock_enrichment):
+        """Test that re-embedding one instrument drops the rankings of the instruments sharing its row"""
+        self._similar_ids(self.microscope)
+        self.assertIsNotNone(similar_instruments._cache.get(self.microscope.pk))
+
+        with self.captureOnCommitCallbacks(execute=True):
+            with patch.object(InstrumentService, '_post_to_service', return_value={'embedding': [1.0, 0.2] + [0.0] * 766}):
+                InstrumentService().update_instrument(self.microscope_copy, {'tuotenimi_en': 'Light microscope'})
+
+        self.assertIsNone(similar_instruments._cache.get(self.microscope.pk))
+
+
+class NearDuplicateJobTest(TestCase):
+    """Test the tiled and incremental near-duplicate job"""
+
+    K = 3
+    MAX_DISTANCE = 0.3
+
+    def setUp(self):
+        rng = np.random.default_rng(0)
+        self.centers = rng.standard_normal((3, 768))
+        self.rng = rng
+        for i in range(24):
+            # Every fourth instrument repeats a name, so some share an embedding
+            name = f"Laite {i - 1 if i % 4 == 3 else i}"
+            Instrument.objects.create(tuotenimi=name, embedding_en=self._vector(i % 3))
+
+    def _vector(self, cluster):
+        return (self.centers[cluster] + self.rng.normal(0, 0.02, 768)).tolist()
+
+    def _expected_pairs(self):
+        instruments = list(Instrument.objects.filter(canonical_embedding__isnull=False))
+        vectors = {instrument.pk: instrument.embedding_en / np.linalg.norm(instrument.embedding_en) for instrument in instruments}
+        expected = {}
+        for instrument in instruments:
+            ranked = sorted(
+                (
+                    0.0 if other.canonical_embedding_id == instrument.canonical_embedding_id
+                    else 1.0 - float(vectors[instrument.pk] @ vectors[other.pk]),
+                    other.pk,
+                )
+                for other in instruments if other.pk != instrument.pk
+            )
+            expected[instrument.pk] = [pk for distance, pk in ranked if distance < self.MAX_DISTANCE][:self.K]
+        return expected
+
+    def _stored_pairs(self):
+        stored = {pk: [] for pk in Instrument.objects.filter(canonical_embedding__isnull=False).values_list('pk', flat=True)}
+        for pair in SimilarInstrument.objects.order_by('instrument', 'distance', 'similar'):
+            stored[pair.instrument_id].append(pair.similar_id)
+        return stored
+
+    def _run(self, **kwargs):
+        return find_near_duplicates(k=self.K, max_distance=self.MAX_DISTANCE, tile_size=5, **kwargs)
+
+    def test_full_run_matches_brute_force(self):
+        """Test that the tiled computation finds the same neighbours as comparing every pair"""
+        summary = self._run()
+        self.assertTrue(summary['full'])
+        self.assertEqual(self._stored_pairs(), self._expected_pairs())
+        self.assertTrue(SimilarInstrument.objects.filter(distance=0.0).exists())
+
+    def test_incremental_run(self):
+        """Test that an incremental run only recomputes affected rows and matches a full run"""
+        self._run()
+        self.assertEqual(self._run()['recomputed'], 0)
+
+        moved = Instrument.objects.get(tuotenimi="Laite 4")
+        moved.embedding_en = self._vector(2)
+        moved.save()
+        Instrument.objects.create(tuotenimi="Uusi laite", embedding_en=self._vector(0))
+
+        summary = self._run()
+        self.assertFalse(summary['full'])
+        self.assertLess(summary['recomputed'], InstrumentEmbedding.objects.count())
+        self.assertEqual(self._stored_pairs(), self._expected_pairs())
+
+    def test_run_without_pairs_is_recorded(self):
+        """Test that a run storing no pairs still moves the start of the next incremental run"""
+        # Instruments sharing an embedding are always stored as pairs
+        for embedding in InstrumentEmbedding.objects.all():
+            Instrument.objects.filter(pk__in=list(embedding.instruments.order_by('pk').values_list('pk', flat=True)[1:])).delete()
+
+        summary = find_near_duplicates(k=self.K, max_distance=-1.0)
+        self.assertTrue(summary['full'])
+        self.assertEqual(summary['pairs_written'], 0)
+
+        summary = find_near_duplicates(k=self.K, max_distance=-1.0)
+        self.assertFalse(summary['full'])
+        self.assertEqual(summary['recomputed'], 0)
+        self.assertEqual(NearDuplicateRun.objects.count(), 2)
+
+
+class DirectSearchTest(TestCase):
+    """Test the trigram backed direct search endpoint"""
+
+    def setUp(self):
+        self.client = APIClient()
+        self.centrifuge = Instrument.objects.create(
+            tuotenimi="Sentrifugi",
+            tuotenimi_en="Centrifuge",
+            merkki_ja_malli="Eppendorf 5424-R",
+            sarjanumero="SN-99812",
+            huone="B204",
+            kampus="Kauppi",
+            tilanne="Käytössä",
+        )
+        self.microscope = Instrument.objects.create(
+            tuotenimi="Mikroskooppi",
+            tuotenimi_en="Microscope",
+            huone="A101",
+            kampus="Hervanta",
+            lisatieto="Käytetään sentrifugin vieressä",
+            tilanne="Käytössä",
+        )
+
+    def search(self, query, **params):
+        return self.client.get('/api/instruments/search/direct/', {'q': query, **params})
+
+    def ids(self, response):
+        return [item['id'] for item in response.data['results']]
+
+    def test_query_parsing(self):
+        """Test operator precedence, implicit AND and field aliases"""
+        rpn = direct_search.to_rpn(direct_search.tokenize('a OR b AND !room:"B 204"'))
+        self.assertEqual(rpn, [
+            ('term', 'a', None), ('term', 'b', None), ('term', 'B 204', 'room'),
+            ('op', 'NOT'), ('op', 'AND'), ('op', 'OR'),
+        ])
+        rpn = direct_search.to_rpn(direct_search.tokenize('a (b)'))
+        self.assertEqual(rpn, [('term', 'a', None), ('term', 'b', None), ('op', 'AND')])
+
+    def test_substring_and_fuzzy_match(self):
+        """Test that partial words and typos both match"""
+        self.assertEqual(self.ids(self.search('5424')), [self.centrifuge.id])
+        self.assertEqual(self.ids(self.search('mikroskopi')), [self.microscope.id])
+
+    def test_ranked_by_field_weight(self):
+        """Test that a product name match ranks above a match in additional information"""
+        response = self.search('sentrifugi')
+        self.assertEqual(self.ids(response), [self.centrifuge.id, self.microscope.id])
+
+    def test_boolean_and_field_queries(self):
+        """Test AND/OR/NOT and field-qualified terms"""
+        response = self.search('serial_number:SN-99812 OR product_name:mikroskooppi')
+        self.assertEqual(sorted(self.ids(response)), sorted([self.centrifuge.id, self.microscope.id]))
+
+        response = self.search('sentrifugi AND NOT room:A101')
+        self.assertEqual(self.ids(response), [self.centrifuge.id])
+
+        response = self.search('nosuchfield:value')
+        self.assertEqual(response.status_code, 400)
+
+        response = self.search('sentrifugi AND')
+        self.assertEqual(response.status_code, 400)
+
+    def test_filters_and_pagination(self):
+        """Test exact filters and page size"""
+        response = self.search('sentrifugi', huone='A101')
+        self.assertEqual(self.ids(response), [self.microscope.id])
+
+        response = self.search('sentrifugi', kampus='Kauppi')
+        self.assertEqual(self.ids(response), [self.centrifuge.id])
+
+        response = self.search('sentrifugi', page_size=1)
+        self.assertEqual(response.data['count'], 2)
+        self.assertEqual(self.ids(response), [self.centrifuge.id])
+        self.assertIsNotNone(response.data['next'])
+
+        response = self.search('sentrifugi', page_size=1, page=2)
+        self.assertEqual(self.ids(response), [self.microscope.id])
+
+    def test_trigram_index_used(self):
+        """Test that substring and fuzzy predicates can use the trigram indexes"""
+        query, _ = direct_search.build_filter('product_name:sentri')
+        queryset = Instrument.objects.filter(query).only('pk')
+        with transaction.atomic():
+            with connection.cursor() as cursor:
+                cursor.execute('SET LOCAL enable_seqscan = off')
+            plan = queryset.explain()
+        self.assertIn('inst_tuotenimi_trgm', plan)
+        self.assertIn('inst_tuotenimi_en_trgm', plan)
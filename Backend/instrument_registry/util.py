@@ -60,6 +60,23 @@ def parse_date(date_str):
             pass
     return None
 
+def reciprocal_rank_fusion(rankings, key, k=60):
+    """
+    Fuses several ranked lists into one with reciprocal rank fusion.
+    Each item scores sum(1 / (k + rank)) over the lists it appears in (rank is 1-based).
+    Items are identified with key(item); the first occurrence is returned.
+    """
+    scores = {}
+    items = {}
+    for ranking in rankings:
+        for rank, item in enumerate(ranking, start=1):
+            item_key = key(item)
+            scores[item_key] = scores.get(item_key, 0.0) + 1.0 / (k + rank)
+            items.setdefault(item_key, item)
+
+    ordered_keys = sorted(scores, key=lambda item_key: scores[item_key], reverse=True)
+    return [items[item_key] for item_key in ordered_keys]
+
 # Language detector setup for search terms    
 LANGUAGE_DETECTOR = LanguageDetectorBuilder.from_languages(
     Language.ENGLISH,
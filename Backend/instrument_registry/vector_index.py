@@ -0,0 +1,271 @@
+"""
+Memory-mapped Vector Index
+
+Alternative semantic search backend that keeps all shared instrument embeddings
+(InstrumentEmbedding rows) in a single float32 matrix on disk. The matrix is memory-mapped read-only, so every
+gunicorn worker shares the same pages through the OS page cache and distance
+computation never touches PostgreSQL.
+
+KEY DESIGN:
+- Two .npy files: vectors.npy (N x 768 float32, L2-normalized) and ids.npy (N int64 InstrumentEmbedding pks)
+- Rows are appended or overwritten in place; the files are never rewritten on updates
+- Removed or missing embeddings are stored as zero rows, which never pass the distance threshold
+- Writers serialize on a lock file, readers remap when the files change on disk
+- Top-k is a single matrix-vector product followed by argpartition
+"""
+
+from contextlib import contextmanager
+from pathlib import Path
+import fcntl
+import logging
+import os
+import threading
+
+import numpy as np
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+EMBEDDING_DIMENSIONS = 768
+
+VECTORS_FILENAME = 'vectors.npy'
+IDS_FILENAME = 'ids.npy'
+LOCK_FILENAME = 'index.lock'
+
+# Per-process cache of the mapped index: (file signature, vectors, ids)
+_mapped_index = None
+_mapped_index_lock = threading.Lock()
+
+
+def is_enabled():
+    return getattr(settings, 'SEARCH_BACKEND', 'pgvector') == 'numpy'
+
+
+def _index_dir(index_dir=None):
+    if index_dir is not None:
+        return Path(index_dir)
+    return Path(getattr(settings, 'VECTOR_INDEX_DIR', settings.BASE_DIR / 'vector_index'))
+
+
+def _paths(index_dir=None):
+    index_dir = _index_dir(index_dir)
+    return index_dir / VECTORS_FILENAME, index_dir / IDS_FILENAME
+
+
+def index_exists():
+    vectors_path, ids_path = _paths()
+    return vectors_path.exists() and ids_path.exists()
+
+
+@contextmanager
+def _write_lock(index_dir=None):
+    """Serializes writers across worker processes and management commands."""
+    index_dir = _index_dir(index_dir)
+    index_dir.mkdir(parents=True, exist_ok=True)
+    with open(index_dir / LOCK_FILENAME, 'w') as lock_file:
+        fcntl.flock(lock_file, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+
+def _normalize_rows(vectors):
+    vectors = np.asarray(vectors, dtype=np.float32).reshape(-1, EMBEDDING_DIMENSIONS)
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return vectors / norms
+
+
+def _to_row(embedding):
+    if embedding is None:
+        return np.zeros((1, EMBEDDING_DIMENSIONS), dtype=np.float32)
+    if hasattr(embedding, 'to_numpy'):
+        # HalfVector as stored in InstrumentEmbedding
+        embedding = embedding.to_numpy()
+    return _normalize_rows(embedding)
+
+
+def _signature(*paths):
+    stats = [os.stat(path) for path in paths]
+    return tuple((stat.st_ino, stat.st_mtime_ns, stat.st_size) for stat in stats)
+
+
+def _load_index(index_dir=None):
+    """
+    Returns the (vectors, ids) memory maps for this process, remapping them
+    if another process has modified the index since the last call.
+    Returns None if the index has not been built.
+    """
+    global _mapped_index
+
+    vectors_path, ids_path = _paths(index_dir)
+    try:
+        signature = _signature(vectors_path, ids_path)
+    except FileNotFoundError:
+        return None
+
+    with _mapped_index_lock:
+        if _mapped_index is None or _mapped_index[0] != signature:
+            vectors = np.load(vectors_path, mmap_mode='r')
+            ids = np.load(ids_path, mmap_mode='r')
+            # A concurrent append may have grown one file before the other
+            count = min(len(vectors), len(ids))
+            _mapped_index = (signature, vectors[:count], ids[:count])
+        return _mapped_index[1], _mapped_index[2]
+
+
+def search(embedding, limit, max_distance, index_dir=None):
+    """
+    Returns a list of (InstrumentEmbedding pk, cosine distance) tuples for the
+    nearest embeddings, ordered by distance. Returns None if the index has not been built.
+    index_dir defaults to VECTOR_INDEX_DIR.
+    """
+    index = _load_index(index_dir)
+    if index is None:
+        return None
+
+    vectors, ids = index
+    if len(ids) == 0 or limit <= 0:
+        return []
+
+    query = _to_row(embedding)[0]
+    distances = 1.0 - vectors @ query
+
+    k = min(limit, len(distances))
+    candidates = np.argpartition(distances, k - 1)[:k]
+    candidates = candidates[np.argsort(distances[candidates], kind='stable')]
+    candidates = candidates[distances[candidates] < max_distance]
+
+    return list(zip(ids[candidates].tolist(), distances[candidates].tolist()))
+
+
+def rebuild_vector_index(chunk_size=2000, index_dir=None):
+    """
+    Builds the index from scratch from all shared embeddings.
+    index_dir defaults to VECTOR_INDEX_DIR.
+    """
+    from instrument_registry.models import InstrumentEmbedding
+
+    queryset = InstrumentEmbedding.objects.order_by('pk')
+    count = queryset.count()
+    vectors_path, ids_path = _paths(index_dir)
+
+    with _write_lock(index_dir):
+        tmp_vectors_path = vectors_path.with_suffix('.tmp.npy')
+        tmp_ids_path = ids_path.with_suffix('.tmp.npy')
+
+        vectors = np.lib.format.open_memmap(
+            tmp_vectors_path, mode='w+', dtype=np.float32, shape=(count, EMBEDDING_DIMENSIONS)
+        )
+        ids = np.lib.format.open_memmap(tmp_ids_path, mode='w+', dtype=np.int64, shape=(count,))
+
+        row = 0
+        rows = queryset.values_list('pk', 'embedding').iterator(chunk_size=chunk_size)
+        for pk, embedding in rows:
+            if row >= count:
+                break
+            ids[row] = pk
+            vectors[row] = _to_row(embedding)[0]
+            row += 1
+
+        vectors.flush()
+        ids.flush()
+        del vectors, ids
+
+        # Rows deleted between count() and iteration leave zero rows with pk 0
+        os.replace(tmp_vectors_path, vectors_path)
+        os.replace(tmp_ids_path, ids_path)
+
+    logger.info(f"Vector index rebuilt with {row} embeddings")
+    return row
+
+
+def _append_rows(path, rows, dtype):
+    """
+    Appends rows to an .npy file in place and rewrites its header.
+    numpy pads the header so the shape can grow without changing its length.
+    """
+    with open(path, 'r+b') as f:
+        version = np.lib.format.read_magic(f)
+        if version == (1, 0):
+            shape, fortran_order, file_dtype = np.lib.format.read_array_header_1_0(f)
+        else:
+            shape, fortran_order, file_dtype = np.lib.format.read_array_header_2_0(f)
+        f.seek(0, os.SEEK_END)
+        f.write(np.ascontiguousarray(rows, dtype=dtype).tobytes())
+        f.seek(0)
+        header = {
+            'descr': np.lib.format.dtype_to_descr(file_dtype),
+            'fortran_order': fortran_order,
+            'shape': (shape[0] + len(rows),) + shape[1:],
+        }
+        if version == (1, 0):
+            np.lib.format.write_array_header_1_0(f, header)
+        else:
+            np.lib.format.write_array_header_2_0(f, header)
+
+
+def update_vector_index(embeddings):
+    """
+    Writes the given InstrumentEmbedding rows into the index (None entries are ignored).
+    Existing rows are overwritten in place, new embeddings are appended.
+    Does nothing if the numpy backend is disabled or the index has not been built.
+    """
+    if not is_enabled() or not index_exists():
+        return
+
+    updates = {row.pk: row.embedding for row in embeddings if row is not None and row.pk}
+    if not updates:
+        return
+
+    vectors_path, ids_path = _paths()
+
+    try:
+        with _write_lock():
+            ids = np.load(ids_path, mmap_mode='r')
+            vectors = np.load(vectors_path, mmap_mode='r+')
+            count = min(len(ids), len(vectors))
+
+            positions = {pk: row for row, pk in enumerate(ids[:count].tolist())}
+
+            new_ids = []
+            new_vectors = []
+            for pk, embedding in updates.items():
+                row = positions.get(pk)
+                if row is not None:
+                    vectors[row] = _to_row(embedding)[0]
+                elif embedding is not None:
+                    new_ids.append(pk)
+                    new_vectors.append(_to_row(embedding)[0])
+
+            vectors.flush()
+            del vectors, ids
+
+            if new_ids:
+                # Vectors first: readers only use rows that have an id
+                _append_rows(vectors_path, np.stack(new_vectors), np.float32)
+                _append_rows(ids_path, np.asarray(new_ids), np.int64)
+    except Exception as exc:
+        # The index is a derived cache; a failed update must not break saving instruments
+        logger.error(f"Vector index update failed: {exc}")
+
+
+def remove_from_vector_index(pks):
+    """Clears the rows of deleted embeddings so they are never returned."""
+    if not is_enabled() or not index_exists():
+        return
+
+    pks = set(pks)
+    vectors_path, ids_path = _paths()
+
+    try:
+        with _write_lock():
+            ids = np.load(ids_path, mmap_mode='r')
+            vectors = np.load(vectors_path, mmap_mode='r+')
+            count = min(len(ids), len(vectors))
+            rows = np.flatnonzero(np.isin(ids[:count], list(pks)))
+            vectors[rows] = 0.0
+            vectors.flush()
+    except Exception as exc:
+        logger.error(f"Vector index removal failed: {exc}")
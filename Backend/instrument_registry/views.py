@@ -1,29 +1,63 @@
-from instrument_registry.models import Instrument, RegistryUser, InviteCode, InstrumentAttachment
+from instrument_registry.models import Instrument, InstrumentEmbedding, BinaryQuantize, RegistryUser, InviteCode, InstrumentAttachment
 from instrument_registry.serializers import InstrumentSerializer, InstrumentCSVSerializer, RegistryUserSerializer, InstrumentAttachmentSerializer
 from instrument_registry.authentication import JSONAuthentication
-from instrument_registry.util import model_to_csv, parse_date, should_translate_to_english, check_csv_duplicates, clean_whitespace
+from instrument_registry.util import model_to_csv, parse_date, should_translate_to_english, check_csv_duplicates, clean_whitespace, reciprocal_rank_fusion
 from instrument_registry.translations import translate_password_error
 from instrument_registry.job_runner import run_precompute_subprocess
+from instrument_registry import vector_index, query_cache, query_log, direct_search, similar_instruments, facets
+from instrument_registry.embedding_format import accept_header, decode_embeddings
 from simple_history.utils import bulk_create_with_history
 from rest_framework.views import APIView
 from rest_framework import generics, permissions
 from rest_framework.exceptions import PermissionDenied
+from rest_framework.pagination import PageNumberPagination
 from rest_framework.response import Response
 from knox import views as knox_views
 from knox.auth import TokenAuthentication
-from django.http import HttpResponse, FileResponse
+from django.http import HttpResponse, FileResponse, JsonResponse
+from django.views import View
 from django.conf import settings
 from datetime import datetime
-from django.db.models import Q
+from django.db import transaction, connection
+from django.db.models import Exists, OuterRef, Q, F
+from django.db.models.functions import Cast
+from django.contrib.postgres.search import SearchQuery, SearchRank
+from concurrent.futures import ThreadPoolExecutor
+from asgiref.sync import sync_to_async
+import asyncio
+import base64
+import binascii
 import csv
 import io
 import logging
-from pgvector.django import CosineDistance
+import time
+from pgvector import HalfVector
+from pgvector.django import CosineDistance, HammingDistance, VectorField
+import httpx
 import requests
 import json
+import weakref
 
 logger = logging.getLogger(__name__)
 
+# Threads for semantic service requests that run while the database is queried
+semantic_service_executor = ThreadPoolExecutor(max_workers=8, thread_name_prefix='semantic-service')
+
+# One pooled async HTTP client per event loop for the async search view
+_async_http_clients = weakref.WeakKeyDictionary()
+
+
+def get_async_http_client():
+    loop = asyncio.get_running_loop()
+    client = _async_http_clients.get(loop)
+    if client is None:
+        client = httpx.AsyncClient(timeout=httpx.Timeout(
+            getattr(settings, 'SEMANTIC_SERVICE_TIMEOUT', 20.0),
+            connect=getattr(settings, 'SEMANTIC_SERVICE_CONNECT_TIMEOUT', 2.0),
+        ))
+        _async_http_clients[loop] = client
+    return client
+
 # Custom authentication class to handle login tokens in HttpOnly cookies
 class CookieTokenAuthentication(TokenAuthentication):
     def authenticate(self, request):
@@ -36,23 +70,33 @@ class CookieTokenAuthentication(TokenAuthentication):
 """
 Instrument related views
 """
-# This view returns all of the instruments in the database.
+# This view returns all of the instruments in the database, optionally with
+# facet counts of the filter fields (?facets=true)
 class InstrumentList(generics.ListCreateAPIView):
-    queryset = Instrument.objects.defer('embedding_en', 'enriched_description')
+    queryset = Instrument.objects.defer('enriched_description', 'search_vector')
     serializer_class = InstrumentSerializer
     authentication_classes = [CookieTokenAuthentication]
     permission_classes = [permissions.IsAuthenticatedOrReadOnly]
 
+    def list(self, request, *args, **kwargs):
+        response = super().list(request, *args, **kwargs)
+        if facets.wants_facets(request.query_params):
+            response.data = {
+                'results': response.data,
+                'facets': facets.facet_counts(self.get_queryset()),
+            }
+        return response
+
 # This view returns a single instrument.
 class InstrumentDetail(generics.RetrieveUpdateDestroyAPIView):
-    queryset = Instrument.objects.defer('embedding_en', 'enriched_description')
+    queryset = Instrument.objects.defer('enriched_description', 'search_vector')
     serializer_class = InstrumentSerializer
     authentication_classes = [CookieTokenAuthentication]
     permission_classes = [permissions.IsAuthenticatedOrReadOnly]
 
 # This view returns the history of a single instrument.
 class InstrumentHistory(generics.RetrieveAPIView):
-    queryset = Instrument.objects.defer('embedding_en', 'enriched_description')
+    queryset = Instrument.objects.defer('enriched_description', 'search_vector')
     authentication_classes = [CookieTokenAuthentication]
     permission_classes = [permissions.IsAuthenticated]
 
@@ -67,7 +111,7 @@ class InstrumentHistory(generics.RetrieveAPIView):
         first_record = history_records[0]
         changes = []
 
-        exclude_fields = ['embedding_fi', 'embedding_en', 'enriched_description']
+        exclude_fields = ['embedding_fi', 'canonical_embedding', 'enriched_description', 'search_vector']
         # Add first record as creation event
         changes.append({
             'history_date': first_record.history_date,
@@ -142,13 +186,10 @@ class InstrumentValueSet(APIView):
     permission_classes = [permissions.IsAuthenticatedOrReadOnly]
 
     def get(self, request, field_name):
-        field_names = [f.name for f in Instrument._meta.get_fields()]
+        field_names = [f.name for f in Instrument._meta.concrete_fields]
         if field_name not in field_names:
             return Response({'message': 'no such field'}, status=400)
-        unique_values = set()
-        instruments = Instrument.objects.defer('embedding_en', 'enriched_description')
-        for i in instruments:
-            unique_values.add(getattr(i, field_name))
+        unique_values = Instrument.objects.order_by().values_list(field_name, flat=True).distinct()
         return Response({'data': list(unique_values)})
 
 # This view returns all the data in Instrument table as a csv file.
@@ -163,7 +204,7 @@ class InstrumentCSVExport(APIView):
 
         now = datetime.now().strftime('%G-%m-%d')
         filename = 'laiterekisteri_' + now + '.csv'
-        source = model_to_csv(InstrumentCSVSerializer, Instrument.objects.defer('embedding_en', 'enriched_description'))
+        source = model_to_csv(InstrumentCSVSerializer, Instrument.objects.defer('enriched_description', 'search_vector'))
 
         # Read the CSV content and add UTF-8 BOM for Excel compatibility
         csv_content = source.read()
@@ -314,7 +355,7 @@ class EmbeddingStatus(APIView):
 
     def get(self, request):
         pending_qs = Instrument.objects.filter(
-            Q(embedding_en__isnull=True) &
+            Q(canonical_embedding__isnull=True) &
             ~Q(tuotenimi_en__exact="Translation Failed")
         )
         pending_count = pending_qs.count()
@@ -325,65 +366,432 @@ class EmbeddingStatus(APIView):
             'failed_count': failed_count,
         })
 
-# This view returns semantic search results
-class InstrumentSearch(APIView):
-    authentication_classes = [CookieTokenAuthentication]
-    permission_classes = [permissions.IsAuthenticatedOrReadOnly]
-
+class InstrumentSearchMixin:
+    """
+    Ranking logic shared by the sync and async semantic search views. Only the
+    way the query embedding is fetched differs between them.
+    """
     SERVICE_URL = getattr(settings, 'SEMANTIC_SERVICE_URL', 'http://semantic-search-service:8001')
 
     # Search term - search result cosine distance treshold
     # Distance of 0.0 is identical.
     MAX_DISTANCE_THRESHOLD = 0.5
 
-    def get(self, request):
-        search_term = request.query_params.get('q', '').strip()
+    # Maximum number of search results returned
+    RESULT_LIMIT = 60
+
+    # 'hybrid' fuses full-text and vector rankings, 'semantic' only uses vectors
+    SEARCH_MODES = ('hybrid', 'semantic')
+
+    def _parse_search_params(self, params):
+        """
+        Validates the query parameters. Returns (options, None) or (None, error message).
+        """
+        search_term = params.get('q', '').strip()
 
         if not search_term:
-            return Response({'message': 'search term not provided'}, status=400)
+            return None, 'search term not provided'
+
+        mode = params.get('mode', getattr(settings, 'SEARCH_MODE', 'hybrid'))
+        if mode not in self.SEARCH_MODES:
+            return None, 'invalid search mode'
+
+        options = {
+            'search_term': search_term,
+            'mode': mode,
+            'paginated': False,
+            'filters': facets.filters_from_params(params),
+            'facets': facets.wants_facets(params),
+        }
+
+        # Giving a page size or a cursor switches to keyset pagination. Pages
+        # follow the vector distance order, which fused rankings do not have.
+        if 'cursor' in params or 'page_size' in params:
+            try:
+                options.update({
+                    'mode': 'semantic',
+                    'paginated': True,
+                    'page_size': self._get_page_size(params),
+                    'cursor': self._decode_cursor(params.get('cursor')),
+                })
+            except ValueError:
+                return None, 'invalid cursor or page size'
 
-        embedding = self._fetch_query_embedding(search_term)
+        return options, None
 
-        if not embedding:
-            return Response(
-	            {'message': f'Failed to generate search embedding'},
-	            status=500
+    def _build_results(self, params, options, embedding, text_matches):
+        """
+        Ranks the matches once the query embedding is known. Returns (data, status).
+        """
+        # Full-text matches can still be returned if the semantic service fails
+        if not embedding and not text_matches:
+            return {'message': 'Failed to generate search embedding'}, 500
+
+        if options['paginated']:
+            page = self._get_page(embedding, params, options['page_size'], options['cursor'], options['filters'])
+            # Like match_count, facets cover all matches and come with the first page
+            if options['facets'] and options['cursor'] is None:
+                page['facets'] = facets.facet_counts(self._distance_queryset(embedding, options['filters']))
+            return page, 200
+
+        vector_matches = self._search_vectors(embedding, params, filters=options['filters']) if embedding else []
+
+        if options['mode'] == 'hybrid':
+            instruments = reciprocal_rank_fusion(
+                [text_matches, vector_matches],
+                key=lambda instrument: instrument.pk,
+                k=getattr(settings, 'SEARCH_RRF_K', 60),
+            )[:self.RESULT_LIMIT]
+        else:
+            instruments = vector_matches
+
+        data = InstrumentSerializer(instruments, many=True).data
+        if options['facets']:
+            data = {
+                'results': data,
+                'facets': facets.facet_counts(Instrument.objects.filter(pk__in=[i.pk for i in instruments])),
+            }
+        return data, 200
+
+    def _get_page(self, embedding, params, page_size, cursor, filters=None):
+        """
+        Returns one page of semantic results ordered by (distance, instrument id).
+        The first page comes from the approximate index like the unpaginated
+        search, deeper pages continue exactly after the (distance, id) of the
+        cursor. The query embedding is not part of the cursor: it is found in
+        the query embedding cache, so deeper pages skip the semantic service.
+        """
+        ef_search = self._get_ef_search(params)
+        if cursor is None:
+            instruments = self._search_vectors(embedding, params, limit=page_size + 1, filters=filters)
+        else:
+            instruments = self._search_after(embedding, cursor, page_size + 1, filters, ef_search)
+
+        has_next = len(instruments) > page_size
+        instruments = instruments[:page_size]
+
+        if cursor is not None:
+            match_count, match_count_capped = cursor['count'], cursor['capped']
+        elif has_next:
+            match_count, match_count_capped = self._count_matches_capped(embedding, filters, ef_search)
+        else:
+            match_count, match_count_capped = len(instruments), False
+
+        next_cursor = None
+        if has_next:
+            last = instruments[-1]
+            next_cursor = self._encode_cursor({
+                'distance': last.distance,
+                'id': last.pk,
+                'embedding': last.canonical_embedding_id,
+                'count': match_count,
+                'capped': match_count_capped,
+            })
+
+        return {
+            'results': InstrumentSerializer(instruments, many=True).data,
+            'next_cursor': next_cursor,
+            'match_count': match_count,
+            'match_count_capped': match_count_capped,
+        }
+
+    def _search_after(self, embedding, cursor, limit, filters, ef_search):
+        """
+        Keyset query for the instruments after the cursor. Instruments sharing
+        the embedding of the last row are continued by id, because the first
+        page may have computed its distances in a different precision.
+
+        The keyset filter drops every candidate up to the cursor, so an HNSW
+        scan returning at most ef_search candidates would leave deep pages
+        short. The scan is made iterative in strict order instead.
+        """
+        with transaction.atomic():
+            self._set_hnsw_scan(ef_search, iterative_scan='strict_order')
+            return list(
+                self._distance_queryset(embedding, filters)
+                .filter(
+                    Q(canonical_embedding=cursor['embedding'], pk__gt=cursor['id']) |
+                    (Q(distance__gt=cursor['distance']) & ~Q(canonical_embedding=cursor['embedding']))
+                )
+                .defer('enriched_description', 'search_vector')
+                .order_by('distance', 'pk')[:limit]
             )
 
-        # Start with base queryset
-        instruments = (
+    def _count_matches_capped(self, embedding, filters, ef_search):
+        """
+        Returns (count, capped): the number of instruments within the distance
+        threshold, counted up to SEARCH_MATCH_COUNT_LIMIT so a broad query never
+        scans every match. capped means there are more than count. Computed once
+        on the first page and carried in the cursor. Runs under the same scan
+        settings as the deeper pages, so an index scan cannot stop at ef_search.
+        """
+        limit = getattr(settings, 'SEARCH_MATCH_COUNT_LIMIT', 1000)
+        with transaction.atomic():
+            self._set_hnsw_scan(ef_search, iterative_scan='strict_order')
+            count = self._distance_queryset(embedding, filters).order_by()[:limit + 1].count()
+        return min(count, limit), count > limit
+
+    def _distance_queryset(self, embedding, filters=None):
+        return (
             Instrument.objects
-            .annotate(distance=CosineDistance('embedding_en', embedding))
+            .filter(canonical_embedding__isnull=False, **(filters or {}))
+            .annotate(distance=CosineDistance('canonical_embedding__embedding', self._query_vector(embedding)))
             .filter(distance__lt=self.MAX_DISTANCE_THRESHOLD)
-            .defer('embedding_en', 'enriched_description')
-            .order_by('distance')[:60]
         )
 
-        serializer = InstrumentSerializer(instruments, many=True)
-        return Response(serializer.data)
+    def _get_page_size(self, params):
+        page_size = int(params.get('page_size', getattr(settings, 'SEARCH_PAGE_SIZE', 20)))
+        if page_size < 1:
+            raise ValueError("page size must be positive")
+        return min(page_size, getattr(settings, 'SEARCH_MAX_PAGE_SIZE', 100))
+
+    def _encode_cursor(self, position):
+        return base64.urlsafe_b64encode(json.dumps(position).encode()).decode()
+
+    def _decode_cursor(self, cursor):
+        """Returns the position stored in the cursor, None for the first page. Raises ValueError."""
+        if not cursor:
+            return None
+        try:
+            position = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+            return {
+                'distance': float(position['distance']),
+                'id': int(position['id']),
+                'embedding': int(position['embedding']),
+                'count': int(position['count']),
+                'capped': bool(position['capped']),
+            }
+        except (binascii.Error, TypeError, KeyError, UnicodeDecodeError) as exc:
+            # json.JSONDecodeError is a ValueError already
+            raise ValueError("invalid cursor") from exc
+
+    def _search_vectors(self, embedding, params, limit=None, filters=None):
+        limit = limit or self.RESULT_LIMIT
+        instruments = None
+        # The in-process index only knows vectors; filtered searches go to
+        # pgvector so the filters are applied during the index scan.
+        if self._use_vector_index() and not filters:
+            instruments = self._search_vector_index(embedding, limit)
+            if instruments is None:
+                logger.warning("Vector index not built, falling back to pgvector search")
+
+        if instruments is None:
+            instruments = self._search_pgvector(embedding, self._get_ef_search(params), limit, filters)
+        return instruments
+
+    def _search_full_text(self, text, filters=None):
+        """
+        Ranks instruments by weighted full-text match. The query is parsed with
+        the Finnish, English and simple configurations because the language of
+        the query is not known; 'simple' keeps model and serial numbers intact.
+        """
+        query = (
+            SearchQuery(text, config='finnish', search_type='websearch') |
+            SearchQuery(text, config='english', search_type='websearch') |
+            SearchQuery(text, config='simple', search_type='websearch')
+        )
+        return list(
+            Instrument.objects
+            .filter(search_vector=query, **(filters or {}))
+            .annotate(rank=SearchRank(F('search_vector'), query))
+            .defer('enriched_description', 'search_vector')
+            .order_by('-rank', 'pk')[:self.RESULT_LIMIT]
+        )
+
+    def _search_pgvector(self, embedding, ef_search, limit, filters=None):
+        """
+        Nearest embeddings from the HNSW index. With filters, only embeddings
+        shared by at least one matching instrument are accepted, and the index
+        scan is made iterative so it keeps going until the page is full (or
+        PGVECTOR_HNSW_MAX_SCAN_TUPLES is reached) instead of returning at most
+        ef_search candidates before the filter.
+        """
+        binary_quantization = self._use_binary_quantization()
+        if binary_quantization:
+            # The bit index scan has to return the whole shortlist
+            ef_search = max(ef_search, self._get_rerank_candidates())
+
+        # The binary shortlist is re-ranked afterwards, so its scan does not
+        # need to return rows in exact distance order.
+        iterative_scan = None
+        if filters:
+            iterative_scan = 'relaxed_order' if binary_quantization else 'strict_order'
+
+        with transaction.atomic():
+            self._set_hnsw_scan(ef_search, iterative_scan)
+
+            embeddings = InstrumentEmbedding.objects.all()
+            if filters:
+                embeddings = embeddings.filter(Exists(
+                    Instrument.objects.filter(canonical_embedding=OuterRef('pk'), **filters)
+                ))
+
+            if binary_quantization:
+                matches = self._search_binary_quantized(embedding, limit, embeddings)
+            else:
+                matches = list(
+                    embeddings
+                    .annotate(distance=CosineDistance('embedding', self._query_vector(embedding)))
+                    .filter(distance__lt=self.MAX_DISTANCE_THRESHOLD)
+                    .order_by('distance')
+                    .values_list('pk', 'distance')[:limit]
+                )
+        return self._expand_embedding_matches(matches, limit, filters)
+
+    def _set_hnsw_scan(self, ef_search, iterative_scan=None):
+        """
+        Sets the HNSW scan parameters for the current transaction. SET LOCAL
+        only lasts until the end of the transaction, so the caller has to
+        evaluate its queries inside the same atomic block.
+        """
+        with connection.cursor() as cursor:
+            cursor.execute('SET LOCAL hnsw.ef_search = %s', [ef_search])
+            if iterative_scan:
+                cursor.execute(f"SET LOCAL hnsw.iterative_scan = {iterative_scan}")
+                cursor.execute(
+                    'SET LOCAL hnsw.max_scan_tuples = %s',
+                    [getattr(settings, 'PGVECTOR_HNSW_MAX_SCAN_TUPLES', 20000)]
+                )
+
+    def _use_vector_index(self):
+        return vector_index.is_enabled()
+
+    def _use_binary_quantization(self):
+        return getattr(settings, 'SEARCH_BINARY_QUANTIZATION', False)
+
+    def _query_vector(self, embedding):
+        # Same type as InstrumentEmbedding.embedding, so the halfvec indexes can be used
+        return HalfVector(embedding)
+
+    def _search_binary_quantized(self, embedding, limit, embeddings=None):
+        """
+        Shortlists embeddings by Hamming distance on the binary-quantized index,
+        then re-ranks the shortlist by exact cosine distance. The re-ranking
+        distance is computed in single precision, which also keeps the planner
+        from answering it with the halfvec index.
+        """
+        if embeddings is None:
+            embeddings = InstrumentEmbedding.objects.all()
+        query_bits = ''.join('1' if value > 0 else '0' for value in embedding)
+        shortlist = (
+            embeddings
+            .order_by(HammingDistance(BinaryQuantize('embedding'), query_bits))
+            .values('pk')[:self._get_rerank_candidates()]
+        )
+        return list(
+            InstrumentEmbedding.objects
+            .filter(pk__in=shortlist)
+            .annotate(distance=CosineDistance(
+                Cast('embedding', VectorField(dimensions=len(embedding))), embedding
+            ))
+            .filter(distance__lt=self.MAX_DISTANCE_THRESHOLD)
+            .order_by('distance')
+            .values_list('pk', 'distance')[:limit]
+        )
+
+    def _get_rerank_candidates(self):
+        return max(self.RESULT_LIMIT, getattr(settings, 'SEARCH_RERANK_CANDIDATES', 400))
+
+    def _search_vector_index(self, embedding, limit):
+        """
+        Computes distances with the in-process vector index and only fetches
+        the matching rows from the database. Returns None if the index is missing.
+        """
+        matches = vector_index.search(embedding, limit, self.MAX_DISTANCE_THRESHOLD)
+        if matches is None:
+            return None
+        return self._expand_embedding_matches(matches, limit)
+
+    def _expand_embedding_matches(self, matches, limit, filters=None):
+        """
+        Turns (InstrumentEmbedding pk, distance) matches into the instruments that
+        share those embeddings (and pass the filters), ordered by distance.
+        """
+        distances = dict(matches)
+        instruments = list(
+            Instrument.objects
+            .filter(canonical_embedding__in=distances.keys(), **(filters or {}))
+            .defer('enriched_description', 'search_vector')
+        )
+        for instrument in instruments:
+            instrument.distance = distances[instrument.canonical_embedding_id]
+        instruments.sort(key=lambda instrument: (instrument.distance, instrument.pk))
+        return instruments[:limit]
+
+    def _get_ef_search(self, params):
+        """
+        Returns the HNSW candidate list size for this request. Can be overridden
+        with the 'ef_search' query parameter, but never drops below the result
+        limit (the index scan would return fewer rows than requested).
+        """
+        ef_search = getattr(settings, 'PGVECTOR_HNSW_EF_SEARCH', 100)
+        max_ef_search = getattr(settings, 'PGVECTOR_HNSW_EF_SEARCH_MAX', 1000)
+
+        try:
+            ef_search = int(params.get('ef_search', ef_search))
+        except (TypeError, ValueError):
+            pass
+
+        return max(self.RESULT_LIMIT, min(ef_search, max_ef_search))
+
+    def _log_search(self, search_term, started_at, data, embedding_cached):
+        results = data.get('results', []) if isinstance(data, dict) else data
+        query_log.log_search(search_term, (time.perf_counter() - started_at) * 1000, len(results), embedding_cached)
+
+    def _get_service_endpoint(self, text):
+        """Returns the semantic service URL and the response key for the query."""
+        if should_translate_to_english(text):
+            return f"{self.SERVICE_URL}/process_query", 'embedding_en'
+        return f"{self.SERVICE_URL}/embed_query", 'embedding'
+
+# This view returns semantic search results, either as a single list of the best
+# matches or page by page with (distance, id) keyset cursors
+class InstrumentSearch(InstrumentSearchMixin, APIView):
+    authentication_classes = [CookieTokenAuthentication]
+    permission_classes = [permissions.IsAuthenticatedOrReadOnly]
+
+    def get(self, request):
+        started_at = time.perf_counter()
+        options, error = self._parse_search_params(request.query_params)
+        if error:
+            return Response({'message': error}, status=400)
+        search_term = options['search_term']
+
+        # Start the semantic service request first so the full-text query
+        # runs while the embedding is being computed.
+        embedding = query_cache.get_cached_embedding(search_term)
+        embedding_cached = embedding is not None
+        pending_embedding = None
+        if embedding is None:
+            pending_embedding = semantic_service_executor.submit(self._fetch_query_embedding, search_term)
+
+        text_matches = self._search_full_text(search_term, options['filters']) if options['mode'] == 'hybrid' else []
+
+        if pending_embedding is not None:
+            embedding = pending_embedding.result()
+            if embedding:
+                query_cache.cache_embedding(search_term, embedding)
+
+        data, status = self._build_results(request.query_params, options, embedding, text_matches)
+        self._log_search(search_term, started_at, data, embedding_cached)
+        return Response(data, status=status)
 
     def _fetch_query_embedding(self, text):
         """
         Helper to handle the external semantic service logic.
         """
+        endpoint, result_key = self._get_service_endpoint(text)
         try:
-            # Determine endpoint and payload
-            if should_translate_to_english(text):
-                endpoint = f"{self.SERVICE_URL}/process_query"
-                result_key = 'embedding_en'
-            else:
-                endpoint = f"{self.SERVICE_URL}/embed_query"
-                result_key = 'embedding'
-
             response = requests.post(
                 endpoint,
                 json={"text": text},
+                headers={'Accept': accept_header()},
                 timeout=20.0
             )
             response.raise_for_status()
 
-            payload = response.json()
-            return payload.get(result_key)
+            embedding = decode_embeddings(response, result_key)
+            return None if embedding is None else embedding.tolist()
 
         except requests.Timeout:
             logger.warning(f"Semantic search timeout for query: '{text}'")
@@ -391,10 +799,274 @@ class InstrumentSearch(APIView):
         except requests.RequestException as e:
             logger.error(f"Semantic search connection error: {e}")
             return None
-        except ValueError:
-            logger.error("Semantic search returned invalid JSON")
+        except (ValueError, KeyError):
+            logger.error("Semantic search returned an invalid embedding response")
+            return None
+
+# This view is the async variant of InstrumentSearch for ASGI deployments. The
+# semantic service call does not hold a worker thread while waiting, and it is
+# cancelled when the client disconnects (see CancelOnDisconnect in Backend/asgi.py).
+# Searching is read-only, so like the sync view it does not require a login.
+class AsyncInstrumentSearch(InstrumentSearchMixin, View):
+
+    async def get(self, request):
+        started_at = time.perf_counter()
+        options, error = self._parse_search_params(request.GET)
+        if error:
+            return JsonResponse({'message': error}, status=400)
+        search_term = options['search_term']
+
+        if options['mode'] == 'hybrid':
+            text_search = sync_to_async(self._search_full_text)(search_term, options['filters'])
+        else:
+            text_search = asyncio.sleep(0, result=[])
+
+        embedding = await sync_to_async(query_cache.get_cached_embedding)(search_term)
+        embedding_cached = embedding is not None
+        if embedding is None:
+            # The full-text query runs while the embedding is being computed
+            text_matches, embedding = await asyncio.gather(
+                text_search, self._fetch_query_embedding(search_term)
+            )
+            if embedding:
+                await sync_to_async(query_cache.cache_embedding)(search_term, embedding)
+        else:
+            text_matches = await text_search
+
+        data, status = await sync_to_async(self._build_results)(request.GET, options, embedding, text_matches)
+        self._log_search(search_term, started_at, data, embedding_cached)
+        return JsonResponse(data, status=status, safe=False)
+
+    async def _fetch_query_embedding(self, text):
+        """
+        Requests the query embedding without blocking the event loop. The whole
+        request, including connecting, has to finish within SEMANTIC_SERVICE_TIMEOUT.
+        Cancellation is not caught, so a disconnecting client aborts the request.
+        """
+        # Language detection is CPU-bound, keep it off the event loop
+        endpoint, result_key = await sync_to_async(self._get_service_endpoint, thread_sensitive=False)(text)
+        try:
+            async with asyncio.timeout(getattr(settings, 'SEMANTIC_SERVICE_TIMEOUT', 20.0)):
+                response = await get_async_http_client().post(
+                    endpoint, json={"text": text}, headers={'Accept': accept_header()}
+                )
+            response.raise_for_status()
+            embedding = decode_embeddings(response, result_key)
+            return None if embedding is None else embedding.tolist()
+
+        except (TimeoutError, httpx.TimeoutException):
+            logger.warning(f"Semantic search timeout for query: '{text}'")
+            return None
+        except httpx.HTTPError as e:
+            logger.error(f"Semantic search connection error: {e}")
+            return None
+        except (ValueError, KeyError):
+            logger.error("Semantic search returned an invalid embedding response")
             return None
 
+# This view returns the instruments closest to an instrument's own stored embedding
+# ("more like this"). The query vector is already known, so nothing is translated or
+# embedded, and the ranking is cached per instrument.
+class InstrumentSimilar(InstrumentSearchMixin, APIView):
+    authentication_classes = [CookieTokenAuthentication]
+    permission_classes = [permissions.IsAuthenticatedOrReadOnly]
+
+    def get(self, request, pk):
+        instrument = (
+            Instrument.objects
+            .filter(pk=pk)
+            .values('pk', 'canonical_embedding_id', 'canonical_embedding__updated_at')
+            .first()
+        )
+        if instrument is None:
+            return Response({'detail': 'Instrument not found.'}, status=404)
+
+        embedding_pk = instrument['canonical_embedding_id']
+        if embedding_pk is None:
+            # Not embedded yet, nothing to compare with
+            return Response([])
+
+        instrument_pk = instrument['pk']
+        embedding_version = (embedding_pk, instrument['canonical_embedding__updated_at'])
+        matches = similar_instruments.get_cached_similar(instrument_pk, embedding_version)
+        if matches is None:
+            matches = self._find_similar(instrument_pk, embedding_pk, request.query_params)
+            similar_instruments.cache_similar(instrument_pk, embedding_version, matches)
+
+        neighbours = (
+            Instrument.objects
+            .defer('enriched_description', 'search_vector')
+            .in_bulk([match_pk for match_pk, _ in matches])
+        )
+        instruments = [neighbours[match_pk] for match_pk, _ in matches if match_pk in neighbours]
+
+        serializer = InstrumentSerializer(instruments, many=True)
+        return Response(serializer.data)
+
+    def _find_similar(self, instrument_pk, embedding_pk, params):
+        """Returns [(pk, distance)] of the nearest other instruments."""
+        limit = getattr(settings, 'SIMILAR_INSTRUMENTS_LIMIT', 20)
+        embedding = (
+            InstrumentEmbedding.objects
+            .values_list('embedding', flat=True)
+            .get(pk=embedding_pk)
+        )
+        # One extra row because the instrument itself is always the closest match
+        instruments = self._search_vectors(embedding.to_list(), params, limit=limit + 1)
+        return [
+            (instrument.pk, instrument.distance)
+            for instrument in instruments
+            if instrument.pk != instrument_pk
+        ][:limit]
+
+# This view runs several semantic searches at once for dashboards and saved
+# searches. The queries are embedded with one semantic service call and searched
+# with one SQL statement. Searching is read-only, so it does not require a login
+# even though the queries are POSTed.
+class InstrumentBatchSearch(InstrumentSearchMixin, APIView):
+    authentication_classes = [CookieTokenAuthentication]
+    permission_classes = [permissions.AllowAny]
+
+    def post(self, request):
+        queries = request.data.get('queries') if isinstance(request.data, dict) else None
+        if not isinstance(queries, list) or not queries or not all(isinstance(q, str) and q.strip() for q in queries):
+            return Response({'message': 'queries must be a non-empty list of search terms'}, status=400)
+
+        max_queries = getattr(settings, 'SEARCH_BATCH_MAX_QUERIES', 20)
+        if len(queries) > max_queries:
+            return Response({'message': f'at most {max_queries} queries per batch'}, status=400)
+
+        queries = [query.strip() for query in queries]
+        embeddings = query_cache.get_query_embeddings(queries)
+        matches = self._search_batch(embeddings, self._get_ef_search(request.query_params))
+
+        # One instrument query for the matches of all queries
+        embedding_pks = {pk for query_matches in matches for pk, _ in query_matches}
+        members = {}
+        instruments = (
+            Instrument.objects
+            .filter(canonical_embedding__in=embedding_pks)
+            .defer('enriched_description', 'search_vector')
+        )
+        for instrument in instruments:
+            members.setdefault(instrument.canonical_embedding_id, []).append(instrument)
+
+        results = []
+        for query, embedding, query_matches in zip(queries, embeddings, matches):
+            if not embedding:
+                results.append({'query': query, 'results': [], 'error': 'Failed to generate search embedding'})
+                continue
+            ranked = sorted(
+                ((distance, instrument.pk, instrument)
+                 for embedding_pk, distance in query_matches
+                 for instrument in members.get(embedding_pk, [])),
+                key=lambda match: match[:2],
+            )
+            instruments = [instrument for _, _, instrument in ranked[:self.RESULT_LIMIT]]
+            results.append({'query': query, 'results': InstrumentSerializer(instruments, many=True).data})
+
+        return Response(results)
+
+    def _search_batch(self, embeddings, ef_search):
+        """
+        Returns [(InstrumentEmbedding pk, distance)] of the nearest embeddings for
+        every query, in one statement: a LATERAL subquery runs the HNSW index scan
+        once per row of a VALUES list of query vectors. Queries without an
+        embedding get an empty list.
+        """
+        matches = [[] for _ in embeddings]
+        positions = [position for position, embedding in enumerate(embeddings) if embedding]
+        if not positions:
+            return matches
+
+        table = connection.ops.quote_name(InstrumentEmbedding._meta.db_table)
+        values = ', '.join(['(%s, %s::halfvec)'] * len(positions))
+        # The distance threshold is applied outside the LATERAL subquery so the
+        # subquery stays a plain ORDER BY ... LIMIT that the index can answer.
+        sql = f"""
+            SELECT query.position, nearest.id, nearest.distance
+            FROM (VALUES {values}) AS query (position, embedding)
+            CROSS JOIN LATERAL (
+                SELECT candidate.id, candidate.embedding <=> query.embedding AS distance
+                FROM {table} AS candidate
+                ORDER BY candidate.embedding <=> query.embedding
+                LIMIT %s
+            ) AS nearest
+            WHERE nearest.distance < %s
+        """
+        params = [
+            value
+            for position in positions
+            for value in (position, self._query_vector(embeddings[position]).to_text())
+        ]
+        params += [self.RESULT_LIMIT, self.MAX_DISTANCE_THRESHOLD]
+
+        with transaction.atomic():
+            self._set_hnsw_scan(ef_search)
+            with connection.cursor() as cursor:
+                cursor.execute(sql, params)
+                rows = cursor.fetchall()
+
+        for position, embedding_pk, distance in rows:
+            matches[position].append((embedding_pk, distance))
+        return matches
+
+class DirectSearchPagination(PageNumberPagination):
+    page_size = getattr(settings, 'DIRECT_SEARCH_PAGE_SIZE', 15)
+    page_size_query_param = 'page_size'
+    max_page_size = getattr(settings, 'DIRECT_SEARCH_MAX_PAGE_SIZE', 100)
+
+# This view returns ranked, paginated substring and fuzzy (pg_trgm) search results
+# for the boolean query syntax of the frontend's direct search mode
+class InstrumentDirectSearch(APIView):
+    authentication_classes = [CookieTokenAuthentication]
+    permission_classes = [permissions.IsAuthenticatedOrReadOnly]
+
+    def get(self, request):
+        search_term = request.query_params.get('q', '').strip()
+
+        if not search_term:
+            return Response({'message': 'search term not provided'}, status=400)
+
+        try:
+            query, terms = direct_search.build_filter(search_term)
+        except direct_search.QuerySyntaxError as e:
+            return Response({'message': str(e)}, status=400)
+
+        filters = facets.filters_from_params(request.query_params)
+
+        instruments = (
+            Instrument.objects
+            .filter(query, **filters)
+            .annotate(rank=direct_search.rank_expression(terms))
+            .defer('enriched_description', 'search_vector')
+            .order_by('-rank', 'pk')
+        )
+
+        # SET LOCAL only lasts until the end of the transaction, so both the
+        # count and the page query have to run inside the same atomic block.
+        paginator = DirectSearchPagination()
+        with transaction.atomic():
+            with connection.cursor() as cursor:
+                cursor.execute(
+                    'SET LOCAL pg_trgm.word_similarity_threshold = %s',
+                    [getattr(settings, 'DIRECT_SEARCH_SIMILARITY_THRESHOLD', 0.5)]
+                )
+            page = paginator.paginate_queryset(instruments, request, view=self)
+
+        serializer = InstrumentSerializer(page, many=True)
+        return paginator.get_paginated_response(serializer.data)
+
+# This view returns hit/miss statistics of the query embedding cache
+class QueryCacheStats(APIView):
+    authentication_classes = [CookieTokenAuthentication]
+    permission_classes = [permissions.IsAuthenticated]
+
+    def get(self, request):
+        if not (request.user.is_staff or request.user.is_superuser):
+            return Response({'message': 'Not authorized.'}, status=403)
+        return Response(query_cache.get_cache_stats())
+
 class ServiceValueSet(APIView):
     authentication_classes = [CookieTokenAuthentication]
     permission_classes = [permissions.IsAuthenticated]
@@ -404,7 +1076,7 @@ class ServiceValueSet(APIView):
             Q(huoltosopimus_loppuu__isnull=False) |
             Q(seuraava_huolto__isnull=False) |
             Q(edellinen_huolto__isnull=False)
-        ).defer('embedding_en', 'enriched_description')
+        ).defer('enriched_description', 'search_vector')
         serializer = InstrumentSerializer(queryset, many=True)
         return Response(serializer.data)
 
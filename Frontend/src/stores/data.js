@@ -268,7 +268,7 @@ export const useDataStore = defineStore('dataStore', () => {
     if (searchTermSanitized) {
       switch(searchMode.value) {
         case 'direct':
-          results = directSearch(filtered, searchTermSanitized)
+          results = await directSearch(filtered, searchTermSanitized)
           break
         case 'smart':
           results = await smartSearch(filtered, searchTermSanitized)
@@ -281,7 +281,33 @@ export const useDataStore = defineStore('dataStore', () => {
     updateVisibleData()
   }
 
-  const directSearch = (candidates, searchTerm) => {
+  // Only the best ranked matches are loaded (the largest page the backend
+  // serves), like the semantic search returns a fixed number of results
+  const DIRECT_SEARCH_MAX_RESULTS = 100
+
+  const directSearch = async (candidates, searchTerm) => {
+    try {
+      // The backend evaluates the query syntax and the active filters and
+      // ranks the matches; one page of them is loaded so that sorting and
+      // paging of the table keep working as before
+      const params = { q: searchTerm, page_size: DIRECT_SEARCH_MAX_RESULTS }
+      Object.entries(filterValues.value).forEach(([key, value]) => {
+        if (value !== null && value !== '') {
+          params[key] = value
+        }
+      })
+      const directRes = await axios.get('/api/instruments/search/direct/', {
+        params,
+        withCredentials: true
+      })
+      return directRes.data.results
+    } catch (error) {
+      console.error("Error during direct search, searching locally:", error)
+      return localDirectSearch(candidates, searchTerm)
+    }
+  }
+
+  const localDirectSearch = (candidates, searchTerm) => {
     const hasBooleanOperator = /\b(AND|OR|NOT)\b/i.test(searchTerm) ||
       /\b[A-Za-z_][A-Za-z0-9_]*\s*:/i.test(searchTerm)
     if (hasBooleanOperator) {
@@ -344,9 +370,16 @@ export const useDataStore = defineStore('dataStore', () => {
 
   const semanticSearch = async (searchTerm) => {
     try {
-      // Semantic search with filters
+      // Active filters are applied by the backend together with the ranking,
+      // so the result list is not cut short by matches from other locations
+      const params = { q: searchTerm }
+      Object.entries(filterValues.value).forEach(([key, value]) => {
+        if (value !== null && value !== '') {
+          params[key] = value
+        }
+      })
       const semanticRes = await axios.get('/api/instruments/search/', {
-        params: { q: searchTerm },
+        params,
         withCredentials: true
       })
       const results = semanticRes.data
@@ -1,7 +1,12 @@
 import { describe, it, expect, vi, beforeEach } from 'vitest'
 import { createPinia, setActivePinia } from 'pinia'
+import axios from 'axios'
 import { useDataStore } from '@/stores/data'
 
+// These tests cover the local fallback of the direct search,
+// which is used when the backend search endpoint cannot be reached
+vi.mock('axios')
+
 // Mock i18n and router used inside the store
 vi.mock('vue-i18n', () => ({
   useI18n: () => ({ locale: { value: 'en' } })
@@ -67,6 +72,8 @@ describe('Boolean search (useDataStore)', () => {
   beforeEach(() => {
     setActivePinia(createPinia())
     vi.clearAllMocks()
+    axios.get.mockRejectedValue(new Error('Network Error'))
+    vi.spyOn(console, 'error').mockImplementation(() => { })
     store = useDataStore()
     // Initialize store state
     store.originalData = items
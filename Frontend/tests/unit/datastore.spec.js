@@ -108,6 +108,23 @@ describe('useDataStore Smart Search', () => {
         expect(store.searchedData).toHaveLength(0)
     })
 
+    it('smartSearch sends active filters to the semantic search API', async () => {
+        store.originalData = [{ id: 1, name: 'Allowed Item', yksikko: 'Unit A' }]
+        Fuse.prototype.search.mockReturnValue([])
+        axios.get.mockResolvedValueOnce({ data: [] })
+
+        store.filterValues = { yksikko: 'Unit A', huone: null, vastuuhenkilo: null, tilanne: '' }
+        store.searchMode = 'smart'
+        store.searchTerm = 'query'
+
+        await store.searchData(false)
+
+        expect(axios.get).toHaveBeenCalledWith('/api/instruments/search/', {
+            params: { q: 'query', yksikko: 'Unit A' },
+            withCredentials: true
+        })
+    })
+
     it('smartSearch handles API errors gracefully', async () => {
         Fuse.prototype.search.mockReturnValue([])
 
@@ -124,3 +141,61 @@ describe('useDataStore Smart Search', () => {
         expect(consoleSpy).toHaveBeenCalled()
     })
 })
+
+describe('useDataStore Direct Search', () => {
+    let store
+
+    beforeEach(() => {
+        setActivePinia(createPinia())
+        store = useDataStore()
+        vi.clearAllMocks()
+        store.filterValues = { yksikko: null, huone: null, vastuuhenkilo: null, tilanne: null }
+    })
+
+    it('directSearch sends the query and active filters to the direct search API', async () => {
+        store.filterValues.huone = 'B202'
+        axios.get.mockResolvedValueOnce({ data: { count: 1, next: null, results: [{ id: 2 }] } })
+
+        store.searchMode = 'direct'
+        store.searchTerm = 'tilanne: active'
+
+        await store.searchData(false)
+
+        expect(axios.get).toHaveBeenCalledWith('/api/instruments/search/direct/', {
+            params: { q: 'tilanne: active', page_size: 100, huone: 'B202' },
+            withCredentials: true
+        })
+        expect(store.searchedData).toEqual([{ id: 2 }])
+    })
+
+    it('directSearch loads only the first page of the results', async () => {
+        const results = Array.from({ length: 100 }, (_, i) => ({ id: i }))
+        axios.get.mockResolvedValueOnce({ data: { count: 250, next: 'page=2', results } })
+
+        store.searchMode = 'direct'
+        store.searchTerm = 'microscope'
+
+        await store.searchData(false)
+
+        expect(axios.get).toHaveBeenCalledTimes(1)
+        expect(store.searchedData).toHaveLength(100)
+        expect(store.numberOfPages).toBe(7)
+    })
+
+    it('directSearch searches locally when the API fails', async () => {
+        store.originalData = [
+            { id: 1, tuotenimi: 'Microscope' },
+            { id: 2, tuotenimi: 'Centrifuge' }
+        ]
+        axios.get.mockRejectedValueOnce(new Error('Network Error'))
+        const consoleSpy = vi.spyOn(console, 'error').mockImplementation(() => { })
+
+        store.searchMode = 'direct'
+        store.searchTerm = 'micro'
+
+        await store.searchData(false)
+
+        expect(store.searchedData.map(i => i.id)).toEqual([1])
+        expect(consoleSpy).toHaveBeenCalled()
+    })
+})
@@ -0,0 +1,96 @@
+"""
+Dynamic micro-batching of single-text requests.
+
+Concurrent requests to the single-text endpoints are collected for a few
+milliseconds (or until MAX_BATCH_SIZE texts are waiting) and run through the
+model as one batch, so N concurrent users cost one forward pass instead of N
+serialized ones.
+
+KEY DESIGN:
+- The first request of a batch opens a window of max_wait_ms; the batch is
+  dispatched when the window closes or as soon as it is full
+- Batches of one batcher run one at a time in the inference pool, so requests
+  arriving during a forward pass are collected into the next batch instead of
+  competing with it for the CPU threads
+- The batch function is a plain blocking function mapping a list of inputs to
+  a list of results in the same order; its exceptions are raised in every
+  waiting request
+- State is bound to the running event loop and recreated if the loop changes
+  (e.g. the per-request loops of the test client)
+"""
+
+import asyncio
+from typing import Any, Callable, List
+
+from inference import run_inference
+from metrics import BATCH_SIZE
+
+
+class _BatchState:
+    def __init__(self, loop: asyncio.AbstractEventLoop):
+        self.loop = loop
+        self.pending = []
+        self.timer = None
+        self.lock = asyncio.Lock()
+        self.tasks = set()
+
+
+class MicroBatcher:
+    def __init__(self, name: str, process_batch: Callable[[List[Any]], List[Any]], max_batch_size: int, max_wait_ms: float):
+        self.name = name
+        self.process_batch = process_batch
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000
+        self._state = None
+
+    @property
+    def pending(self) -> int:
+        """Inputs waiting for their batch to be dispatched."""
+        return len(self._state.pending) if self._state is not None else 0
+
+    def _current_state(self) -> _BatchState:
+        loop = asyncio.get_running_loop()
+        if self._state is None or self._state.loop is not loop:
+            self._state = _BatchState(loop)
+        return self._state
+
+    async def submit(self, item: Any) -> Any:
+        """Queue one input and wait for its result."""
+        state = self._current_state()
+        future = state.loop.create_future()
+        state.pending.append((item, future))
+
+        if len(state.pending) >= self.max_batch_size:
+            self._dispatch(state)
+        elif len(state.pending) == 1:
+            state.timer = state.loop.call_later(self.max_wait, self._dispatch, state)
+
+        return await future
+
+    def _dispatch(self, state: _BatchState):
+        if state.timer is not None:
+            state.timer.cancel()
+            state.timer = None
+        batch, state.pending = state.pending, []
+        if not batch:
+            return
+        BATCH_SIZE.observe(len(batch), batch=self.name)
+        task = state.loop.create_task(self._run(state, batch))
+        # Keep a reference until the task is done so it is not garbage collected
+        state.tasks.add(task)
+        task.add_done_callback(state.tasks.discard)
+
+    async def _run(self, state: _BatchState, batch):
+        async with state.lock:
+            try:
+                results = await run_inference(self.process_batch, [item for item, _ in batch])
+            except Exception as exc:
+                for _, future in batch:
+                    if not future.done():
+                        future.set_exception(exc)
+                return
+
+        for (_, future), result in zip(batch, results):
+            # A request cancelled while waiting (client went away) has no one to receive it
+            if not future.done():
+                future.set_result(result)
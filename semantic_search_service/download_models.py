@@ -1,9 +1,53 @@
 import os
+import sys
 from sentence_transformers import SentenceTransformer
 from transformers import MarianMTModel, MarianTokenizer
 
+import quantized_translation
 
-def download_models():
+# Kept in sync with models.py, which is not imported here to avoid its torch setup
+ONNX_QUANTIZATION = "avx2"
+ONNX_FILE_SUFFIX = f"qint8_{ONNX_QUANTIZATION}"
+
+
+def export_translation_onnx(model_path, onnx_path):
+    """Export the Marian model to ONNX and quantize its graphs to int8."""
+    from optimum.onnxruntime import ORTModelForSeq2SeqLM, ORTQuantizer
+    from optimum.onnxruntime.configuration import AutoQuantizationConfig
+
+    if os.path.exists(onnx_path):
+        print(f"ONNX translation model already exists at {onnx_path}")
+        return
+
+    print(f"Exporting {model_path} to ONNX...")
+    ORTModelForSeq2SeqLM.from_pretrained(model_path, export=True).save_pretrained(onnx_path)
+    MarianTokenizer.from_pretrained(model_path).save_pretrained(onnx_path)
+
+    quantization_config = getattr(AutoQuantizationConfig, ONNX_QUANTIZATION)(is_static=False, per_channel=False)
+    for file_name in sorted(os.listdir(onnx_path)):
+        if file_name.endswith("_model.onnx"):
+            quantizer = ORTQuantizer.from_pretrained(onnx_path, file_name=file_name)
+            quantizer.quantize(quantization_config, save_dir=onnx_path, file_suffix=ONNX_FILE_SUFFIX)
+    print(f"Exported quantized ONNX translation model to {onnx_path}")
+
+
+def export_embedding_onnx(model_path):
+    """Export the BGE model to ONNX next to the PyTorch weights and quantize it to int8."""
+    from sentence_transformers import export_dynamic_quantized_onnx_model
+
+    onnx_file = os.path.join(model_path, "onnx", f"model_{ONNX_FILE_SUFFIX}.onnx")
+    if os.path.exists(onnx_file):
+        print(f"ONNX embedding model already exists at {onnx_file}")
+        return
+
+    print(f"Exporting {model_path} to ONNX...")
+    model = SentenceTransformer(model_path, backend="onnx", device="cpu")
+    model.save_pretrained(model_path)
+    export_dynamic_quantized_onnx_model(model, ONNX_QUANTIZATION, model_path)
+    print(f"Exported quantized ONNX embedding model to {onnx_file}")
+
+
+def download_models(export_onnx=False, quantize_torch=True):
     models_dir = "models"
     os.makedirs(models_dir, exist_ok=True)
 
@@ -31,5 +75,25 @@ def download_models():
     else:
         print(f"Model already exists at {embedding_model_path}")
 
+    # --- Int8 Marian state_dict (INFERENCE_BACKEND=torch) ---
+    if quantize_torch:
+        quantized_path = quantized_translation.quantized_path(model_path_fi_en)
+        if not os.path.exists(quantized_path):
+            print(f"Quantizing {model_path_fi_en}...")
+            quantized_model = quantized_translation.quantize_pretrained(model_path_fi_en)
+            quantized_translation.save_quantized(quantized_model, quantized_path)
+            print(f"Saved quantized translation model to {quantized_path}")
+        else:
+            print(f"Quantized translation model already exists at {quantized_path}")
+
+    # --- ONNX Runtime artifacts (INFERENCE_BACKEND=onnx) ---
+    if export_onnx:
+        export_translation_onnx(model_path_fi_en, f"{model_path_fi_en}-onnx")
+        export_embedding_onnx(embedding_model_path)
+
 if __name__ == "__main__":
-    download_models()
\ No newline at end of file
+    inference_backend = os.getenv("INFERENCE_BACKEND", "torch").lower()
+    download_models(
+        export_onnx="--onnx" in sys.argv[1:] or inference_backend == "onnx",
+        quantize_torch=inference_backend == "torch",
+    )
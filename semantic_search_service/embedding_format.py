@@ -0,0 +1,89 @@
+"""
+Compact response formats for embeddings.
+
+A 768-dim embedding as a JSON float list is ~15 KB of text to encode here and
+to parse in the client. Clients can ask for a binary form instead with the
+Accept header:
+
+- `application/x-embeddings; dtype=float32` (or `float16`): the raw
+  little-endian, row-major array as the body, its shape in `X-Embedding-Shape`
+  (e.g. `2,768`, or `0` when there is no embedding) and dtype in
+  `X-Embedding-Dtype`
+- `application/json; encoding=base64` (optional `dtype=`): the usual JSON
+  response with each embedding value replaced by
+  `{"dtype": ..., "shape": [...], "data": "<base64 of the raw array>"}`
+
+Anything else gets the plain JSON float lists, so existing clients are unaffected.
+"""
+
+import base64
+from typing import NamedTuple, Optional
+
+import numpy as np
+from fastapi import Response
+
+EMBEDDINGS_MEDIA_TYPE = "application/x-embeddings"
+DTYPES = {"float32": "<f4", "float16": "<f2"}
+
+
+class EmbeddingFormat(NamedTuple):
+    encoding: str  # "json", "raw" or "base64"
+    dtype: str = "float32"
+
+
+PLAIN_JSON = EmbeddingFormat("json")
+
+
+def _parse_media_range(media_range: str):
+    media_type, *params = media_range.split(";")
+    parsed = {}
+    for param in params:
+        name, _, value = param.partition("=")
+        parsed[name.strip().lower()] = value.strip().strip('"').lower()
+    return media_type.strip().lower(), parsed
+
+
+def negotiate(accept: Optional[str]) -> EmbeddingFormat:
+    """The first embedding format of the Accept header this service supports."""
+    for media_range in (accept or "").split(","):
+        media_type, params = _parse_media_range(media_range)
+        dtype = params.get("dtype", "float32")
+        if dtype not in DTYPES:
+            continue
+        if media_type == EMBEDDINGS_MEDIA_TYPE:
+            return EmbeddingFormat("raw", dtype)
+        if media_type == "application/json" and params.get("encoding") == "base64":
+            return EmbeddingFormat("base64", dtype)
+    return PLAIN_JSON
+
+
+def _as_array(embeddings, dtype: str) -> np.ndarray:
+    return np.ascontiguousarray(embeddings, dtype=DTYPES[dtype])
+
+
+def encode(embeddings, fmt: EmbeddingFormat):
+    """JSON value of one embedding or a matrix of them (None stays None)."""
+    if embeddings is None:
+        return None
+    if fmt.encoding == "base64":
+        array = _as_array(embeddings, fmt.dtype)
+        return {
+            "dtype": fmt.dtype,
+            "shape": list(array.shape),
+            "data": base64.b64encode(array.tobytes()).decode("ascii"),
+        }
+    return embeddings.tolist() if isinstance(embeddings, np.ndarray) else embeddings
+
+
+def raw_response(embeddings, fmt: EmbeddingFormat, headers: Optional[dict] = None) -> Response:
+    """Binary response of one embedding or a matrix of them; None is shape 0."""
+    array = _as_array([] if embeddings is None else embeddings, fmt.dtype)
+    return Response(
+        content=array.tobytes(),
+        media_type=f"{EMBEDDINGS_MEDIA_TYPE}; dtype={fmt.dtype}",
+        headers={
+            "X-Embedding-Shape": ",".join(str(size) for size in array.shape),
+            "X-Embedding-Dtype": fmt.dtype,
+            **(headers or {}),
+        },
+    )
@@ -0,0 +1,108 @@
+"""
+Inference dispatch off the event loop.
+
+Blocking PyTorch calls run in a dedicated, bounded thread pool instead of on the
+event loop (or Starlette's shared 40-thread pool), so the loop keeps serving
+/healthz and queueing requests while the models are busy.
+
+KEY DESIGN:
+- The pool has INFERENCE_WORKERS threads, by default as many as fit on the CPU
+  cores with TORCH_NUM_THREADS intra-op threads each, so concurrent forward
+  passes do not oversubscribe the cores
+- ConcurrencyLimit (applied with @limit_concurrency) caps how many requests an
+  endpoint works on at once; the others wait on the event loop without holding
+  a worker thread. Past max_waiting waiting requests the endpoint is saturated
+  and answers 429 with Retry-After, so clients back off instead of piling up.
+- Semaphores are bound to the running event loop and recreated if the loop
+  changes, like the micro-batcher state
+"""
+
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial, wraps
+from typing import Any, Callable, Optional
+
+from fastapi.responses import JSONResponse
+
+from models import INFERENCE_WORKERS, RETRY_AFTER_SECONDS
+
+inference_executor = ThreadPoolExecutor(max_workers=INFERENCE_WORKERS, thread_name_prefix="inference")
+
+
+# Jobs submitted to the pool and not finished yet (queued or running)
+inference_jobs = 0
+
+
+async def run_inference(func: Callable[..., Any], *args, **kwargs) -> Any:
+    """Run a blocking inference function in the inference pool."""
+    global inference_jobs
+    loop = asyncio.get_running_loop()
+    inference_jobs += 1
+    try:
+        return await loop.run_in_executor(inference_executor, partial(func, *args, **kwargs))
+    finally:
+        inference_jobs -= 1
+
+
+class Saturated(Exception):
+    """Raised instead of queueing when max_waiting requests are already waiting."""
+
+
+class ConcurrencyLimit:
+    """
+    Async context manager letting at most `limit` requests in at once. With
+    max_waiting, at most that many more wait for a slot; further ones raise
+    Saturated.
+    """
+
+    def __init__(self, limit: int, max_waiting: Optional[int] = None):
+        self.limit = limit
+        self.max_waiting = max_waiting
+        self.waiting = 0
+        self._loop = None
+        self._semaphore = None
+
+    def _current_semaphore(self) -> asyncio.Semaphore:
+        loop = asyncio.get_running_loop()
+        if self._loop is not loop:
+            self._loop, self._semaphore = loop, asyncio.Semaphore(self.limit)
+        return self._semaphore
+
+    async def __aenter__(self):
+        semaphore = self._current_semaphore()
+        if semaphore.locked() and self.max_waiting is not None and self.waiting >= self.max_waiting:
+            raise Saturated()
+        self.waiting += 1
+        try:
+            await semaphore.acquire()
+        finally:
+            self.waiting -= 1
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        self._semaphore.release()
+
+
+def limit_concurrency(limit: int, max_waiting: Optional[int] = None):
+    """
+    Endpoint decorator applying its own ConcurrencyLimit. When it is saturated
+    the endpoint answers 429 with Retry-After instead of queueing the request.
+    """
+    def decorator(endpoint):
+        concurrency = ConcurrencyLimit(limit, max_waiting)
+
+        @wraps(endpoint)
+        async def limited_endpoint(*args, **kwargs):
+            try:
+                async with concurrency:
+                    return await endpoint(*args, **kwargs)
+            except Saturated:
+                return JSONResponse(
+                    {"detail": "Too many requests in progress, retry later"},
+                    status_code=429,
+                    headers={"Retry-After": str(RETRY_AFTER_SECONDS)},
+                )
+
+        limited_endpoint.concurrency = concurrency
+        return limited_endpoint
+    return decorator
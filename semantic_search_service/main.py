@@ -1,15 +1,28 @@
-from fastapi import FastAPI, HTTPException
-from fastapi.concurrency import run_in_threadpool
+from fastapi import FastAPI, Header, HTTPException, Request, Response
+from fastapi.responses import PlainTextResponse
 from pydantic import BaseModel
-from typing import List
+import numpy as np
+from typing import Dict, List, Optional, Tuple
+from urllib.parse import quote
 from models import (
     MAX_BATCH_SIZE,
     CONTEXT_PREFIX,
     CONTEXT_PREFIX_EN,
     EMBEDDING_BATCH_SIZE,
     BGE_INSTRUCTION,
+    BATCH_MAX_WAIT_MS,
+    SINGLE_REQUEST_CONCURRENCY,
+    BATCH_REQUEST_CONCURRENCY,
+    SINGLE_REQUEST_MAX_WAITING,
+    BATCH_REQUEST_MAX_WAITING,
+    TRANSLATION_MODEL_ID,
+    TRANSLATION_CACHE_PATH,
+    TRANSLATION_CACHE_SIZE,
+    RETRY_AFTER_SECONDS,
     warm_up_models,
-    ensure_models_loaded,
+    models_ready,
+    model_status,
+    logger,
 )
 from services import (
     translate_fi_to_en,
@@ -18,20 +31,69 @@ from services import (
     embed_en_batch,
     cleanup_memory
 )
+from batching import MicroBatcher
+import inference
+from inference import run_inference, limit_concurrency
+from translation_cache import TranslationCache
+import embedding_format
+import metrics
+import asyncio
+import threading
+from concurrent.futures import ThreadPoolExecutor
+import time
 
 app = FastAPI()
 
+def _load_models():
+    try:
+        warm_up_models()
+    except Exception:
+        logger.exception("Model loading failed")
+
+
 @app.on_event("startup")
 async def load_models_on_startup():
-    """Preload and warm models before accepting requests."""
-    await run_in_threadpool(warm_up_models)
+    """
+    Load and warm the models in the background. The service accepts requests
+    at once: /healthz reports progress, and a request needing a model that is
+    still loading gets 503 (see _require_model), so the embedding endpoints
+    serve before Marian is loaded.
+    """
+    threading.Thread(target=_load_models, name="model-loader", daemon=True).start()
 
 
 @app.get("/healthz", tags=["health"])
-async def health_check():
-    """Report readiness once models are available."""
-    ensure_models_loaded()
-    return {"status": "ok"}
+async def health_check(response: Response):
+    """
+    Report readiness once models are available. Never waits on model loading or
+    inference, so the probe answers at once even under full load.
+    """
+    if not models_ready():
+        response.status_code = 503
+        return {"status": "loading", "models": model_status()}
+    return {"status": "ok", "models": model_status()}
+
+@app.middleware("http")
+async def record_request_metrics(request: Request, call_next):
+    started_at = time.perf_counter()
+    response = await call_next(request)
+    # Unknown paths share one label so the number of series stays bounded
+    endpoint = request.url.path if request.url.path in _ENDPOINT_PATHS else "other"
+    metrics.REQUEST_SECONDS.observe(time.perf_counter() - started_at, endpoint=endpoint)
+    metrics.REQUESTS.inc(endpoint=endpoint, status=str(response.status_code))
+    return response
+
+
+@app.get("/metrics", tags=["health"])
+async def metrics_endpoint():
+    """Service metrics in the Prometheus text format (see metrics.py)."""
+    return PlainTextResponse(metrics.render(), media_type="text/plain; version=0.0.4")
+
+
+@app.get("/cache/stats", tags=["health"])
+async def translation_cache_stats():
+    """Hit rate and size of the translation cache."""
+    return await _in_cache_thread(translation_cache.stats)
 
 # ==========================================================
 # Pydantic Schemas
@@ -42,17 +104,92 @@ class InputText(BaseModel):
 class InputTexts(BaseModel):
     texts: List[str]
 
+class InputQuery(BaseModel):
+    text: str
+    # Finnish queries are translated first, like /process_query
+    translate: bool = False
+
+class InputQueries(BaseModel):
+    queries: List[InputQuery]
+
+# ==========================================================
+# Micro-batching of single-text requests
+# ==========================================================
+def _translate_batch(texts: List[str]) -> List[str]:
+    # Concurrent requests for the same text are translated once
+    unique = list(dict.fromkeys(texts))
+    # A lone request keeps the plain single-text path (no padding)
+    if len(unique) == 1:
+        translations = [translate_fi_to_en(unique[0])]
+    else:
+        # Same failure rules as translate_fi_to_en: no absolute length limit
+        translations = translate_fi_to_en_batch(unique, max_result_length=None)
+    translated = dict(zip(unique, translations))
+    return [translated[text] for text in texts]
+
+def _embed_batch(texts: List[str]) -> List[list]:
+    if len(texts) == 1:
+        return [embed_en(texts[0])]
+    return embed_en_batch(texts, EMBEDDING_BATCH_SIZE).tolist()
+
+translation_batcher = MicroBatcher("translation", _translate_batch, MAX_BATCH_SIZE, BATCH_MAX_WAIT_MS)
+embedding_batcher = MicroBatcher("embedding", _embed_batch, MAX_BATCH_SIZE, BATCH_MAX_WAIT_MS)
+
+translation_cache = TranslationCache(TRANSLATION_CACHE_PATH, TRANSLATION_MODEL_ID, TRANSLATION_CACHE_SIZE)
+# The translation cache does SQLite I/O under a lock, so it is only used from
+# this thread, never from the event loop or the inference pool. One thread keeps
+# the writes queued behind responses in order with later lookups.
+translation_cache_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="translation-cache")
+
+async def _in_cache_thread(func, *args):
+    return await asyncio.get_running_loop().run_in_executor(translation_cache_executor, func, *args)
+
+def _store_translations(translations: Dict[str, str]):
+    """Write-behind: the response does not wait for the SQLite write."""
+    translation_cache_executor.submit(translation_cache.put_many, translations)
+
+def _require_model(name: str):
+    """
+    Answers 503 with Retry-After while the model is loading, instead of sending
+    work to the inference pool, where it would hold a thread until the model is
+    loaded and make jobs for the other model wait behind it.
+    """
+    if not model_status()[name]:
+        raise HTTPException(
+            status_code=503,
+            detail=f"The {name} model is still loading, retry later",
+            headers={"Retry-After": str(RETRY_AFTER_SECONDS)},
+        )
+
+async def _translate(text: str) -> str:
+    """Cached translation, falling back to the translation batcher."""
+    translated = await _in_cache_thread(translation_cache.get, text)
+    if translated is None:
+        _require_model("translation")
+        translated = await translation_batcher.submit(text)
+        _store_translations({text: translated})
+    return translated
+
+def _check_batch_size(items: list):
+    if len(items) > MAX_BATCH_SIZE:
+        raise HTTPException(
+            status_code=413,
+            detail=f"At most {MAX_BATCH_SIZE} texts per request, got {len(items)}; split the batch",
+        )
+
 # ==========================================================
 # Endpoints
 # ==========================================================
 @app.post("/process")
+@limit_concurrency(SINGLE_REQUEST_CONCURRENCY, SINGLE_REQUEST_MAX_WAITING)
 async def process_text(input_text: InputText):
+    _require_model("embedding")
     fi_text = input_text.text.strip().lower()
 
-    translated_text = translate_fi_to_en(CONTEXT_PREFIX + fi_text)
+    translated_text = await _translate(CONTEXT_PREFIX + fi_text)
 
     embedding_en_result = (
-        embed_en(CONTEXT_PREFIX_EN + translated_text)
+        await embedding_batcher.submit(CONTEXT_PREFIX_EN + translated_text)
         if translated_text != "Translation Failed"
         else None
     )
@@ -63,46 +200,192 @@ async def process_text(input_text: InputText):
     }
 
 @app.post("/process_query")
-async def process_query_endpoint(input_text: InputText):
-    """Process queries that need to be translated to English and then embedded"""
+@limit_concurrency(SINGLE_REQUEST_CONCURRENCY, SINGLE_REQUEST_MAX_WAITING)
+async def process_query_endpoint(input_text: InputText, accept: Optional[str] = Header(None)):
+    """
+    Process queries that need to be translated to English and then embedded.
+    In the binary format (see embedding_format.py) the translated text is in the
+    percent-encoded X-Translated-Text header.
+    """
+    fmt = embedding_format.negotiate(accept)
+    _require_model("embedding")
     fi_text = input_text.text.strip().lower()
 
-    translated_text = translate_fi_to_en(CONTEXT_PREFIX + fi_text)
+    translated_text = await _translate(CONTEXT_PREFIX + fi_text)
 
     if translated_text == "Translation Failed":
-        return {
-            "translated_text": None, 
-            "embedding_en": None
-        }
-
-    query_text = translated_text
-    if not query_text.startswith("Represent this sentence"):
-        query_text = BGE_INSTRUCTION + query_text
+        translated_text, embedding_en_result = None, None
+    else:
+        query_text = translated_text
+        if not query_text.startswith("Represent this sentence"):
+            query_text = BGE_INSTRUCTION + query_text
 
-    embedding_en_result = embed_en(query_text)
+        translated_text = translated_text.lower()
+        embedding_en_result = await embedding_batcher.submit(query_text)
 
+    if fmt.encoding == "raw":
+        headers = {"X-Translated-Text": quote(translated_text)} if translated_text is not None else {}
+        return embedding_format.raw_response(embedding_en_result, fmt, headers)
     return {
-        "translated_text": translated_text.lower(),
-        "embedding_en": embedding_en_result,
+        "translated_text": translated_text,
+        "embedding_en": embedding_format.encode(embedding_en_result, fmt),
     }
 
 @app.post("/embed_en")
-async def embed_en_endpoint(input_text: InputText):
-    embedding = embed_en(input_text.text.strip())
-    return {"embedding": embedding}
+@limit_concurrency(SINGLE_REQUEST_CONCURRENCY, SINGLE_REQUEST_MAX_WAITING)
+async def embed_en_endpoint(input_text: InputText, accept: Optional[str] = Header(None)):
+    fmt = embedding_format.negotiate(accept)
+    _require_model("embedding")
+    embedding = await embedding_batcher.submit(input_text.text.strip())
+    if fmt.encoding == "raw":
+        return embedding_format.raw_response(embedding, fmt)
+    return {"embedding": embedding_format.encode(embedding, fmt)}
 
 @app.post("/embed_query")
-async def embed_query_endpoint(input_text: InputText):    
+@limit_concurrency(SINGLE_REQUEST_CONCURRENCY, SINGLE_REQUEST_MAX_WAITING)
+async def embed_query_endpoint(input_text: InputText, accept: Optional[str] = Header(None)):
+    fmt = embedding_format.negotiate(accept)
+    _require_model("embedding")
     query = input_text.text.strip()
     if not query.startswith("Represent this sentence"):
         query = BGE_INSTRUCTION + query
         
-    embedding = embed_en(query)
-    return {"embedding": embedding}
+    embedding = await embedding_batcher.submit(query)
+    if fmt.encoding == "raw":
+        return embedding_format.raw_response(embedding, fmt)
+    return {"embedding": embedding_format.encode(embedding, fmt)}
 
 @app.post("/embed_en_batch")
-async def embed_en_batch_endpoint(input_texts: InputTexts):
+@limit_concurrency(BATCH_REQUEST_CONCURRENCY, BATCH_REQUEST_MAX_WAITING)
+async def embed_en_batch_endpoint(input_texts: InputTexts, accept: Optional[str] = Header(None)):
+    """
+    Embeds up to MAX_BATCH_SIZE texts. They are encoded in EMBEDDING_BATCH_SIZE
+    chunks, each its own inference job, into one preallocated array, so peak
+    memory is one chunk's activations plus the result.
+    """
+    _check_batch_size(input_texts.texts)
+    fmt = embedding_format.negotiate(accept)
+    _require_model("embedding")
     clean_texts = [text.strip() for text in input_texts.texts]
-    
-    embeddings = embed_en_batch(clean_texts, EMBEDDING_BATCH_SIZE)
-    return {"embeddings": embeddings.tolist()}
+
+    metrics.BATCH_SIZE.observe(len(clean_texts), batch="embed_en_batch")
+    embeddings = None
+    for start in range(0, len(clean_texts), EMBEDDING_BATCH_SIZE):
+        chunk = await run_inference(embed_en_batch, clean_texts[start:start + EMBEDDING_BATCH_SIZE], EMBEDDING_BATCH_SIZE)
+        if embeddings is None:
+            embeddings = np.empty((len(clean_texts), chunk.shape[1]), dtype=embedding_format.DTYPES[fmt.dtype])
+        embeddings[start:start + len(chunk)] = chunk
+    if embeddings is None:
+        embeddings = np.empty((0,), dtype=np.float32)
+
+    if fmt.encoding == "raw":
+        return embedding_format.raw_response(embeddings, fmt)
+    return {"embeddings": embedding_format.encode(embeddings, fmt)}
+
+def _query_sources(input_queries: List[InputQuery]) -> Dict[int, str]:
+    """{query index: translation input} of the queries to translate."""
+    return {
+        i: CONTEXT_PREFIX + query.text.strip().lower()
+        for i, query in enumerate(input_queries)
+        if query.translate
+    }
+
+def _embed_queries(input_queries: List[InputQuery], cached: Dict[str, str]) -> Tuple[List[dict], Dict[str, str]]:
+    """
+    Blocking part of /embed_query_batch, run in the inference pool. cached holds
+    the translations found in the translation cache. Returns the results and the
+    new translations.
+    """
+    queries = [
+        query.text.strip().lower() if query.translate else query.text.strip()
+        for query in input_queries
+    ]
+    translated = [None] * len(queries)
+    new_translations = {}
+
+    sources = _query_sources(input_queries)
+    if sources:
+        missing = list(dict.fromkeys(text for text in sources.values() if text not in cached))
+        if missing:
+            # Same failure rules as /process_query: no absolute length limit
+            new_translations = dict(zip(missing, translate_fi_to_en_batch(missing, max_result_length=None)))
+            cached = {**cached, **new_translations}
+        for i in sources:
+            translated[i] = cached[sources[i]]
+            queries[i] = None if translated[i] == "Translation Failed" else translated[i]
+
+    to_embed = [i for i, query in enumerate(queries) if query is not None]
+    embeddings = [None] * len(queries)
+    if to_embed:
+        texts = [
+            queries[i] if queries[i].startswith("Represent this sentence") else BGE_INSTRUCTION + queries[i]
+            for i in to_embed
+        ]
+        for i, embedding in zip(to_embed, embed_en_batch(texts, EMBEDDING_BATCH_SIZE).tolist()):
+            embeddings[i] = embedding
+
+    results = [
+        {
+            "translated_text": None if text is None or text == "Translation Failed" else text.lower(),
+            "embedding": embedding,
+        }
+        for text, embedding in zip(translated, embeddings)
+    ]
+    return results, new_translations
+
+@app.post("/embed_query_batch")
+@limit_concurrency(BATCH_REQUEST_CONCURRENCY, BATCH_REQUEST_MAX_WAITING)
+async def embed_query_batch_endpoint(input_queries: InputQueries):
+    """
+    Embeds several search queries with one batched translation and one batched
+    embedding pass. Each result matches /process_query (translate=true) or
+    /embed_query (translate=false); the embedding is None if translation failed.
+    """
+    _check_batch_size(input_queries.queries)
+    metrics.BATCH_SIZE.observe(len(input_queries.queries), batch="embed_query_batch")
+    sources = _query_sources(input_queries.queries)
+    _require_model("embedding")
+    cached = await _in_cache_thread(translation_cache.get_many, sources.values()) if sources else {}
+    if not set(sources.values()) <= cached.keys():
+        _require_model("translation")
+    results, new_translations = await run_inference(_embed_queries, input_queries.queries, cached)
+    if new_translations:
+        _store_translations(new_translations)
+    return {"results": results}
+
+# ==========================================================
+# Metrics read at scrape time
+# ==========================================================
+_ENDPOINT_PATHS = {route.path for route in app.routes}
+
+metrics.Callback(
+    "semantic_inference_jobs", "Inference jobs queued or running in the inference pool",
+    lambda: inference.inference_jobs,
+)
+metrics.Callback(
+    "semantic_batcher_pending", "Texts waiting for their micro-batch to be dispatched",
+    lambda: {(batcher.name,): batcher.pending for batcher in (translation_batcher, embedding_batcher)},
+    ["batcher"],
+)
+metrics.Callback(
+    "semantic_requests_waiting", "Requests waiting for a concurrency slot of their endpoint",
+    lambda: {
+        (route.path,): route.endpoint.concurrency.waiting
+        for route in app.routes
+        if hasattr(getattr(route, "endpoint", None), "concurrency")
+    },
+    ["endpoint"],
+)
+metrics.Callback(
+    "semantic_translation_cache_hits_total", "Translation cache hits per level",
+    lambda: {("memory",): translation_cache.memory_hits, ("disk",): translation_cache.disk_hits},
+    ["level"], type="counter",
+)
+metrics.Callback(
+    "semantic_translation_cache_misses_total", "Translation cache misses",
+    lambda: translation_cache.misses, type="counter",
+)
+metrics.Callback(
+    "semantic_translation_cache_hit_ratio", "Share of translation cache lookups that hit",
+    lambda: translation_cache.hit_rate(),
+)
@@ -0,0 +1,189 @@
+"""
+In-process metrics in the Prometheus text format, served at /metrics.
+
+Shows where the time of a request goes (translation or embedding, and which
+stage of it), how well requests are batched, how deep the queues are and how
+the translation cache performs, without an external service or dependency.
+
+KEY DESIGN:
+- Counters and histograms are plain in-process numbers behind a lock; an
+  observation is a few additions
+- Values that already exist elsewhere (cache statistics, queue lengths, RSS)
+  are read by callbacks when /metrics is scraped instead of being mirrored
+- Label values are fixed sets (endpoint paths, model, stage) so the number of
+  series stays bounded
+- Numbers are per process: with several workers (serve.py) each scrape sees
+  the worker that answered it
+"""
+
+import os
+import threading
+import time
+from contextlib import contextmanager
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+# Seconds: from cached lookups (~1 ms) to long batch translations
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+BATCH_SIZE_BUCKETS = (1, 2, 4, 8, 16, 32, 64, 128, 256)
+
+_registry: List["_Metric"] = []
+
+
+def _format_labels(labelnames: Tuple[str, ...], values: Tuple[str, ...], extra: Optional[Tuple[str, str]] = None) -> str:
+    pairs = list(zip(labelnames, values))
+    if extra:
+        pairs.append(extra)
+    if not pairs:
+        return ""
+    escaped = (str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n") for _, value in pairs)
+    return "{" + ",".join(f'{name}="{value}"' for (name, _), value in zip(pairs, escaped)) + "}"
+
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class _Metric:
+    type = ""
+
+    def __init__(self, name: str, help: str, labelnames: Iterable[str] = ()):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+        _registry.append(self)
+
+    def _key(self, labels: Dict[str, str]) -> Tuple[str, ...]:
+        return tuple(str(labels[name]) for name in self.labelnames)
+
+    def samples(self) -> List[str]:
+        raise NotImplementedError
+
+    def render(self) -> str:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.type}"]
+        lines.extend(self.samples())
+        return "\n".join(lines)
+
+
+class Counter(_Metric):
+    type = "counter"
+
+    def __init__(self, name, help, labelnames=()):
+        super().__init__(name, help, labelnames)
+        self._values = {}
+
+    def inc(self, amount: float = 1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def samples(self):
+        with self._lock:
+            values = sorted(self._values.items())
+        return [f"{self.name}{_format_labels(self.labelnames, key)} {_format_value(value)}" for key, value in values]
+
+
+class Histogram(_Metric):
+    type = "histogram"
+
+    def __init__(self, name, help, labelnames=(), buckets=LATENCY_BUCKETS):
+        super().__init__(name, help, labelnames)
+        self.buckets = tuple(buckets) + (float("inf"),)
+        self._values = {}
+
+    def observe(self, value: float, **labels):
+        key = self._key(labels)
+        with self._lock:
+            entry = self._values.get(key)
+            if entry is None:
+                entry = self._values[key] = [[0] * len(self.buckets), 0.0, 0]
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    entry[0][i] += 1
+                    break
+            entry[1] += value
+            entry[2] += 1
+
+    @contextmanager
+    def time(self, **labels):
+        """Observes the duration of the with block in seconds."""
+        started_at = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - started_at, **labels)
+
+    def samples(self):
+        with self._lock:
+            values = sorted((key, ([*counts], total, count)) for key, (counts, total, count) in self._values.items())
+        lines = []
+        for key, (counts, total, count) in values:
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets, counts):
+                cumulative += bucket_count
+                labels = _format_labels(self.labelnames, key, ("le", _format_value(float(bound))))
+                lines.append(f"{self.name}_bucket{labels} {cumulative}")
+            labels = _format_labels(self.labelnames, key)
+            lines.append(f"{self.name}_sum{labels} {_format_value(total)}")
+            lines.append(f"{self.name}_count{labels} {count}")
+        return lines
+
+
+class Callback(_Metric):
+    """
+    A gauge or counter read from a function at scrape time. The function returns
+    a number, or {label values tuple: number} for a labelled metric.
+    """
+
+    def __init__(self, name, help, function: Callable, labelnames=(), type="gauge"):
+        super().__init__(name, help, labelnames)
+        self.type = type
+        self.function = function
+
+    def samples(self):
+        value = self.function()
+        if value is None:
+            return []
+        if not isinstance(value, dict):
+            value = {(): value}
+        return [
+            f"{self.name}{_format_labels(self.labelnames, key)} {_format_value(number)}"
+            for key, number in sorted(value.items())
+            if number is not None
+        ]
+
+
+def render() -> str:
+    """All registered metrics in the Prometheus text exposition format."""
+    return "\n".join(metric.render() for metric in _registry) + "\n"
+
+
+def resident_memory_bytes() -> Optional[int]:
+    """Current RSS of this process (Linux), or None where /proc is not available."""
+    try:
+        with open("/proc/self/statm") as statm:
+            return int(statm.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, IndexError):
+        return None
+
+
+# ==========================================================
+# Service metrics
+# ==========================================================
+REQUEST_SECONDS = Histogram(
+    "semantic_request_duration_seconds", "Request latency per endpoint", ["endpoint"]
+)
+REQUESTS = Counter(
+    "semantic_requests_total", "Requests per endpoint and status code", ["endpoint", "status"]
+)
+STAGE_SECONDS = Histogram(
+    "semantic_stage_duration_seconds", "Time spent per model and inference stage", ["model", "stage"]
+)
+BATCH_SIZE = Histogram(
+    "semantic_batch_size", "Texts per model call (micro-batches and batch requests)", ["batch"],
+    buckets=BATCH_SIZE_BUCKETS,
+)
+
+Callback("process_resident_memory_bytes", "Resident memory size in bytes", resident_memory_bytes)
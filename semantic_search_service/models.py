@@ -2,20 +2,28 @@ import logging
 import os
 import sys
 import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
 
 import torch
 from sentence_transformers import SentenceTransformer
-from transformers import MarianMTModel, MarianTokenizer
+from transformers import MarianTokenizer
+
+import quantized_translation
 
 # ==========================================================
 # Configuration
 # ==========================================================
 
+# Most texts per batch request (and per micro-batch); larger requests get 413
 MAX_BATCH_SIZE = 256
 CONTEXT_PREFIX = "tieteellinen instrumentti: "
 CONTEXT_PREFIX_EN = "a scientific instrument: "
 BGE_INSTRUCTION = "Represent this sentence for searching relevant passages: "
+# Texts encoded at once; batch requests are processed in chunks of this size
 EMBEDDING_BATCH_SIZE = 100
+# How long single-text requests wait for concurrent ones to be batched with
+BATCH_MAX_WAIT_MS = float(os.getenv("BATCH_MAX_WAIT_MS", "5"))
 
 # --- Opus MT Model for translation (Fine-tuned or original) ---
 fine_tuned_opus_mt_id = os.getenv("FINE_TUNED_OPUS_MT_ID")
@@ -23,8 +31,32 @@ opus_mt_model_name = fine_tuned_opus_mt_id if fine_tuned_opus_mt_id else "Helsin
 sanitized_model_name = opus_mt_model_name.replace("/", "_")
 
 # Model paths
-TRANSLATION_MODEL_PATH = f"/app/models/{sanitized_model_name}"
-EMBEDDING_MODEL_EN_PATH = "/app/models/bge-base-en-v1.5"
+MODELS_DIR = "/app/models"
+TRANSLATION_MODEL_PATH = f"{MODELS_DIR}/{sanitized_model_name}"
+EMBEDDING_MODEL_EN_PATH = f"{MODELS_DIR}/bge-base-en-v1.5"
+
+# --- Translation cache (translation_cache.py) ---
+# SQLite file on the models volume so cached translations survive restarts; empty disables persistence
+TRANSLATION_CACHE_PATH = os.getenv("TRANSLATION_CACHE_PATH", f"{MODELS_DIR}/translation_cache.sqlite3")
+TRANSLATION_CACHE_SIZE = int(os.getenv("TRANSLATION_CACHE_SIZE", "20000"))
+
+# --- Inference backend ---
+# "torch": PyTorch, Marian quantized with quantize_dynamic (see quantized_translation.py)
+# "onnx": int8 ONNX exports run with ONNX Runtime (needs requirements-onnx.txt
+#         and the artifacts written by `download_models.py --onnx`)
+INFERENCE_BACKEND = os.getenv("INFERENCE_BACKEND", "torch").lower()
+if INFERENCE_BACKEND not in ("torch", "onnx"):
+    raise ValueError(f"INFERENCE_BACKEND must be 'torch' or 'onnx', not {INFERENCE_BACKEND!r}")
+
+# Dynamic int8 quantization config of the ONNX exports (AVX2 runs on all x86-64 hosts we use)
+ONNX_QUANTIZATION = "avx2"
+ONNX_FILE_SUFFIX = f"qint8_{ONNX_QUANTIZATION}"
+TRANSLATION_ONNX_PATH = f"{TRANSLATION_MODEL_PATH}-onnx"
+# Relative to EMBEDDING_MODEL_EN_PATH, named like sentence-transformers' own exports
+EMBEDDING_ONNX_FILE = f"onnx/model_{ONNX_FILE_SUFFIX}.onnx"
+
+# Identifies the translations of the loaded model in the translation cache
+TRANSLATION_MODEL_ID = f"{opus_mt_model_name}:{INFERENCE_BACKEND}"
 
 # ==========================================================
 # Logging setup
@@ -45,50 +77,125 @@ if not logger.handlers:
 
 torch.set_grad_enabled(False)
 
-torch.set_num_threads(3)  # Adjust based on available cores
+TORCH_NUM_THREADS = int(os.getenv("TORCH_NUM_THREADS", "3"))
+torch.set_num_threads(TORCH_NUM_THREADS)  # Adjust based on available cores
 # Limit thread usage to prevent memory bloat
-os.environ["OMP_NUM_THREADS"] = "3"
-os.environ["MKL_NUM_THREADS"] = "3"
+os.environ["OMP_NUM_THREADS"] = str(TORCH_NUM_THREADS)
+os.environ["MKL_NUM_THREADS"] = str(TORCH_NUM_THREADS)
+
+# Threads running inference at once (see inference.py); each uses TORCH_NUM_THREADS cores
+INFERENCE_WORKERS = int(os.getenv("INFERENCE_WORKERS", max(1, (os.cpu_count() or 1) // TORCH_NUM_THREADS)))
+
+# Requests each endpoint works on at once; the others wait for a free slot.
+# Single-text requests are cheap to queue (they are micro-batched), batch requests are not.
+SINGLE_REQUEST_CONCURRENCY = int(os.getenv("SINGLE_REQUEST_CONCURRENCY", "512"))
+BATCH_REQUEST_CONCURRENCY = int(os.getenv("BATCH_REQUEST_CONCURRENCY", "2"))
+# Requests allowed to wait for a slot; beyond that the endpoint answers 429 + Retry-After
+SINGLE_REQUEST_MAX_WAITING = int(os.getenv("SINGLE_REQUEST_MAX_WAITING", "1024"))
+BATCH_REQUEST_MAX_WAITING = int(os.getenv("BATCH_REQUEST_MAX_WAITING", "4"))
+RETRY_AFTER_SECONDS = int(os.getenv("RETRY_AFTER_SECONDS", "1"))
 
 # ==========================================================
 # Lazy model registry
 # ==========================================================
 
+# Each model loads on its own (see ensure_models_loaded), so the embedding
+# endpoints can serve as soon as BGE is ready, before Marian is.
 _translation_tokenizer = None
 _translation_model = None
 _embedding_model_en = None
-_models_loaded = False
-_models_lock = threading.Lock()
+_translation_ready = threading.Event()
+_embedding_ready = threading.Event()
+_translation_lock = threading.Lock()
+_embedding_lock = threading.Lock()
 
-def _load_translation_components():
+def _onnx_session_options():
+    import onnxruntime
+
+    options = onnxruntime.SessionOptions()
+    options.intra_op_num_threads = TORCH_NUM_THREADS
+    options.inter_op_num_threads = 1
+    return options
+
+
+def _load_onnx_translation_components():
     global _translation_tokenizer, _translation_model
+    from optimum.onnxruntime import ORTModelForSeq2SeqLM
 
-    logger.info("Loading translation tokenizer from %s", TRANSLATION_MODEL_PATH)
+    logger.info("Loading ONNX translation model from %s", TRANSLATION_ONNX_PATH)
     _translation_tokenizer = MarianTokenizer.from_pretrained(
-        TRANSLATION_MODEL_PATH,
+        TRANSLATION_ONNX_PATH,
         local_files_only=True
     )
+    # Only the quantized graphs that were exported (the decoder-with-past one is optional)
+    file_names = {
+        f"{part}_file_name": f"{part}_model_{ONNX_FILE_SUFFIX}.onnx"
+        for part in ("encoder", "decoder", "decoder_with_past")
+        if os.path.exists(os.path.join(TRANSLATION_ONNX_PATH, f"{part}_model_{ONNX_FILE_SUFFIX}.onnx"))
+    }
+    _translation_model = ORTModelForSeq2SeqLM.from_pretrained(
+        TRANSLATION_ONNX_PATH,
+        local_files_only=True,
+        provider="CPUExecutionProvider",
+        session_options=_onnx_session_options(),
+        **file_names,
+    )
+
 
-    logger.info("Loading translation model from %s", TRANSLATION_MODEL_PATH)
-    translation_model = MarianMTModel.from_pretrained(
+def _load_translation_components():
+    global _translation_tokenizer, _translation_model
+
+    if INFERENCE_BACKEND == "onnx":
+        _load_onnx_translation_components()
+        return
+
+    logger.info("Loading translation tokenizer from %s", TRANSLATION_MODEL_PATH)
+    _translation_tokenizer = MarianTokenizer.from_pretrained(
         TRANSLATION_MODEL_PATH,
         local_files_only=True
     )
 
-    logger.info("Quantizing translation model for CPU inference")
-    translation_model = torch.quantization.quantize_dynamic(
-        translation_model,
-        {torch.nn.Linear, torch.nn.LSTM, torch.nn.GRU},
-        dtype=torch.qint8
-    )
-    translation_model.eval()
+    _translation_model = _load_quantized_translation_model()
+
+
+def _load_quantized_translation_model():
+    path = quantized_translation.quantized_path(TRANSLATION_MODEL_PATH)
+    if os.path.exists(path):
+        logger.info("Loading quantized translation model from %s", path)
+        try:
+            return quantized_translation.load_quantized(TRANSLATION_MODEL_PATH, path)
+        except Exception as exc:
+            logger.warning("Quantized translation model at %s unusable, quantizing again: %s", path, exc)
 
-    _translation_model = translation_model
+    # Normally written by download_models.py; missing after a torch upgrade or a new model
+    logger.info("Loading and quantizing translation model from %s", TRANSLATION_MODEL_PATH)
+    translation_model = quantized_translation.quantize_pretrained(TRANSLATION_MODEL_PATH)
+    try:
+        quantized_translation.save_quantized(translation_model, path)
+        logger.info("Saved quantized translation model to %s", path)
+    except Exception as exc:
+        logger.warning("Could not save quantized translation model: %s", exc)
+    return translation_model
 
 
 def _load_embedding_models():
     global  _embedding_model_en
 
+    if INFERENCE_BACKEND == "onnx":
+        logger.info("Loading ONNX English embedding model from %s", EMBEDDING_MODEL_EN_PATH)
+        _embedding_model_en = SentenceTransformer(
+            EMBEDDING_MODEL_EN_PATH,
+            local_files_only=True,
+            device='cpu',
+            backend='onnx',
+            model_kwargs={
+                "file_name": EMBEDDING_ONNX_FILE,
+                "provider": "CPUExecutionProvider",
+                "session_options": _onnx_session_options(),
+            },
+        )
+        return
+
     logger.info("Loading English embedding model from %s", EMBEDDING_MODEL_EN_PATH)
     _embedding_model_en = SentenceTransformer(
         EMBEDDING_MODEL_EN_PATH,
@@ -98,57 +205,117 @@ def _load_embedding_models():
     _embedding_model_en.eval()
 
 
-def ensure_models_loaded():
-    """Load all models once in a thread-safe manner."""
-    global _models_loaded
-
-    if _models_loaded:
+def _ensure_loaded(name: str, load, ready: threading.Event, lock: threading.Lock):
+    if ready.is_set():
         return
 
-    with _models_lock:
-        if _models_loaded:
+    with lock:
+        if ready.is_set():
             return
 
-        logger.info("Initializing translation and embedding models")
-        _load_translation_components()
-        _load_embedding_models()
-        _models_loaded = True
-        logger.info("All models loaded successfully")
+        started_at = time.perf_counter()
+        load()
+        ready.set()
+        logger.info("%s model loaded in %.1f s", name.capitalize(), time.perf_counter() - started_at)
+
+
+def ensure_translation_loaded():
+    """Load the translation model once in a thread-safe manner."""
+    _ensure_loaded("translation", _load_translation_components, _translation_ready, _translation_lock)
+
+
+def ensure_embedding_loaded():
+    """Load the embedding model once in a thread-safe manner."""
+    _ensure_loaded("embedding", _load_embedding_models, _embedding_ready, _embedding_lock)
+
+
+def model_status() -> dict:
+    """{model: loaded} for /healthz; never waits for loading in progress."""
+    return {"translation": _translation_ready.is_set(), "embedding": _embedding_ready.is_set()}
+
+
+def models_ready() -> bool:
+    """True once all models are loaded; never waits for loading in progress."""
+    return all(model_status().values())
+
+
+def _run_in_parallel(*functions):
+    """Runs the functions in parallel threads and re-raises the first failure."""
+    with ThreadPoolExecutor(max_workers=len(functions), thread_name_prefix="model-loader") as executor:
+        for future in [executor.submit(function) for function in functions]:
+            future.result()
+
+
+def ensure_models_loaded():
+    """Load all models, each in its own thread."""
+    if models_ready():
+        return
+
+    logger.info("Initializing translation and embedding models")
+    _run_in_parallel(ensure_translation_loaded, ensure_embedding_loaded)
+    logger.info("All models loaded successfully")
 
 
 def get_translation_components():
-    ensure_models_loaded()
+    ensure_translation_loaded()
     return _translation_tokenizer, _translation_model
 
 def get_embedding_model_en():
-    ensure_models_loaded()
+    ensure_embedding_loaded()
     return _embedding_model_en
 
 
-def warm_up_models():
-    """Run inexpensive dummy requests so first real request is fast."""
-    ensure_models_loaded()
-
+def _warm_up_translation():
+    tokenizer, model = get_translation_components()
     try:
-        tokenizer, model = get_translation_components()
         sample = tokenizer(CONTEXT_PREFIX + "testi", return_tensors="pt")
         _ = model.generate(**sample)
     except Exception as exc:
         logger.warning("Translation warm-up failed: %s", exc)
 
+
+def _warm_up_embedding():
+    model = get_embedding_model_en()
     try:
-        get_embedding_model_en().encode(["device"], show_progress_bar=False)
+        model.encode(["device"], show_progress_bar=False)
     except Exception as exc:
         logger.warning("Embedding warm-up failed: %s", exc)
 
 
+def warm_up_models():
+    """
+    Load the models in parallel and run an inexpensive dummy request on each as
+    soon as it is loaded, so the first real request is fast.
+    """
+    _run_in_parallel(_warm_up_translation, _warm_up_embedding)
+
+
 __all__ = [
     "MAX_BATCH_SIZE",
     "CONTEXT_PREFIX",
     "CONTEXT_PREFIX_EN",
     "BGE_INSTRUCTION",
     "EMBEDDING_BATCH_SIZE",
+    "BATCH_MAX_WAIT_MS",
+    "TORCH_NUM_THREADS",
+    "INFERENCE_WORKERS",
+    "SINGLE_REQUEST_CONCURRENCY",
+    "BATCH_REQUEST_CONCURRENCY",
+    "SINGLE_REQUEST_MAX_WAITING",
+    "BATCH_REQUEST_MAX_WAITING",
+    "RETRY_AFTER_SECONDS",
+    "INFERENCE_BACKEND",
+    "ONNX_QUANTIZATION",
+    "ONNX_FILE_SUFFIX",
+    "EMBEDDING_ONNX_FILE",
+    "TRANSLATION_MODEL_ID",
+    "TRANSLATION_CACHE_PATH",
+    "TRANSLATION_CACHE_SIZE",
     "ensure_models_loaded",
+    "ensure_translation_loaded",
+    "ensure_embedding_loaded",
+    "model_status",
+    "models_ready",
     "warm_up_models",
     "get_translation_components",
     "get_embedding_model_en",
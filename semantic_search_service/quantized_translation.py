@@ -0,0 +1,94 @@
+"""
+Int8 copy of the Marian translation model for the torch backend.
+
+quantize_dynamic is slow on the full model, so its output is stored as a state_dict
+next to the fp32 model: download_models.py writes it at build time, and models.py
+writes it after quantizing on a miss. Loading builds the module tree from config.json
+on the meta device (no weight init), swaps in empty quantized Linear layers and
+restores the weights with torch.load(weights_only=True), so a boot never quantizes
+and the file never runs code even though it lives on the shared models volume.
+"""
+import glob
+import hashlib
+import os
+
+import torch
+from torch.ao.nn.quantized import dynamic as quantized_dynamic
+from transformers import GenerationConfig, MarianConfig, MarianMTModel
+
+# Marian only has Linear layers to quantize; load_quantized rebuilds exactly these
+QUANTIZED_LAYERS = {torch.nn.Linear}
+# Files of the fp32 model that determine the quantized weights
+SOURCE_FILE_PATTERNS = ("config.json", "*.safetensors", "*.bin")
+
+
+def _source_files(model_path):
+    files = set()
+    for pattern in SOURCE_FILE_PATTERNS:
+        files.update(glob.glob(os.path.join(model_path, pattern)))
+    return sorted(files)
+
+
+def source_digest(model_path):
+    """
+    Hash of the model name and the names, sizes and mtimes of its config and weight
+    files, so a new model never reuses old quantized weights. Only stats the files,
+    so it is cheap enough for every boot.
+    """
+    digest = hashlib.sha256(os.path.basename(os.path.normpath(model_path)).encode())
+    for path in _source_files(model_path):
+        stat = os.stat(path)
+        digest.update(f"{os.path.basename(path)}:{stat.st_size}:{stat.st_mtime_ns}\n".encode())
+    return digest.hexdigest()[:16]
+
+
+def quantized_path(model_path):
+    """Where the quantized state_dict of the model is stored for the running torch version."""
+    return f"{model_path}-qint8-torch{torch.__version__}-{source_digest(model_path)}.pt"
+
+
+def quantize(model):
+    model = torch.quantization.quantize_dynamic(model, QUANTIZED_LAYERS, dtype=torch.qint8)
+    model.eval()
+    return model
+
+
+def quantize_pretrained(model_path):
+    """Loads the fp32 model and quantizes it."""
+    return quantize(MarianMTModel.from_pretrained(model_path, local_files_only=True))
+
+
+def save_quantized(model, path):
+    """Writes the state_dict to a temporary file and renames it, so readers never see a partial file."""
+    temporary_path = f"{path}.{os.getpid()}.tmp"
+    try:
+        torch.save(model.state_dict(), temporary_path)
+        os.replace(temporary_path, path)
+    finally:
+        if os.path.exists(temporary_path):
+            os.remove(temporary_path)
+
+
+def _swap_in_quantized_linears(module):
+    """Replaces the Linear layers with empty quantized ones, the shape quantize_dynamic leaves behind."""
+    for name, child in module.named_children():
+        if type(child) is torch.nn.Linear:
+            setattr(module, name, quantized_dynamic.Linear(
+                child.in_features, child.out_features, bias_=child.bias is not None, dtype=torch.qint8
+            ))
+        else:
+            _swap_in_quantized_linears(child)
+
+
+def load_quantized(model_path, path):
+    """Builds the quantized model from the config and restores the saved weights into it."""
+    config = MarianConfig.from_pretrained(model_path, local_files_only=True)
+    with torch.device("meta"):
+        model = MarianMTModel(config)
+    _swap_in_quantized_linears(model)
+    # assign=True replaces the meta tensors; torch.save kept the shared embeddings in one storage
+    model.load_state_dict(torch.load(path, weights_only=True), assign=True)
+    if os.path.exists(os.path.join(model_path, "generation_config.json")):
+        model.generation_config = GenerationConfig.from_pretrained(model_path, local_files_only=True)
+    model.eval()
+    return model
@@ -0,0 +1,149 @@
+"""
+Pre-fork server for the semantic search service.
+
+With SERVICE_WORKERS > 1 the models are loaded and warmed up once in a master
+process, which then forks the Uvicorn workers. The workers share the model
+weights copy-on-write, so adding a worker adds a process, not another ~1 GB of
+weights, and throughput scales across the cores of the node.
+
+KEY DESIGN:
+- The cores are split between the workers: each one gets
+  TORCH_NUM_THREADS = cores // workers (unless set explicitly) and one inference
+  thread, so the workers do not oversubscribe the CPU
+- The master runs torch single-threaded. GNU OpenMP (used by the PyTorch CPU
+  wheels) is not fork-safe: a child hangs in its first parallel op if the
+  parent has already started an OpenMP thread pool. Each worker sets its own
+  thread count after the fork.
+- gc.freeze() after loading moves the loaded objects out of the garbage
+  collector's reach, so collections in the workers do not write to (and copy)
+  the shared pages
+- The master binds the socket and the workers accept on it. Workers that die
+  are restarted; SIGTERM/SIGINT are passed on to the workers for a graceful
+  shutdown.
+- With SERVICE_WORKERS=1 (the default) this is plain `uvicorn main:app`
+- The ONNX backend cannot be shared this way: ONNX Runtime sessions start
+  their thread pools at creation, and those threads do not exist in a forked
+  child. With INFERENCE_BACKEND=onnx every worker loads its own models.
+"""
+
+import gc
+import logging
+import os
+import signal
+import socket
+import sys
+import time
+
+HOST = os.getenv("HOST", "0.0.0.0")
+PORT = int(os.getenv("PORT", "8001"))
+SERVICE_WORKERS = int(os.getenv("SERVICE_WORKERS", "1"))
+
+logger = logging.getLogger("serve")
+
+
+def threads_per_worker(workers: int, cpu_count: int) -> int:
+    return max(1, cpu_count // workers)
+
+
+def configure_worker_threads(workers: int):
+    """Sets the per-worker thread environment before models.py reads it."""
+    if "TORCH_NUM_THREADS" not in os.environ:
+        os.environ["TORCH_NUM_THREADS"] = str(threads_per_worker(workers, os.cpu_count() or 1))
+    os.environ.setdefault("INFERENCE_WORKERS", "1")
+
+
+def _bind_socket() -> socket.socket:
+    sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    sock.bind((HOST, PORT))
+    sock.listen(2048)
+    sock.set_inheritable(True)
+    return sock
+
+
+def _run_worker(app, sock: socket.socket, torch_threads: int):
+    import torch
+    import uvicorn
+
+    for signum in (signal.SIGTERM, signal.SIGINT):
+        signal.signal(signum, signal.SIG_DFL)
+    torch.set_num_threads(torch_threads)
+
+    server = uvicorn.Server(uvicorn.Config(app, log_level="info"))
+    server.run(sockets=[sock])
+
+
+def _spawn(app, sock: socket.socket, torch_threads: int) -> int:
+    pid = os.fork()
+    if pid == 0:
+        try:
+            _run_worker(app, sock, torch_threads)
+        finally:
+            os._exit(0)
+    return pid
+
+
+def serve_prefork(workers: int):
+    configure_worker_threads(workers)
+
+    # Imported only now so models.py sees the per-worker thread settings
+    import torch
+    import main
+    from models import INFERENCE_BACKEND, TORCH_NUM_THREADS, warm_up_models
+
+    if INFERENCE_BACKEND == "onnx":
+        logger.warning("INFERENCE_BACKEND=onnx: models are loaded per worker, not shared")
+    else:
+        # See KEY DESIGN: no OpenMP thread pool may exist before the fork
+        torch.set_num_threads(1)
+        logger.info("Loading models in the master process")
+        warm_up_models()
+        gc.collect()
+        gc.freeze()
+
+    sock = _bind_socket()
+    logger.info("Forking %d workers with %d torch threads each on %s:%d", workers, TORCH_NUM_THREADS, HOST, PORT)
+    children = {_spawn(main.app, sock, TORCH_NUM_THREADS) for _ in range(workers)}
+
+    stopping = False
+
+    def stop(signum, frame):
+        nonlocal stopping
+        stopping = True
+        for pid in children:
+            try:
+                os.kill(pid, signal.SIGTERM)
+            except ProcessLookupError:
+                pass
+
+    signal.signal(signal.SIGTERM, stop)
+    signal.signal(signal.SIGINT, stop)
+
+    while children:
+        try:
+            pid, status = os.wait()
+        except ChildProcessError:
+            break
+        except InterruptedError:
+            continue
+        children.discard(pid)
+        if not stopping:
+            logger.warning("Worker %d exited with status %d, restarting", pid, status)
+            time.sleep(1)
+            children.add(_spawn(main.app, sock, TORCH_NUM_THREADS))
+
+    sock.close()
+
+
+def main():
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(name)s - %(levelname)s - %(message)s")
+    if SERVICE_WORKERS <= 1:
+        import uvicorn
+
+        uvicorn.run("main:app", host=HOST, port=PORT)
+    else:
+        serve_prefork(SERVICE_WORKERS)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
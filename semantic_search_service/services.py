@@ -1,4 +1,4 @@
-from typing import List
+from typing import List, Optional
 import gc
 import torch
 from models import (
@@ -6,6 +6,7 @@ from models import (
     get_embedding_model_en,
     logger,
 )
+from metrics import STAGE_SECONDS
 
 PREFIX = "scientific instrument: "
 
@@ -23,9 +24,12 @@ def _strip_context_prefix(text: str) -> str:
 def translate_fi_to_en(text: str) -> str:
     try:
         tokenizer, model = get_translation_components()
-        tokens = tokenizer(text, return_tensors="pt", padding=True)
-        translated = model.generate(**tokens)
-        result = tokenizer.decode(translated[0], skip_special_tokens=True).strip()
+        with STAGE_SECONDS.time(model="translation", stage="tokenize"):
+            tokens = tokenizer(text, return_tensors="pt", padding=True)
+        with STAGE_SECONDS.time(model="translation", stage="generate"):
+            translated = model.generate(**tokens)
+        with STAGE_SECONDS.time(model="translation", stage="decode"):
+            result = tokenizer.decode(translated[0], skip_special_tokens=True).strip()
         if len(result) > 3 * len(text):
             return "Translation Failed"
         result = _strip_context_prefix(result)
@@ -34,27 +38,33 @@ def translate_fi_to_en(text: str) -> str:
         logger.error(f"Translation failed for text: '{text}'. Error: {e}", exc_info=True)
         return "Translation Failed"
 
-def translate_fi_to_en_batch(texts: List[str]) -> List[str]:
-    """Batch translate Finnish texts to English efficiently"""
+def translate_fi_to_en_batch(texts: List[str], max_result_length: Optional[int] = 100) -> List[str]:
+    """
+    Batch translate Finnish texts to English efficiently.
+    Results longer than max_result_length (None for no limit) count as failed.
+    """
     try:
         tokenizer, model = get_translation_components()
         # Tokenize all input texts at once
-        tokens = tokenizer(
-            texts,
-            return_tensors="pt",
-            padding=True,
-            truncation=True
-        )
+        with STAGE_SECONDS.time(model="translation", stage="tokenize"):
+            tokens = tokenizer(
+                texts,
+                return_tensors="pt",
+                padding=True,
+                truncation=True
+            )
 
         # Generate all translations
-        translated = model.generate(**tokens)
+        with STAGE_SECONDS.time(model="translation", stage="generate"):
+            translated = model.generate(**tokens)
 
         # Batch decode all generated sequences
-        decoded_texts = tokenizer.batch_decode(
-            translated,
-            skip_special_tokens=True,
-            clean_up_tokenization_spaces=True
-        )
+        with STAGE_SECONDS.time(model="translation", stage="decode"):
+            decoded_texts = tokenizer.batch_decode(
+                translated,
+                skip_special_tokens=True,
+                clean_up_tokenization_spaces=True
+            )
 
         # Clean up tensors immediately
         del tokens, translated
@@ -63,7 +73,7 @@ def translate_fi_to_en_batch(texts: List[str]) -> List[str]:
         results = []
         for original, result in zip(texts, decoded_texts):
             result = result.strip()
-            if len(result) > 3 * len(original) or len(result) > 100:
+            if len(result) > 3 * len(original) or (max_result_length is not None and len(result) > max_result_length):
                 result = "Translation Failed"
             else:
                 result = _strip_context_prefix(result)
@@ -82,18 +92,21 @@ def translate_fi_to_en_batch(texts: List[str]) -> List[str]:
 def embed_en(text: str) -> list:
     """Generate English embedding for a single text"""
     model = get_embedding_model_en()
-    return model.encode(text, normalize_embeddings=True).tolist()
+    # SentenceTransformer.encode tokenizes and runs the model in one call
+    with STAGE_SECONDS.time(model="embedding", stage="encode"):
+        return model.encode(text, normalize_embeddings=True).tolist()
 
 def embed_en_batch(texts: List[str], batch_size: int = 100) -> list:
     """Generate English embeddings for multiple texts"""
     model = get_embedding_model_en()
-    return model.encode(
-        texts,
-        batch_size=batch_size, 
-        show_progress_bar=False,
-        convert_to_numpy=True,
-        normalize_embeddings=True
-    )
+    with STAGE_SECONDS.time(model="embedding", stage="encode"):
+        return model.encode(
+            texts,
+            batch_size=batch_size, 
+            show_progress_bar=False,
+            convert_to_numpy=True,
+            normalize_embeddings=True
+        )
 
 # ==========================================================
 # Memory Cleanup
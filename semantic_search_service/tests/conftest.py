@@ -3,6 +3,8 @@ import torch
 from unittest.mock import MagicMock
 import numpy as np
 
+from translation_cache import TranslationCache
+
 # ==========================================================
 # Mocks for Translation
 # ==========================================================
@@ -91,4 +93,13 @@ def mock_ml_models(mocker):
     mocker.patch("models.warm_up_models")
     mocker.patch("models.ensure_models_loaded")
     mocker.patch("main.warm_up_models")
-    mocker.patch("main.ensure_models_loaded")
+    mocker.patch("main.models_ready", return_value=True)
+    mocker.patch("main.model_status", return_value={"translation": True, "embedding": True})
+
+
+@pytest.fixture(autouse=True)
+def translation_cache(mocker):
+    """A fresh, memory-only translation cache for every test."""
+    cache = TranslationCache(None, "test-model", 100)
+    mocker.patch("main.translation_cache", cache)
+    return cache
@@ -0,0 +1,94 @@
+import asyncio
+
+import httpx
+import pytest
+from fastapi.testclient import TestClient
+
+import main
+from batching import MicroBatcher
+from main import app
+
+client = TestClient(app)
+
+
+# ==========================================================
+# MicroBatcher
+# ==========================================================
+async def test_concurrent_requests_share_one_batch():
+    calls = []
+
+    def process(items):
+        calls.append(list(items))
+        return [item * 2 for item in items]
+
+    batcher = MicroBatcher("test", process, max_batch_size=10, max_wait_ms=20)
+    results = await asyncio.gather(*(batcher.submit(i) for i in range(5)))
+
+    assert results == [0, 2, 4, 6, 8]
+    assert calls == [[0, 1, 2, 3, 4]]
+
+async def test_full_batch_is_dispatched_without_waiting():
+    calls = []
+
+    def process(items):
+        calls.append(list(items))
+        return items
+
+    # The window is far longer than the test; only the size limit can dispatch
+    batcher = MicroBatcher("test", process, max_batch_size=2, max_wait_ms=60_000)
+    results = await asyncio.wait_for(asyncio.gather(*(batcher.submit(i) for i in range(4))), timeout=5)
+
+    assert results == [0, 1, 2, 3]
+    assert calls == [[0, 1], [2, 3]]
+
+async def test_batch_exception_reaches_every_request():
+    def process(items):
+        raise RuntimeError("model crashed")
+
+    batcher = MicroBatcher("test", process, max_batch_size=10, max_wait_ms=1)
+    results = await asyncio.gather(batcher.submit("a"), batcher.submit("b"), return_exceptions=True)
+
+    assert all(isinstance(result, RuntimeError) for result in results)
+
+async def test_cancelled_request_does_not_break_the_batch():
+    batcher = MicroBatcher("test", lambda items: items, max_batch_size=10, max_wait_ms=20)
+    cancelled = asyncio.ensure_future(batcher.submit("gone"))
+    kept = asyncio.ensure_future(batcher.submit("kept"))
+    await asyncio.sleep(0)
+    cancelled.cancel()
+
+    assert await kept == "kept"
+    with pytest.raises(asyncio.CancelledError):
+        await cancelled
+
+
+# ==========================================================
+# Endpoints
+# ==========================================================
+async def test_concurrent_queries_are_batched(mocker):
+    """Concurrent /process_query requests use one batched translation and embedding."""
+    translate = mocker.spy(main, "translate_fi_to_en_batch")
+    embed = mocker.spy(main, "embed_en_batch")
+    mocker.patch.object(main.translation_batcher, "max_wait", 0.2)
+    mocker.patch.object(main.embedding_batcher, "max_wait", 0.2)
+
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://test") as async_client:
+        responses = await asyncio.gather(*(
+            async_client.post("/process_query", json={"text": f"kysely {i}"}) for i in range(3)
+        ))
+
+    assert [response.json()["embedding_en"] for response in responses] == [[0.1, 0.2, 0.3]] * 3
+    translate.assert_called_once()
+    assert len(translate.call_args.args[0]) == 3
+    embed.assert_called_once()
+
+def test_single_query_uses_single_text_path(mocker):
+    translate = mocker.spy(main, "translate_fi_to_en")
+    batch = mocker.spy(main, "translate_fi_to_en_batch")
+
+    response = client.post("/process_query", json={"text": "mikroskooppi"})
+
+    assert response.status_code == 200
+    translate.assert_called_once_with("tieteellinen instrumentti: mikroskooppi")
+    batch.assert_not_called()
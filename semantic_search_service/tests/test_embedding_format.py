@@ -0,0 +1,64 @@
+import base64
+
+import numpy as np
+from fastapi.testclient import TestClient
+
+from embedding_format import EmbeddingFormat, negotiate
+from main import app
+
+client = TestClient(app)
+
+RAW_FLOAT16 = {"Accept": "application/x-embeddings; dtype=float16"}
+
+
+# ==========================================================
+# Negotiation
+# ==========================================================
+def test_negotiate():
+    assert negotiate(None) == EmbeddingFormat("json")
+    assert negotiate("application/json") == EmbeddingFormat("json")
+    assert negotiate("application/x-embeddings") == EmbeddingFormat("raw", "float32")
+    assert negotiate("application/x-embeddings;dtype=float16, application/json") == EmbeddingFormat("raw", "float16")
+    assert negotiate('application/json; encoding="base64"') == EmbeddingFormat("base64", "float32")
+    # Unsupported dtypes fall through to the next media range
+    assert negotiate("application/x-embeddings; dtype=int8, application/json") == EmbeddingFormat("json")
+
+
+# ==========================================================
+# Endpoints
+# ==========================================================
+def test_embed_en_batch_raw():
+    response = client.post("/embed_en_batch", json={"texts": ["a", "b"]}, headers=RAW_FLOAT16)
+
+    assert response.status_code == 200
+    assert response.headers["content-type"] == "application/x-embeddings; dtype=float16"
+    assert response.headers["x-embedding-shape"] == "2,3"
+    embeddings = np.frombuffer(response.content, dtype="<f2").reshape(2, 3)
+    np.testing.assert_allclose(embeddings, [[0.1, 0.2, 0.3]] * 2, rtol=1e-3)
+
+def test_embed_query_base64():
+    response = client.post(
+        "/embed_query", json={"text": "microscope"}, headers={"Accept": "application/json; encoding=base64"}
+    )
+
+    embedding = response.json()["embedding"]
+    assert embedding["dtype"] == "float32"
+    assert embedding["shape"] == [3]
+    decoded = np.frombuffer(base64.b64decode(embedding["data"]), dtype="<f4")
+    np.testing.assert_allclose(decoded, [0.1, 0.2, 0.3], rtol=1e-6)
+
+def test_process_query_raw():
+    response = client.post("/process_query", json={"text": "mikroskooppi"}, headers=RAW_FLOAT16)
+
+    assert response.headers["x-embedding-shape"] == "3"
+    assert response.headers["x-translated-text"] == "mock%20translated%20text"
+
+def test_process_query_raw_translation_failure(mocker):
+    mocker.patch("main.translate_fi_to_en", return_value="Translation Failed")
+
+    response = client.post("/process_query", json={"text": "xyz"}, headers=RAW_FLOAT16)
+
+    assert response.status_code == 200
+    assert response.headers["x-embedding-shape"] == "0"
+    assert response.content == b""
+    assert "x-translated-text" not in response.headers
@@ -0,0 +1,143 @@
+import asyncio
+import threading
+
+import httpx
+import numpy as np
+import pytest
+from fastapi.testclient import TestClient
+
+import main
+from inference import ConcurrencyLimit, Saturated, run_inference
+from main import app
+
+client = TestClient(app)
+
+
+# ==========================================================
+# Inference pool and concurrency limits
+# ==========================================================
+async def test_run_inference_uses_the_inference_pool():
+    thread_name = await run_inference(lambda: threading.current_thread().name)
+    assert thread_name.startswith("inference")
+
+async def test_concurrency_limit_caps_concurrent_requests():
+    limit = ConcurrencyLimit(2)
+    running = 0
+    peak = 0
+
+    async def request():
+        nonlocal running, peak
+        async with limit:
+            running += 1
+            peak = max(peak, running)
+            await asyncio.sleep(0.01)
+            running -= 1
+
+    await asyncio.gather(*(request() for _ in range(6)))
+    assert peak == 2
+
+
+# ==========================================================
+# Health checks
+# ==========================================================
+def test_health_check_while_loading(mocker):
+    mocker.patch("main.models_ready", return_value=False)
+    mocker.patch("main.model_status", return_value={"translation": False, "embedding": True})
+
+    response = client.get("/healthz")
+
+    assert response.status_code == 503
+    assert response.json() == {"status": "loading", "models": {"translation": False, "embedding": True}}
+
+def test_requests_for_a_loading_model_get_503(mocker):
+    mocker.patch("main.model_status", return_value={"translation": False, "embedding": True})
+    translate = mocker.patch("main.translate_fi_to_en")
+
+    response = client.post("/process_query", json={"text": "mikroskooppi"})
+
+    assert response.status_code == 503
+    assert response.headers["Retry-After"] == "1"
+    translate.assert_not_called()
+    # The embedding model is loaded, so /embed_query is served
+    assert client.post("/embed_query", json={"text": "microscope"}).status_code == 200
+
+def test_cached_translations_are_served_while_translation_model_loads(mocker, translation_cache):
+    mocker.patch("main.model_status", return_value={"translation": False, "embedding": True})
+    translation_cache.put(main.CONTEXT_PREFIX + "mikroskooppi", "microscope")
+
+    response = client.post("/process_query", json={"text": "mikroskooppi"})
+
+    assert response.status_code == 200
+    assert response.json()["translated_text"] == "microscope"
+
+async def test_health_check_responds_during_inference(mocker):
+    """A long batch embedding does not block /healthz."""
+    release = threading.Event()
+
+    def slow_embed(texts, batch_size):
+        release.wait(5)
+        return np.zeros((len(texts), 3))
+
+    mocker.patch("main.embed_en_batch", side_effect=slow_embed)
+
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://test") as async_client:
+        batch = asyncio.ensure_future(async_client.post("/embed_en_batch", json={"texts": ["a", "b"]}))
+        await asyncio.sleep(0.05)
+
+        health = await asyncio.wait_for(async_client.get("/healthz"), timeout=1)
+        assert health.status_code == 200
+        assert not batch.done()
+
+        release.set()
+        assert (await batch).status_code == 200
+
+async def test_saturated_limit_raises():
+    limit = ConcurrencyLimit(1, max_waiting=1)
+
+    async with limit:
+        waiting = asyncio.ensure_future(limit.__aenter__())
+        await asyncio.sleep(0)
+        assert limit.waiting == 1
+        with pytest.raises(Saturated):
+            async with limit:
+                pass
+
+    await waiting
+    assert limit.waiting == 0
+
+
+# ==========================================================
+# Batch size and backpressure
+# ==========================================================
+def test_embed_en_batch_is_chunked(mocker):
+    embed = mocker.spy(main, "embed_en_batch")
+
+    response = client.post("/embed_en_batch", json={"texts": [f"text {i}" for i in range(250)]})
+
+    assert response.status_code == 200
+    assert len(response.json()["embeddings"]) == 250
+    assert [len(call.args[0]) for call in embed.call_args_list] == [100, 100, 50]
+
+def test_oversized_batch_is_rejected():
+    texts = ["text"] * (main.MAX_BATCH_SIZE + 1)
+
+    assert client.post("/embed_en_batch", json={"texts": texts}).status_code == 413
+    queries = [{"text": text} for text in texts]
+    assert client.post("/embed_query_batch", json={"queries": queries}).status_code == 413
+
+async def test_saturated_endpoint_answers_429(mocker):
+    concurrency = main.embed_en_batch_endpoint.concurrency
+    mocker.patch.object(concurrency, "limit", 1)
+    mocker.patch.object(concurrency, "max_waiting", 0)
+    mocker.patch.object(concurrency, "_loop", None)
+
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://test") as async_client:
+        async with concurrency:
+            response = await async_client.post("/embed_en_batch", json={"texts": ["a"]})
+        assert response.status_code == 429
+        assert response.headers["retry-after"] == "1"
+
+        response = await async_client.post("/embed_en_batch", json={"texts": ["a"]})
+        assert response.status_code == 200
@@ -1,5 +1,6 @@
 from fastapi.testclient import TestClient
 import numpy as np
+import torch
 from main import app, MAX_BATCH_SIZE
 
 client = TestClient(app)
@@ -7,7 +8,7 @@ client = TestClient(app)
 def test_health_check():
     response = client.get("/healthz")
     assert response.status_code == 200
-    assert response.json() == {"status": "ok"}
+    assert response.json() == {"status": "ok", "models": {"translation": True, "embedding": True}}
 
 def test_process_text():
     payload = {"text": "test input"}
@@ -46,4 +47,51 @@ def test_embed_en():
     data = response.json()
     
     assert "embedding" in data
-    assert data["embedding"] == [0.1, 0.2, 0.3]
\ No newline at end of file
+    assert data["embedding"] == [0.1, 0.2, 0.3]
+
+
+def test_embed_query_batch(mocker):
+    """
+    Test /embed_query_batch: only flagged queries are translated, everything is
+    embedded in one batch and failed translations get no embedding.
+    """
+    translate = mocker.patch(
+        "main.translate_fi_to_en_batch",
+        return_value=["Microscope", "Translation Failed"]
+    )
+    embed = mocker.spy(__import__("main"), "embed_en_batch")
+
+    payload = {"queries": [
+        {"text": " Mikroskooppi ", "translate": True},
+        {"text": "centrifuge"},
+        {"text": "xyz", "translate": True},
+    ]}
+    response = client.post("/embed_query_batch", json=payload)
+
+    assert response.status_code == 200
+    results = response.json()["results"]
+
+    translate.assert_called_once_with(
+        ["tieteellinen instrumentti: mikroskooppi", "tieteellinen instrumentti: xyz"],
+        max_result_length=None,
+    )
+    assert embed.call_count == 1
+    assert [r["translated_text"] for r in results] == ["microscope", None, None]
+    assert [r["embedding"] for r in results] == [[0.1, 0.2, 0.3], [0.1, 0.2, 0.3], None]
+
+def test_embed_query_batch_keeps_long_translations(mocker):
+    """A translation longer than 100 characters is embedded, like in /process_query."""
+    translation = " ".join(["high resolution transmission electron microscope"] * 3)
+    tokenizer = mocker.MagicMock(return_value={"input_ids": torch.tensor([[1, 2, 3]])})
+    tokenizer.batch_decode.side_effect = lambda token_ids, **kwargs: [translation] * len(token_ids)
+    model = mocker.MagicMock()
+    model.generate.return_value = torch.tensor([[10, 11, 12]])
+    mocker.patch("services.get_translation_components", return_value=(tokenizer, model))
+
+    query = "korkean erotuskyvyn läpäisyelektronimikroskooppi " * 3
+    response = client.post("/embed_query_batch", json={"queries": [{"text": query, "translate": True}]})
+
+    result = response.json()["results"][0]
+    assert len(result["translated_text"]) > 100
+    assert result["translated_text"] == translation
+    assert result["embedding"] == [0.1, 0.2, 0.3]
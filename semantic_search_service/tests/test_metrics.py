@@ -0,0 +1,69 @@
+from fastapi.testclient import TestClient
+
+import metrics
+from main import app
+
+client = TestClient(app)
+
+
+# ==========================================================
+# Metric types
+# ==========================================================
+def test_histogram_renders_cumulative_buckets(mocker):
+    mocker.patch.object(metrics, "_registry", [])
+    histogram = metrics.Histogram("test_seconds", "Test latency", ["stage"], buckets=(0.1, 1.0))
+
+    histogram.observe(0.05, stage="a")
+    histogram.observe(0.5, stage="a")
+    histogram.observe(5.0, stage="a")
+
+    assert metrics.render().splitlines() == [
+        "# HELP test_seconds Test latency",
+        "# TYPE test_seconds histogram",
+        'test_seconds_bucket{stage="a",le="0.1"} 1',
+        'test_seconds_bucket{stage="a",le="1.0"} 2',
+        'test_seconds_bucket{stage="a",le="+Inf"} 3',
+        'test_seconds_sum{stage="a"} 5.55',
+        'test_seconds_count{stage="a"} 3',
+    ]
+
+def test_counter_and_callback(mocker):
+    mocker.patch.object(metrics, "_registry", [])
+    counter = metrics.Counter("test_total", "Test counter", ["status"])
+    metrics.Callback("test_depth", "Test gauge", lambda: 7)
+    metrics.Callback("test_missing", "Unknown value", lambda: None)
+
+    counter.inc(status="200")
+    counter.inc(2, status="200")
+
+    rendered = metrics.render()
+    assert 'test_total{status="200"} 3' in rendered
+    assert "test_depth 7" in rendered
+    assert "# TYPE test_missing gauge" in rendered
+
+
+# ==========================================================
+# /metrics
+# ==========================================================
+def test_metrics_endpoint():
+    client.post("/process_query", json={"text": "mikroskooppi"})
+    client.post("/process_query", json={"text": "mikroskooppi"})
+    client.post("/embed_en_batch", json={"texts": ["a", "b"]})
+    client.get("/no-such-path")
+
+    response = client.get("/metrics")
+
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/plain")
+    text = response.text
+    assert 'semantic_request_duration_seconds_count{endpoint="/process_query"}' in text
+    assert 'semantic_requests_total{endpoint="other",status="404"}' in text
+    for stage in ("tokenize", "generate", "decode"):
+        assert f'semantic_stage_duration_seconds_count{{model="translation",stage="{stage}"}}' in text
+    assert 'semantic_stage_duration_seconds_count{model="embedding",stage="encode"}' in text
+    assert 'semantic_batch_size_count{batch="embed_en_batch"}' in text
+    assert 'semantic_batch_size_count{batch="translation"}' in text
+    assert "semantic_translation_cache_hit_ratio 0.5" in text
+    assert 'semantic_requests_waiting{endpoint="/embed_en_batch"} 0' in text
+    assert "semantic_inference_jobs 0" in text
+    assert "process_resident_memory_bytes " in text
@@ -0,0 +1,123 @@
+import glob
+import os
+import threading
+
+import pytest
+import torch
+from transformers import MarianConfig, MarianMTModel
+
+import models
+import quantized_translation
+
+
+# ==========================================================
+# Backend selection
+# ==========================================================
+def test_torch_backend_does_not_load_onnx(mocker, monkeypatch):
+    monkeypatch.setattr(models, "INFERENCE_BACKEND", "torch")
+    load_onnx = mocker.patch("models._load_onnx_translation_components")
+    mocker.patch("models.MarianTokenizer")
+    mocker.patch("models._load_quantized_translation_model")
+
+    models._load_translation_components()
+
+    load_onnx.assert_not_called()
+
+def test_onnx_backend_loads_exported_models(mocker, monkeypatch):
+    monkeypatch.setattr(models, "INFERENCE_BACKEND", "onnx")
+    load_onnx = mocker.patch("models._load_onnx_translation_components")
+    load_quantized = mocker.patch("models._load_quantized_translation_model")
+    mocker.patch("models._onnx_session_options", return_value="options")
+    sentence_transformer = mocker.patch("models.SentenceTransformer")
+
+    models._load_translation_components()
+    models._load_embedding_models()
+
+    load_onnx.assert_called_once()
+    load_quantized.assert_not_called()
+    kwargs = sentence_transformer.call_args.kwargs
+    assert kwargs["backend"] == "onnx"
+    assert kwargs["model_kwargs"]["file_name"] == "onnx/model_qint8_avx2.onnx"
+
+
+# ==========================================================
+# Quantized translation model cache
+# ==========================================================
+@pytest.fixture
+def translation_model_path(tmp_path, monkeypatch):
+    """A tiny fp32 Marian model saved like download_models.py does."""
+    config = MarianConfig(
+        vocab_size=64, d_model=16, encoder_layers=1, decoder_layers=1,
+        encoder_attention_heads=2, decoder_attention_heads=2,
+        encoder_ffn_dim=32, decoder_ffn_dim=32,
+        pad_token_id=1, decoder_start_token_id=1,
+    )
+    path = tmp_path / "opus-mt"
+    MarianMTModel(config).save_pretrained(path)
+    monkeypatch.setattr(models, "TRANSLATION_MODEL_PATH", str(path))
+    return path
+
+def _translate(model):
+    return model.generate(torch.tensor([[5, 6, 7, 0]]), max_new_tokens=4)
+
+def test_quantized_translation_model_is_saved_and_reloaded(mocker, translation_model_path):
+    first = models._load_quantized_translation_model()
+    path = quantized_translation.quantized_path(str(translation_model_path))
+    assert os.path.exists(path)
+    assert not glob.glob(f"{path}.*.tmp")
+
+    quantize_dynamic = mocker.spy(quantized_translation.torch.quantization, "quantize_dynamic")
+    load = mocker.spy(quantized_translation.torch, "load")
+    second = models._load_quantized_translation_model()
+
+    quantize_dynamic.assert_not_called()
+    assert not any(tensor.is_meta for tensor in [*second.parameters(), *second.buffers()])
+    assert load.call_args.kwargs["weights_only"] is True
+    assert torch.equal(_translate(first), _translate(second))
+
+def test_quantized_translation_path_follows_model_and_torch_version(mocker, translation_model_path):
+    path = quantized_translation.quantized_path(str(translation_model_path))
+    assert f"torch{torch.__version__}" in path
+
+    # New weights in the model directory, e.g. a fine-tuned model
+    model = MarianMTModel.from_pretrained(translation_model_path)
+    torch.nn.init.normal_(model.lm_head.weight)
+    model.save_pretrained(translation_model_path)
+    later = os.path.getmtime(translation_model_path / "model.safetensors") + 10
+    os.utime(translation_model_path / "model.safetensors", (later, later))
+    assert quantized_translation.quantized_path(str(translation_model_path)) != path
+
+    mocker.patch.object(quantized_translation.torch, "__version__", "9.9.9")
+    assert "torch9.9.9" in quantized_translation.quantized_path(str(translation_model_path))
+
+def test_unreadable_quantized_translation_model_is_rebuilt(translation_model_path):
+    path = quantized_translation.quantized_path(str(translation_model_path))
+    with open(path, "wb") as f:
+        f.write(b"not a state_dict")
+
+    model = models._load_quantized_translation_model()
+
+    assert _translate(model).shape[0] == 1
+    assert torch.load(path, weights_only=True).keys() == model.state_dict().keys()
+
+
+# ==========================================================
+# Per-model readiness
+# ==========================================================
+def test_embedding_model_is_ready_before_translation_model(mocker, monkeypatch):
+    for name in ("_translation_ready", "_embedding_ready"):
+        monkeypatch.setattr(models, name, threading.Event())
+    release_translation = threading.Event()
+    mocker.patch("models._load_translation_components", side_effect=lambda: release_translation.wait(5))
+    mocker.patch("models._load_embedding_models")
+
+    loader = threading.Thread(target=models.ensure_translation_loaded)
+    loader.start()
+    models.ensure_embedding_loaded()
+
+    assert models.model_status() == {"translation": False, "embedding": True}
+    assert not models.models_ready()
+
+    release_translation.set()
+    loader.join(5)
+    assert models.models_ready()
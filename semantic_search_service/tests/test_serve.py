@@ -0,0 +1,31 @@
+import serve
+
+
+# ==========================================================
+# Worker thread settings
+# ==========================================================
+def test_threads_per_worker():
+    assert serve.threads_per_worker(1, 8) == 8
+    assert serve.threads_per_worker(4, 8) == 2
+    assert serve.threads_per_worker(3, 8) == 2
+    # More workers than cores still get one thread each
+    assert serve.threads_per_worker(4, 2) == 1
+
+def test_configure_worker_threads(monkeypatch):
+    monkeypatch.delenv("TORCH_NUM_THREADS", raising=False)
+    monkeypatch.delenv("INFERENCE_WORKERS", raising=False)
+    monkeypatch.setattr(serve.os, "cpu_count", lambda: 8)
+
+    serve.configure_worker_threads(2)
+
+    assert serve.os.environ["TORCH_NUM_THREADS"] == "4"
+    assert serve.os.environ["INFERENCE_WORKERS"] == "1"
+
+def test_configure_worker_threads_keeps_explicit_settings(monkeypatch):
+    monkeypatch.setenv("TORCH_NUM_THREADS", "3")
+    monkeypatch.setenv("INFERENCE_WORKERS", "2")
+
+    serve.configure_worker_threads(4)
+
+    assert serve.os.environ["TORCH_NUM_THREADS"] == "3"
+    assert serve.os.environ["INFERENCE_WORKERS"] == "2"
@@ -0,0 +1,106 @@
+import threading
+
+from fastapi.testclient import TestClient
+
+import main
+from main import app
+from translation_cache import TranslationCache
+
+client = TestClient(app)
+
+
+# ==========================================================
+# TranslationCache
+# ==========================================================
+def test_cache_survives_restart(tmp_path):
+    path = str(tmp_path / "cache" / "translations.sqlite3")
+    TranslationCache(path, "opus", 10).put("Mikroskooppi", "microscope")
+
+    cache = TranslationCache(path, "opus", 10)
+
+    assert cache.get("  mikroskooppi ") == "microscope"
+    assert cache.stats()["disk_hits"] == 1
+    assert cache.get("mikroskooppi") == "microscope"
+    assert cache.stats()["memory_hits"] == 1
+
+def test_cache_is_keyed_by_model(tmp_path):
+    path = str(tmp_path / "translations.sqlite3")
+    TranslationCache(path, "opus", 10).put("sentrifugi", "centrifuge")
+
+    assert TranslationCache(path, "fine-tuned-opus", 10).get("sentrifugi") is None
+
+def test_cache_evicts_least_recently_used():
+    cache = TranslationCache(None, "opus", 2)
+    cache.put("a", "A")
+    cache.put("b", "B")
+    cache.get("a")
+    cache.put("c", "C")
+
+    assert cache.get("b") is None
+    assert cache.get("a") == "A"
+    assert cache.get("c") == "C"
+
+def test_failed_translations_are_not_cached():
+    cache = TranslationCache(None, "opus", 10)
+    cache.put("xyz", "Translation Failed")
+
+    assert cache.get("xyz") is None
+
+def test_unwritable_path_falls_back_to_memory(tmp_path):
+    blocker = tmp_path / "file"
+    blocker.write_text("")
+    cache = TranslationCache(str(blocker / "translations.sqlite3"), "opus", 10)
+
+    cache.put("a", "A")
+
+    assert cache.get("a") == "A"
+    assert cache.stats()["disk_entries"] is None
+
+
+# ==========================================================
+# Endpoints
+# ==========================================================
+def test_repeated_query_skips_translation(mocker):
+    translate = mocker.spy(main, "translate_fi_to_en")
+
+    first = client.post("/process_query", json={"text": "Mikroskooppi"})
+    second = client.post("/process_query", json={"text": "mikroskooppi "})
+
+    assert first.json() == second.json()
+    translate.assert_called_once()
+
+def test_query_batch_uses_cache(mocker, translation_cache):
+    translation_cache.put("tieteellinen instrumentti: mikroskooppi", "microscope")
+    translate = mocker.spy(main, "translate_fi_to_en_batch")
+
+    response = client.post("/embed_query_batch", json={"queries": [
+        {"text": "mikroskooppi", "translate": True},
+        {"text": "sentrifugi", "translate": True},
+    ]})
+
+    assert [r["translated_text"] for r in response.json()["results"]] == ["microscope", "mock translated text"]
+    translate.assert_called_once_with(["tieteellinen instrumentti: sentrifugi"], max_result_length=None)
+
+def test_cache_io_runs_off_the_event_loop(mocker, translation_cache):
+    """SQLite lookups and writes never block the event loop."""
+    threads = []
+    record = lambda *args: threads.append(threading.current_thread().name)
+    mocker.patch.object(translation_cache, "get_many", side_effect=lambda texts: record() or {})
+    mocker.patch.object(translation_cache, "put_many", side_effect=record)
+
+    client.post("/process_query", json={"text": "mikroskooppi"})
+    client.post("/embed_query_batch", json={"queries": [{"text": "sentrifugi", "translate": True}]})
+    main.translation_cache_executor.submit(lambda: None).result()
+
+    assert len(threads) == 4
+    assert all(name.startswith("translation-cache") for name in threads)
+
+def test_cache_stats():
+    client.post("/process_query", json={"text": "mikroskooppi"})
+    client.post("/process_query", json={"text": "mikroskooppi"})
+
+    stats = client.get("/cache/stats").json()
+
+    assert stats["memory_hits"] == 1
+    assert stats["misses"] == 1
+    assert stats["hit_rate"] == 0.5
@@ -0,0 +1,153 @@
+"""
+Persistent translation cache.
+
+The registry's Finnish instrument names and queries repeat a lot, so translations
+are cached in front of the Marian model: most /process_query calls become a
+lookup plus one embedding.
+
+KEY DESIGN:
+- Two levels: an in-memory LRU of max_entries translations in front of a SQLite
+  table that survives restarts (it lives on the models volume)
+- Keys are the translation model id plus the normalized input (whitespace
+  collapsed, lowercased), so a new or fine-tuned model never sees stale entries
+- Failed translations are not cached; they are retried on the next request
+- The SQLite file is opened on first use in WAL mode. If it cannot be opened,
+  the cache logs a warning and continues in memory only.
+- Counters of memory hits, disk hits and misses back the /cache/stats endpoint
+  and /metrics
+"""
+
+import logging
+import os
+import sqlite3
+import threading
+from collections import OrderedDict
+from typing import Dict, Iterable, Optional
+
+logger = logging.getLogger(__name__)
+
+FAILED_TRANSLATION = "Translation Failed"
+
+
+def normalize(text: str) -> str:
+    return " ".join(text.split()).lower()
+
+
+class TranslationCache:
+    def __init__(self, path: Optional[str], model_id: str, max_entries: int):
+        self.path = path
+        self.model_id = model_id
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self._connection = None
+        self._opened = False
+        self.memory_hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+
+    def _db(self) -> Optional[sqlite3.Connection]:
+        """The SQLite connection, or None when running in memory only."""
+        if not self._opened:
+            self._opened = True
+            if self.path:
+                try:
+                    os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+                    connection = sqlite3.connect(self.path, check_same_thread=False, isolation_level=None)
+                    connection.execute("PRAGMA journal_mode=WAL")
+                    connection.execute("PRAGMA synchronous=NORMAL")
+                    connection.execute(
+                        "CREATE TABLE IF NOT EXISTS translations ("
+                        "model_id TEXT NOT NULL, source TEXT NOT NULL, translation TEXT NOT NULL, "
+                        "PRIMARY KEY (model_id, source))"
+                    )
+                    self._connection = connection
+                except (OSError, sqlite3.Error) as exc:
+                    logger.warning("Translation cache at %s unavailable, using memory only: %s", self.path, exc)
+        return self._connection
+
+    def _remember(self, key: str, translation: str):
+        self._entries[key] = translation
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def get_many(self, texts: Iterable[str]) -> Dict[str, str]:
+        """Returns {text: translation} for the texts that are cached."""
+        found = {}
+        with self._lock:
+            db = self._db()
+            for text in texts:
+                key = normalize(text)
+                if key in self._entries:
+                    self._entries.move_to_end(key)
+                    self.memory_hits += 1
+                    found[text] = self._entries[key]
+                    continue
+
+                row = None
+                if db is not None:
+                    try:
+                        row = db.execute(
+                            "SELECT translation FROM translations WHERE model_id = ? AND source = ?",
+                            (self.model_id, key),
+                        ).fetchone()
+                    except sqlite3.Error as exc:
+                        logger.warning("Translation cache lookup failed: %s", exc)
+                if row is None:
+                    self.misses += 1
+                    continue
+                self.disk_hits += 1
+                self._remember(key, row[0])
+                found[text] = row[0]
+        return found
+
+    def get(self, text: str) -> Optional[str]:
+        return self.get_many([text]).get(text)
+
+    def put_many(self, translations: Dict[str, str]):
+        """Stores {text: translation}; failed translations are skipped."""
+        rows = [
+            (self.model_id, normalize(text), translation)
+            for text, translation in translations.items()
+            if translation != FAILED_TRANSLATION
+        ]
+        if not rows:
+            return
+        with self._lock:
+            for _, key, translation in rows:
+                self._remember(key, translation)
+            db = self._db()
+            if db is not None:
+                try:
+                    db.executemany("INSERT OR REPLACE INTO translations VALUES (?, ?, ?)", rows)
+                except sqlite3.Error as exc:
+                    logger.warning("Translation cache write failed: %s", exc)
+
+    def put(self, text: str, translation: str):
+        self.put_many({text: translation})
+
+    def hit_rate(self) -> Optional[float]:
+        lookups = self.memory_hits + self.disk_hits + self.misses
+        return (self.memory_hits + self.disk_hits) / lookups if lookups else None
+
+    def stats(self) -> dict:
+        with self._lock:
+            db = self._db()
+            disk_entries = None
+            if db is not None:
+                try:
+                    disk_entries = db.execute(
+                        "SELECT COUNT(*) FROM translations WHERE model_id = ?", (self.model_id,)
+                    ).fetchone()[0]
+                except sqlite3.Error:
+                    pass
+            return {
+                "model_id": self.model_id,
+                "memory_entries": len(self._entries),
+                "disk_entries": disk_entries,
+                "memory_hits": self.memory_hits,
+                "disk_hits": self.disk_hits,
+                "misses": self.misses,
+                "hit_rate": self.hit_rate(),
+            }